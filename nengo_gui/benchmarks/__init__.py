@@ -0,0 +1,5 @@
+"""Micro-benchmarks for performance critical parts of the nengo_gui server.
+
+Each module can be run as a script, e.g.
+``python -m nengo_gui.benchmarks.ws_frames``.
+"""
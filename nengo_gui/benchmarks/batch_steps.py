@@ -0,0 +1,83 @@
+"""Measure simulated seconds per wall second of the page runner.
+
+Runs a model with the `SimControl` node unthrottled, once stepping the
+simulator one step per runner iteration and once with
+`SimControl.run_batch`, as used with ``--batch-steps``.
+
+Run with ``python -m nengo_gui.benchmarks.batch_steps``.
+"""
+
+from __future__ import print_function
+
+import timeit
+
+import nengo
+import numpy as np
+
+from nengo_gui.components.sim_control import SimControl
+
+
+class BenchmarkPage(object):
+    def __init__(self, model):
+        self.model = model
+        self.sim = None
+
+    def notify_clients(self):
+        pass
+
+
+def make_model(n_neurons):
+    with nengo.Network(seed=0) as model:
+        stim = nengo.Node(np.sin)
+        a = nengo.Ensemble(n_neurons, 1)
+        b = nengo.Ensemble(n_neurons, 1)
+        nengo.Connection(stim, a)
+        nengo.Connection(a, b, function=np.square)
+    return model
+
+
+def run_model(n_neurons, batch, duration=2.0):
+    model = make_model(n_neurons)
+    page = BenchmarkPage(model)
+    sim_control = SimControl()
+    sim_control.page = page
+    sim_control.target_rate = None
+    sim_control.paused = False
+    sim_control.add_nengo_objects(page)
+
+    with nengo.Simulator(model, progress_bar=False) as sim:
+        page.sim = sim
+        start = timeit.default_timer()
+        while timeit.default_timer() - start < duration:
+            if batch:
+                sim_control.run_batch(sim)
+            else:
+                sim.step()
+        elapsed = timeit.default_timer() - start
+        return sim.time / elapsed, sim_control.steps_per_batch
+
+
+def run(n_neurons=(10, 100, 1000)):
+    results = []
+    for n in n_neurons:
+        step_rate, _ = run_model(n, batch=False)
+        batch_rate, steps_per_batch = run_model(n, batch=True)
+        results.append((n, step_rate, batch_rate, steps_per_batch))
+    return results
+
+
+def main():
+    print("simulated seconds per wall second, unthrottled, dt=0.001")
+    print(
+        "%10s %12s %12s %8s %16s"
+        % ("neurons", "step", "batch", "speedup", "steps per batch")
+    )
+    for n, step_rate, batch_rate, steps_per_batch in run():
+        print(
+            "%10d %12.2f %12.2f %7.2fx %16d"
+            % (n, step_rate, batch_rate, batch_rate / step_rate, steps_per_batch)
+        )
+
+
+if __name__ == "__main__":
+    main()
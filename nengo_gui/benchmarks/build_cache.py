@@ -0,0 +1,77 @@
+"""Measure how long rebuilding a model takes after editing one function.
+
+Builds a chain of high-dimensional ensembles without a cache, then with an
+empty `BuildCache` and again after changing the function of the last
+connection, as when editing a model in the GUI.
+
+Run with ``python -m nengo_gui.benchmarks.build_cache``.
+"""
+
+from __future__ import print_function
+
+import shutil
+import tempfile
+import timeit
+import warnings
+
+import nengo
+import numpy as np
+
+from nengo_gui.build_cache import BuildCache
+
+
+def make_model(n_ensembles, dimensions, function):
+    with nengo.Network(seed=0) as model:
+        prev = nengo.Node(np.zeros(dimensions))
+        for _ in range(n_ensembles):
+            ens = nengo.Ensemble(20 * dimensions, dimensions)
+            nengo.Connection(prev, ens)
+            prev = ens
+        nengo.Connection(prev, nengo.Node(size_in=1), function=function)
+    return model
+
+
+def build(model, cache):
+    start = timeit.default_timer()
+    with cache.cached_samples(model):
+        nengo.Simulator(
+            model,
+            model=nengo.builder.Model(decoder_cache=cache),
+            progress_bar=False,
+            optimize=False,
+        ).close()
+    return timeit.default_timer() - start
+
+
+def run(n_ensembles=50, dimensions=16):
+    # every build assigns the same seeds, like Page.build
+    def model(function):
+        return make_model(n_ensembles, dimensions, function)
+
+    directory = tempfile.mkdtemp()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            # a cache that cannot store anything
+            cache = BuildCache(directory)
+            cache.readonly = True
+            uncached = build(model(np.sum), cache)
+            cache = BuildCache(directory)
+            cold = build(model(np.sum), cache)
+            warm = build(model(np.max), cache)
+        return uncached, cold, warm, cache.get_size_in_bytes()
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    print("build time (s) of 50 ensembles with 16 dimensions, without optimizer")
+    uncached, cold, warm, size = run()
+    print("%16s %8.2f" % ("no cache", uncached))
+    print("%16s %8.2f" % ("empty cache", cold))
+    print("%16s %8.2f" % ("after edit", warm))
+    print("%16s %8.1f" % ("cache size (MB)", size / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Measure the latency of code completions while typing in an SPA model.
+
+The model is made of the SPA tutorials. Typing a few lines at its end
+requests completions after every keystroke:
+
+* in the server process with a new jedi Script per request (as before the
+  `CompletionService`),
+* from the `CompletionService`, waiting for each answer before typing on,
+* from the `CompletionService` with the same requests again (cached),
+* from the `CompletionService` at typing speed, where requests overtaken
+  by the next keystroke are cancelled.
+
+Run with ``python -m nengo_gui.benchmarks.completion``.
+"""
+
+from __future__ import print_function
+
+import glob
+import os.path
+import threading
+import time
+import timeit
+
+import numpy as np
+
+import nengo_gui
+from nengo_gui.completion import CompletionService, Completer
+
+TYPED = (
+    "\nwith model:\n"
+    "    model.memory = spa.State(D, feedback=1)\n"
+    "    ens = nengo.Ensemble(100, dimensions=D)\n"
+    "    nengo.Connection(model.vision.output, ens)\n"
+)
+
+
+def spa_model():
+    pattern = os.path.join(nengo_gui.__path__[0], "examples", "tutorial", "*-spa-*.py")
+    code = []
+    for filename in sorted(glob.glob(pattern)):
+        with open(filename) as f:
+            code.append(f.read())
+    return "\n".join(code)
+
+
+def keystrokes(code):
+    """Yield (code, line, column) after each typed character."""
+    for i in range(1, len(TYPED) + 1):
+        text = code + TYPED[:i]
+        lines = text.split("\n")
+        yield text, len(lines), len(lines[-1])
+
+
+def sequential(complete, requests):
+    latencies = []
+    for code, line, column in requests:
+        start = timeit.default_timer()
+        complete(code, line, column)
+        latencies.append(timeit.default_timer() - start)
+    return latencies, 0
+
+
+def typing(service, requests, interval=0.03):
+    latencies = []
+    cancelled = [0]
+
+    def request(code, line, column):
+        start = timeit.default_timer()
+        # another file name, so that the results are not cached
+        result = service.complete(code, line, column, "typing.py", session="editor")
+        if result:
+            latencies.append(timeit.default_timer() - start)
+        else:
+            cancelled[0] += 1
+
+    threads = []
+    for args in requests:
+        threads.append(threading.Thread(target=request, args=args))
+        threads[-1].start()
+        time.sleep(interval)
+    for thread in threads:
+        thread.join()
+    return latencies, cancelled[0]
+
+
+def run():
+    code = spa_model()
+    requests = list(keystrokes(code))
+    results = []
+
+    fresh = Completer(max_results=0)
+    results.append(
+        (
+            "server process",
+            sequential(lambda *args: fresh.complete(*args, path="model.py"), requests),
+        )
+    )
+
+    service = CompletionService(timeout=60.0)
+    service.start()
+    try:
+        # wait for the warm up
+        service.complete("import nengo\nnengo.Ens", 2, 9)
+
+        def complete(code, line, column):
+            return service.complete(code, line, column, "model.py")
+
+        results.append(("service", sequential(complete, requests)))
+        results.append(("service (cached)", sequential(complete, requests)))
+        results.append(("service (typing)", typing(service, requests)))
+    finally:
+        service.close()
+    return len(requests), len(code.split("\n")), results
+
+
+def main():
+    n_requests, n_lines, results = run()
+    print("%d requests at the end of a model with %d lines" % (n_requests, n_lines))
+    print("%18s %10s %10s %10s" % ("completions", "p50 (ms)", "p99 (ms)", "cancelled"))
+    for name, (latencies, cancelled) in results:
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print("%18s %10.1f %10.1f %10d" % (name, p50 * 1e3, p99 * 1e3, cancelled))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Measure the bytes sent per simulated second by a Value plot.
+
+Feeds a noisy signal through the `RingBuffer` and `Decimator` of a Value
+plot and compares the data sent without decimation to the data sent for a
+plot of a given width in pixels and shown time.
+
+Run with ``python -m nengo_gui.benchmarks.decimation``.
+"""
+
+from __future__ import print_function
+
+import timeit
+
+import numpy as np
+
+from nengo_gui.components.decimator import Decimator
+from nengo_gui.components.ring_buffer import RingBuffer
+
+
+def run_plot(
+    dimensions, resolution, sim_time=10.0, dt=0.001, steps_per_update=20, seed=0
+):
+    rng = np.random.RandomState(seed)
+    buf = RingBuffer(dimensions)
+    decimator = Decimator(buf.row_dtype)
+    decimator.resolution = resolution
+
+    n_bytes = 0
+    process_time = 0.0
+    n_steps = int(round(sim_time / dt))
+    for start in range(0, n_steps, steps_per_update):
+        t = dt * np.arange(start + 1, start + steps_per_update + 1)
+        buf.extend(t, rng.standard_normal((len(t), dimensions)))
+        t0 = timeit.default_timer()
+        chunks = decimator.process(buf.read())
+        process_time += timeit.default_timer() - t0
+        n_bytes += sum(len(chunk) for chunk in chunks)
+    return n_bytes / sim_time, process_time / sim_time
+
+
+def run(dimensions=(1, 16), width=300, shown_times=(0.5, 1.0, 4.0)):
+    results = []
+    for d in dimensions:
+        before, _ = run_plot(d, resolution=0)
+        for shown_time in shown_times:
+            after, cost = run_plot(d, resolution=width / shown_time)
+            results.append((d, shown_time, before, after, cost))
+    return results
+
+
+def main():
+    print("bytes per simulated second for a 300 pixel wide plot at dt=0.001")
+    print(
+        "%10s %10s %12s %12s %8s %18s"
+        % ("dims", "shown (s)", "before", "after", "ratio", "decimate (ms/s)")
+    )
+    for d, shown_time, before, after, cost in run():
+        print(
+            "%10d %10.1f %12d %12d %7.1fx %18.3f"
+            % (d, shown_time, before, after, before / after, cost * 1e3)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+"""Load test of the GUI server without a browser.
+
+Starts a GUI server on a model file and connects to it the way the
+JavaScript client does: the page is requested with the security token,
+websockets are opened to the `SimControl` and the `NetGraph`, and Value,
+Raster and Slider plots are created through the NetGraph (as when they are
+chosen in the context menu of an item) and connected to. The simulation
+is continued, the sliders are moved while it runs and it is paused at the
+end. Reported are
+
+* the simulated time per wall time,
+* the frames and bytes per second received by each kind of component,
+* the latency from `.Value.gather_data` to the arrival of the data at the
+  client (not measured with ``--sim-process``, where it runs in another
+  process),
+* the time from sending ``pause`` to receiving the paused status,
+* the CPU used by the server (on Linux without the client thread and
+  including the simulator process),
+* with ``--metrics``, the metrics of the server (see `nengo_gui.metrics`).
+
+By default a model with ``--ensembles`` ensembles is generated; the model
+file is copied to a temporary directory, so that the created plots are not
+saved to its ``.cfg`` file.
+
+Run with ``python -m nengo_gui.benchmarks.gui_load``; see ``--help`` for
+the options. ``--json`` prints the results for comparisons between runs.
+"""
+
+from __future__ import print_function
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import random
+import re
+import selectors
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import timeit
+
+try:
+    from http.client import HTTPConnection
+    from http.cookies import SimpleCookie
+except ImportError:  # Python 2.7
+    from httplib import HTTPConnection
+    from Cookie import SimpleCookie
+
+import numpy as np
+
+from nengo_gui.gui import GuiThread
+from nengo_gui.guibackend import GuiServerSettings, ModelContext
+from nengo_gui.page import PageSettings
+from nengo_gui.server import MultiplexedWriter, WebSocket, WebSocketFrame
+
+MODEL = """import nengo
+import numpy as np
+
+model = nengo.Network(seed=0)
+with model:
+    stim = nengo.Node([0.0])
+    ensembles = [nengo.Ensemble(%(n_neurons)d, 1) for _ in range(%(n_ensembles)d)]
+    for pre, post in zip([stim] + ensembles[:-1], ensembles):
+        nengo.Connection(pre, post, function=np.sin if pre is not stim else None)
+"""
+
+# the uid of a component in its javascript (SimControl, NetGraph)
+COMPONENT_UID = re.compile(r"new Nengo\.(\w+)\([^;\n]*?\buid\"?:\s*\"?(\d+)")
+
+
+class Connection(object):
+    """A websocket connection to the server, as opened by the browser."""
+
+    def __init__(self, port, resource, cookie):
+        self.socket = socket.create_connection(("localhost", port))
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        host = "localhost:%d" % port
+        request = (
+            "GET %s HTTP/1.1\r\n"
+            "Host: %s\r\n"
+            "Origin: http://%s\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            "Sec-WebSocket-Key: %s\r\n"
+            "Sec-WebSocket-Version: 13\r\n"
+            "Cookie: %s\r\n\r\n" % (resource, host, host, key, cookie)
+        )
+        self.socket.sendall(request.encode("ascii"))
+        response = b""
+        while b"\r\n\r\n" not in response:
+            data = self.socket.recv(4096)
+            if not data:
+                raise IOError("Connection closed during the handshake.")
+            response += data
+        header, rest = response.split(b"\r\n\r\n", 1)
+        if b" 101 " not in header.split(b"\r\n", 1)[0]:
+            raise IOError("Websocket not accepted: %r" % header)
+
+        # the server's websocket parses the frames sent by the server
+        self.ws = WebSocket(self.socket)
+        self.ws._buf += rest
+        self.ws.set_blocking(False)
+        self.n_frames = 0
+        self.n_bytes = 0
+
+    def send(self, text):
+        # frames sent by clients are masked
+        mask = os.urandom(4)
+        payload = text.encode("utf-8")
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(bytearray(payload)))
+        frame = bytearray(
+            WebSocketFrame(1, 0, WebSocketFrame.OP_TEXT, 0, masked).pack()
+        )
+        header_len = len(frame) - len(masked)
+        frame[1] |= 0x80
+        self.socket.sendall(bytes(frame[:header_len]) + mask + masked)
+
+    def read_frames(self):
+        frames = []
+        frame = self.ws.read_frame()
+        while frame is not None:
+            self.n_frames += 1
+            self.n_bytes += len(frame.data)
+            frames.append(frame)
+            frame = self.ws.read_frame()
+        return frames
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def close(self):
+        self.socket.close()
+
+
+class Channel(object):
+    """The messages received for one component."""
+
+    def __init__(self, kind, uid):
+        self.kind = kind
+        self.uid = uid
+        self.n_frames = 0
+        self.n_bytes = 0
+        self.received = []  # (arrival time, data), unless handled by on_data
+        self.on_data = None
+
+    def receive(self, now, data):
+        self.n_frames += 1
+        self.n_bytes += len(data)
+        if self.on_data is not None:
+            self.on_data(now, data)
+        else:
+            self.received.append((now, data))
+
+    def pop(self):
+        received, self.received = self.received, []
+        return received
+
+
+class Client(object):
+    """Opens the websockets of the page, one per component or shared."""
+
+    def __init__(self, port, token, page_socket=False):
+        self.port = port
+        self.token = token
+        self.page_socket = page_socket
+        self.selector = selectors.DefaultSelector()
+        self.connections = []
+        self.channels = {}  # connection or (connection, n) -> Channel
+        self.page = None
+
+        http = HTTPConnection("localhost", port)
+        http.request("GET", "/?token=%s" % token)
+        response = http.getresponse()
+        self.html = response.read().decode("utf-8")
+        assert response.status == 200, response.status
+        cookie = SimpleCookie()
+        for header in response.msg.get_all("Set-Cookie") or []:
+            cookie.load(header)
+        self.cookie = "; ".join("%s=%s" % (k, v.value) for k, v in cookie.items())
+        http.close()
+
+        self.uids = dict(COMPONENT_UID.findall(self.html))
+
+    def get_metrics(self):
+        http = HTTPConnection("localhost", self.port)
+        http.request("GET", "/metrics?format=json&token=%s" % self.token)
+        response = http.getresponse()
+        data = response.read().decode("utf-8")
+        assert response.status == 200, response.status
+        http.close()
+        return json.loads(data)
+
+    def _connect(self, resource):
+        resource += "&token=%s" % self.token
+        connection = Connection(self.port, resource, self.cookie)
+        self.connections.append(connection)
+        self.selector.register(connection, selectors.EVENT_READ)
+        return connection
+
+    def open(self, kind, uid):
+        channel = Channel(kind, uid)
+        if self.page_socket:
+            if self.page is None:
+                self.page = self._connect("/viz_component?page=1")
+            n = len(self.channels)
+            self.page.send("open:%d:%s" % (n, uid))
+            self.channels[self.page, n] = channel
+            channel.send = lambda msg: self.page.send("%d:%s" % (n, msg))
+        else:
+            connection = self._connect("/viz_component?uid=%s" % uid)
+            self.channels[connection] = channel
+            channel.send = connection.send
+        return channel
+
+    def poll(self, timeout):
+        """Receive the pending frames and dispatch them to the channels."""
+        for key, _ in self.selector.select(timeout):
+            connection = key.fileobj
+            frames = connection.read_frames()
+            now = timeit.default_timer()
+            for frame in frames:
+                if connection is self.page:
+                    self._demultiplex(now, frame.data)
+                else:
+                    self.channels[connection].receive(now, frame.data)
+
+    def _demultiplex(self, now, data):
+        header = MultiplexedWriter.record_header
+        data = memoryview(bytes(data))
+        offset = 0
+        while offset < len(data):
+            n, opcode, length = header.unpack_from(data, offset)
+            offset += header.size
+            payload = data[offset : offset + length]
+            offset += length
+            if opcode == WebSocketFrame.OP_TEXT:
+                payload = bytes(payload).decode("utf-8")
+            self.channels[self.page, n].receive(now, payload)
+
+    def wait_for(self, channel, condition, timeout=30.0):
+        """Poll until ``condition`` returns something for a received message."""
+        end = timeit.default_timer() + timeout
+        while timeit.default_timer() < end:
+            for _, data in channel.pop():
+                result = condition(data)
+                if result is not None:
+                    return result
+            self.poll(0.01)
+        raise RuntimeError("Timed out waiting for %s." % channel.kind)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.selector.close()
+
+
+def netgraph_messages(data):
+    if not isinstance(data, str):
+        return []
+    msg = json.loads(data)
+    return msg["messages"] if msg.get("type", None) == "update" else [msg]
+
+
+def cpu_time(pid="self", tid=None):
+    """User and system time in seconds of a process or thread (Linux)."""
+    path = "/proc/%s/stat" % pid if tid is None else "/proc/self/task/%d/stat" % tid
+    try:
+        with open(path) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (IOError, OSError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / float(os.sysconf("SC_CLK_TCK"))
+
+
+class CpuMeter(object):
+    """CPU time of this process without the client thread, with children."""
+
+    def __init__(self):
+        self.tid = getattr(threading, "get_native_id", lambda: None)()
+        self.linux = self.tid is not None and cpu_time() is not None
+
+    def read(self):
+        if not self.linux:
+            return time.process_time()
+        total = cpu_time() - cpu_time(tid=self.tid)
+        for child in multiprocessing.active_children():
+            total += cpu_time(pid=child.pid) or 0.0
+        return total
+
+
+def create_graph(client, netgraph, kind, uid):
+    netgraph.send(
+        json.dumps(
+            dict(
+                act="create_graph", uid=uid, type=kind, x=0, y=0, width=0.1, height=0.1
+            )
+        )
+    )
+
+    def created(data):
+        for msg in netgraph_messages(data):
+            if msg.get("type", None) == "js" and msg.get("uid", None) == uid:
+                return COMPONENT_UID.search(msg["code"]).group(2)
+        return None
+
+    return client.open(kind, client.wait_for(netgraph, created))
+
+
+def run(
+    filename=None,
+    n_values=10,
+    n_rasters=2,
+    n_sliders=1,
+    duration=5.0,
+    n_ensembles=10,
+    n_neurons=50,
+    page_socket=False,
+    sim_process=False,
+    batch_steps=False,
+    slider_rate=20.0,
+    metrics=False,
+):
+    directory = tempfile.mkdtemp()
+    if filename is None:
+        model_file = os.path.join(directory, "gui_load.py")
+        with open(model_file, "w") as f:
+            f.write(MODEL % dict(n_ensembles=n_ensembles, n_neurons=n_neurons))
+    else:
+        # imports next to the model file still work
+        sys.path.insert(0, os.path.dirname(os.path.abspath(filename)))
+        model_file = os.path.join(directory, os.path.basename(filename))
+        shutil.copy(filename, model_file)
+
+    gui = GuiThread(
+        ModelContext(filename=model_file),
+        GuiServerSettings(("localhost", 0), auto_shutdown=0, metrics=metrics),
+        PageSettings(
+            page_socket=page_socket, sim_process=sim_process, batch_steps=batch_steps
+        ),
+    )
+    gui.start()
+    gui.wait_for_startup()
+    client = None
+    try:
+        client = Client(gui.server.server_port, gui.server.auth_token, page_socket)
+        sim_control = client.open("SimControl", client.uids["SimControl"])
+        netgraph = client.open("NetGraph", client.uids["NetGraph"])
+
+        # the items of the model, as shown by the NetGraph
+        items = []
+
+        def shown(data):
+            items.extend(m for m in netgraph_messages(data) if "pos" in m)
+            return True if any(i["type"] == "ens" for i in items) else None
+
+        client.wait_for(netgraph, shown)
+        client.poll(0.5)
+        for _, data in netgraph.pop():
+            shown(data)
+        ensembles = [i["uid"] for i in items if i["type"] == "ens"]
+        nodes = [
+            i["uid"]
+            for i in items
+            if i["type"] == "node" and not i.get("passthrough", False)
+        ]
+
+        channels = []
+        for i in range(n_values):
+            channels.append(
+                create_graph(client, netgraph, "Value", ensembles[i % len(ensembles)])
+            )
+        for i in range(n_rasters):
+            channels.append(
+                create_graph(client, netgraph, "Raster", ensembles[i % len(ensembles)])
+            )
+        sliders = [
+            create_graph(client, netgraph, "Slider", uid) for uid in nodes[:n_sliders]
+        ]
+        channels.extend(sliders)
+
+        # latency of the data of the first Value, from gather_data to the
+        # client, unless it is gathered in the simulator process
+        gathered = {}
+        latencies = []
+        values = [c for c in channels if c.kind == "Value"]
+        if len(values) > 0 and not sim_process:
+            value = gui.server.component_uids[int(values[0].uid)]
+            gather_data = value.gather_data
+
+            def timed_gather_data(t, x):
+                gathered[np.float32(t)] = timeit.default_timer()
+                return gather_data(t, x)
+
+            value.gather_data = timed_gather_data
+            row_dtype = value.data.row_dtype
+
+            def on_value(now, data):
+                for t in np.frombuffer(bytes(data), dtype=row_dtype)["t"]:
+                    start = gathered.pop(t, None)
+                    if start is not None:
+                        latencies.append(now - start)
+
+            values[0].on_data = on_value
+        for channel in channels:
+            if channel.on_data is None:
+                channel.on_data = lambda now, data: None
+
+        sim_times = []  # (arrival time, simulated time)
+
+        def on_sim_control(now, data):
+            if isinstance(data, str):
+                sim_control.received.append((now, data))
+            else:
+                sim_times.append((now, float(np.frombuffer(bytes(data), "<f4")[0])))
+
+        sim_control.on_data = on_sim_control
+
+        # reset the counts of the setup and run
+        for channel in client.connections + channels + [sim_control]:
+            channel.n_frames = channel.n_bytes = 0
+        cpu = CpuMeter()
+        start_cpu = cpu.read()
+        start = timeit.default_timer()
+        sim_control.send("continue")
+        next_slider = start
+        while timeit.default_timer() - start < duration:
+            now = timeit.default_timer()
+            if len(sliders) > 0 and slider_rate > 0 and now >= next_slider:
+                for slider in sliders:
+                    slider.send("0,%g" % random.uniform(-1, 1))
+                next_slider = now + 1.0 / slider_rate
+            client.poll(0.005)
+        elapsed = timeit.default_timer() - start
+        server_cpu = cpu.read() - start_cpu
+
+        sim_control.pop()
+        pause_start = timeit.default_timer()
+        sim_control.send("pause")
+        client.wait_for(
+            sim_control, lambda data: True if data == "status:paused" else None
+        )
+        pause_latency = timeit.default_timer() - pause_start
+
+        running = [(w, t) for w, t in sim_times if t > 0]
+        if len(running) > 1:
+            sim_rate = (running[-1][1] - running[0][1]) / (
+                running[-1][0] - running[0][0]
+            )
+        else:
+            sim_rate = 0.0
+
+        kinds = {}
+        for channel in [sim_control] + channels:
+            n_frames, n_bytes = kinds.get(channel.kind, (0, 0))
+            kinds[channel.kind] = (
+                n_frames + channel.n_frames,
+                n_bytes + channel.n_bytes,
+            )
+        return dict(
+            duration=elapsed,
+            sim_rate=sim_rate,
+            websockets=len(client.connections),
+            frames_per_second=sum(c.n_frames for c in client.connections) / elapsed,
+            bytes_per_second=sum(c.n_bytes for c in client.connections) / elapsed,
+            components=dict(
+                (
+                    kind,
+                    dict(frames_per_second=f / elapsed, bytes_per_second=b / elapsed),
+                )
+                for kind, (f, b) in kinds.items()
+            ),
+            latency=(
+                dict(
+                    zip(("p50", "p99", "max"), np.percentile(latencies, [50, 99, 100]))
+                )
+                if len(latencies) > 0
+                else None
+            ),
+            pause_latency=pause_latency,
+            server_cpu=server_cpu / elapsed,
+            metrics=client.get_metrics() if metrics else None,
+        )
+    finally:
+        if client is not None:
+            client.close()
+        gui.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("filename", nargs="?", help="model file (default: generated)")
+    parser.add_argument("--values", type=int, default=10, help="Value plots")
+    parser.add_argument("--rasters", type=int, default=2, help="Raster plots")
+    parser.add_argument("--sliders", type=int, default=1, help="Sliders")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds")
+    parser.add_argument("--ensembles", type=int, default=10, help="generated model")
+    parser.add_argument("--neurons", type=int, default=50, help="generated model")
+    parser.add_argument("--page-socket", action="store_true")
+    parser.add_argument("--sim-process", action="store_true")
+    parser.add_argument("--batch-steps", action="store_true")
+    parser.add_argument("--metrics", action="store_true", help="server metrics")
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args(argv)
+
+    results = run(
+        filename=args.filename,
+        n_values=args.values,
+        n_rasters=args.rasters,
+        n_sliders=args.sliders,
+        duration=args.duration,
+        n_ensembles=args.ensembles,
+        n_neurons=args.neurons,
+        page_socket=args.page_socket,
+        sim_process=args.sim_process,
+        batch_steps=args.batch_steps,
+        metrics=args.metrics,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+
+    print("simulated time per second %10.3f" % results["sim_rate"])
+    print("websockets                %10d" % results["websockets"])
+    print("frames per second         %10.1f" % results["frames_per_second"])
+    print("kB per second             %10.1f" % (results["bytes_per_second"] / 1e3))
+    print("server CPU %%              %10.1f" % (100.0 * results["server_cpu"]))
+    print("pause latency (ms)        %10.1f" % (results["pause_latency"] * 1e3))
+    if results["latency"] is not None:
+        print(
+            "latency p50/p99/max (ms)  %10s"
+            % "/".join(
+                "%.1f" % (results["latency"][k] * 1e3) for k in ("p50", "p99", "max")
+            )
+        )
+    print()
+    print("%12s %12s %12s" % ("component", "frames/s", "kB/s"))
+    for kind, stats in sorted(results["components"].items()):
+        print(
+            "%12s %12.1f %12.1f"
+            % (kind, stats["frames_per_second"], stats["bytes_per_second"] / 1e3)
+        )
+
+    if results["metrics"] is not None:
+        # the timers of the server, summed over their labels
+        timers = {}
+        for sample in results["metrics"]:
+            name = sample["name"]
+            for suffix, i in (("_seconds_count", 0), ("_seconds_sum", 1)):
+                if name.endswith(suffix):
+                    totals = timers.setdefault(name[: -len(suffix)], [0, 0.0])
+                    totals[i] += sample["value"]
+        print()
+        print("%34s %10s %12s" % ("timer", "calls", "mean (us)"))
+        for name, (count, total) in sorted(timers.items()):
+            mean = total / count * 1e6 if count > 0 else 0.0
+            print("%34s %10d %12.1f" % (name, count, mean))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Measure the requests per second served for static files and completions.
+
+Starts a GUI server and lets concurrent clients request static files and
+code completions, once opening a new connection for every request and
+once reusing a persistent (keep-alive) connection per client.
+
+Run with ``python -m nengo_gui.benchmarks.http_load``.
+"""
+
+from __future__ import print_function
+
+import os.path
+import threading
+import timeit
+
+try:
+    from http.client import HTTPConnection
+    from urllib.parse import urlencode
+except ImportError:  # Python 2.7
+    from httplib import HTTPConnection
+    from urllib import urlencode
+
+import numpy as np
+
+import nengo_gui
+from nengo_gui.gui import GuiThread
+from nengo_gui.guibackend import GuiServerSettings, ModelContext
+
+STATIC_URLS = [
+    "/static/nengo.js",
+    "/static/main.css",
+    "/static/components/value.js",
+    "/static/lib/js/d3.v3.min.js",
+    "/favicon.ico",
+]
+
+COMPLETION_CODE = "import nengo\nmodel = nengo.Network()\nwith model:\n    a = nengo.En"
+
+
+def completion_urls(token):
+    code = COMPLETION_CODE.split("\n")
+    query = urlencode(
+        dict(
+            token=token,
+            code=COMPLETION_CODE,
+            row=len(code) - 1,
+            col=len(code[-1]),
+            filename="load.py",
+        )
+    )
+    return ["/complete?" + query]
+
+
+def client(port, urls, n_requests, keep_alive, latencies):
+    conn = None
+    headers = {"Accept-Encoding": "gzip"}
+    if not keep_alive:
+        headers["Connection"] = "close"
+    for i in range(n_requests):
+        start = timeit.default_timer()
+        if conn is None:
+            conn = HTTPConnection("localhost", port)
+        conn.request("GET", urls[i % len(urls)], headers=headers)
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200, response.status
+        if not keep_alive:
+            conn.close()
+            conn = None
+        latencies.append(timeit.default_timer() - start)
+    if conn is not None:
+        conn.close()
+
+
+def load(port, urls, n_clients, n_requests, keep_alive):
+    latencies = []
+    threads = [
+        threading.Thread(
+            target=client, args=(port, urls, n_requests, keep_alive, latencies)
+        )
+        for _ in range(n_clients)
+    ]
+    start = timeit.default_timer()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = timeit.default_timer() - start
+    return len(latencies) / duration, np.percentile(latencies, [50, 99])
+
+
+def run(clients=(1, 8, 32), n_requests=200, n_completions=20):
+    filename = os.path.join(nengo_gui.__path__[0], "examples", "default.py")
+    gui = GuiThread(
+        ModelContext(filename=filename),
+        GuiServerSettings(("localhost", 0), auto_shutdown=0),
+    )
+    gui.start()
+    gui.wait_for_startup()
+    results = []
+    try:
+        port = gui.server.server_port
+        scenarios = [
+            ("static", STATIC_URLS, n_requests),
+            ("complete", completion_urls(gui.server.auth_token), n_completions),
+        ]
+        for name, urls, n in scenarios:
+            for n_clients in clients:
+                for keep_alive in (False, True):
+                    rate, (p50, p99) = load(port, urls, n_clients, n, keep_alive)
+                    results.append((name, n_clients, keep_alive, rate, p50, p99))
+    finally:
+        gui.shutdown()
+    return results
+
+
+def main():
+    print(
+        "%10s %8s %11s %10s %10s %10s"
+        % ("resource", "clients", "keep-alive", "req/s", "p50 (ms)", "p99 (ms)")
+    )
+    for name, n_clients, keep_alive, rate, p50, p99 in run():
+        print(
+            "%10s %8d %11s %10.0f %10.2f %10.2f"
+            % (name, n_clients, keep_alive, rate, p50 * 1e3, p99 * 1e3)
+        )
+
+
+if __name__ == "__main__":
+    main()
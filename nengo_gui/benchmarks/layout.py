@@ -0,0 +1,85 @@
+"""Measure the time needed for the automatic layout of large networks.
+
+Generated networks of ensembles in ranks, with connections to the next
+ranks (feedforward) and additionally back to earlier ranks (recurrent),
+are laid out
+
+* with grandalf's `SugiyamaLayout` (as before `layered_layout`), and
+* with `layered_layout`, with and without a time budget.
+
+Run with ``python -m nengo_gui.benchmarks.layout``.
+"""
+
+from __future__ import print_function
+
+import timeit
+
+import nengo
+import numpy as np
+
+from nengo_gui.layout import Layout
+
+
+def generate(n_ensembles, recurrent, width=10, seed=0):
+    rng = np.random.RandomState(seed)
+    model = nengo.Network()
+    with model:
+        ens = [nengo.Ensemble(10, 1) for _ in range(n_ensembles)]
+        for i, pre in enumerate(ens):
+            rank = i // width
+            for _ in range(2):
+                # mostly to the next rank, sometimes skipping ranks
+                target = (rank + 1 + rng.geometric(0.6) - 1) * width
+                target += rng.randint(width)
+                if target < n_ensembles:
+                    nengo.Connection(pre, ens[target])
+            if recurrent and rank > 0 and rng.rand() < 0.2:
+                nengo.Connection(pre, ens[rng.randint(rank * width)])
+    return model
+
+
+def lay_out(model, engine, time_budget=float("inf")):
+    layout = Layout(model, engine=engine, time_budget=time_budget)
+    start = timeit.default_timer()
+    layout.make_layout(model)
+    return timeit.default_timer() - start
+
+
+def run(sizes=(50, 100, 200, 500), max_sugiyama=500):
+    results = []
+    for recurrent in (False, True):
+        for n in sizes:
+            model = generate(n, recurrent)
+            times = [
+                lay_out(model, "sugiyama") if n <= max_sugiyama else float("nan"),
+                lay_out(model, "layered"),
+                lay_out(model, "layered", time_budget=0.1),
+            ]
+            results.append((recurrent, n, len(model.connections), times))
+    return results
+
+
+def main():
+    print(
+        "%10s %10s %12s %14s %14s %14s"
+        % (
+            "network",
+            "ensembles",
+            "connections",
+            "grandalf (s)",
+            "layered (s)",
+            "0.1 s budget",
+        )
+    )
+    for recurrent, n, n_connections, times in run():
+        print(
+            "%10s %10d %12d %14.3f %14.3f %14.3f"
+            % (
+                ("recurrent" if recurrent else "feedfwd", n, n_connections)
+                + tuple(times)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Measure the time the NetGraph needs to match the items of a reloaded model.
+
+Synthetic models of networks with chains of ensembles are reloaded with
+one changed ensemble and one renamed network. The items displayed for the
+old model are matched to the new model
+
+* by evaluating the uid of every item in the new locals (as before
+  `NetGraph.diff`), and
+* by looking them up in an index of the new model built once, comparing
+  the cached fingerprints of the displayed items.
+
+Run with ``python -m nengo_gui.benchmarks.netgraph_reload``.
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from nengo_gui.components.netgraph import NetGraph
+from nengo_gui.namefinder import NameFinder
+
+CODE = """
+import nengo
+model = nengo.Network()
+with model:
+    for i in range(%(n_networks)d):
+        with nengo.Network(label=%(label)r if i == 0 else None):
+            ens = [
+                nengo.Ensemble(%(n_neurons)d if i == j == 0 else 10, 1)
+                for j in range(10)
+            ]
+            for pre, post in zip(ens[:-1], ens[1:]):
+                nengo.Connection(pre, post)
+"""
+
+# a network, 10 ensembles and 9 connections
+OBJECTS_PER_NETWORK = 20
+
+
+def execute(n_networks, n_neurons, label):
+    scope = {}
+    exec(CODE % dict(n_networks=n_networks, n_neurons=n_neurons, label=label), scope)
+    return scope, NameFinder(scope, scope["model"]).known_name
+
+
+def eval_diff(net_graph, scope, known_name):
+    removed = []
+    kept = []
+    for uid, old_item in net_graph.uids.items():
+        try:
+            new_item = eval(uid, scope)
+        except Exception:
+            new_item = None
+        if known_name.get(new_item, None) != uid:
+            new_item = None
+        same_class = any(
+            isinstance(new_item, cls) and isinstance(old_item, cls)
+            for cls in NetGraph.object_classes
+        )
+        if (
+            new_item is None
+            or not same_class
+            or net_graph.get_extra_info(new_item) != net_graph.get_extra_info(old_item)
+        ):
+            removed.append((uid, old_item))
+        else:
+            kept.append((uid, old_item, new_item))
+    return removed, kept
+
+
+def index_diff(net_graph, known_name):
+    return net_graph.diff(NetGraph.index_model(known_name))
+
+
+def reload_model(n_objects, repeat=3):
+    n_networks = n_objects // OBJECTS_PER_NETWORK
+    _, old_names = execute(n_networks, n_neurons=10, label=None)
+    scope, new_names = execute(n_networks, n_neurons=20, label="renamed")
+
+    net_graph = NetGraph()
+    for obj, uid in old_names.items():
+        if isinstance(obj, NetGraph.object_classes) and uid != "model":
+            net_graph.uids[uid] = obj
+            # as computed when the items are sent to the client
+            net_graph.fingerprints[uid] = net_graph.fingerprint(obj)
+
+    results = []
+    for diff in (
+        lambda: eval_diff(net_graph, scope, new_names),
+        lambda: index_diff(net_graph, new_names),
+    ):
+        times = []
+        for _ in range(repeat):
+            start = timeit.default_timer()
+            removed, kept = diff()
+            times.append(timeit.default_timer() - start)
+        results.append((min(times), len(removed)))
+    assert results[0][1] == results[1][1]
+    return len(net_graph.uids), results[0][0], results[1][0], results[1][1]
+
+
+def run(n_objects=(100, 1000, 5000, 20000)):
+    return [reload_model(n) for n in n_objects]
+
+
+def main():
+    print(
+        "%10s %10s %10s %8s %8s"
+        % ("items", "eval (ms)", "index (ms)", "speedup", "removed")
+    )
+    for n_items, eval_time, index_time, n_removed in run():
+        print(
+            "%10d %10.1f %10.1f %7.1fx %8d"
+            % (
+                n_items,
+                eval_time * 1e3,
+                index_time * 1e3,
+                eval_time / index_time,
+                n_removed,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
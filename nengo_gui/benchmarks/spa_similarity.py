@@ -0,0 +1,126 @@
+"""Measure the cost of sending SPA similarities for vocabularies of any size.
+
+For each time step, the similarities of the output of a module to all keys
+of a vocabulary are
+
+* formatted into a text message (as before the binary similarity frames),
+* computed into a ring buffer and sent as float16 frames of all steps
+  between two updates of the client.
+
+Run with ``python -m nengo_gui.benchmarks.spa_similarity``.
+"""
+
+from __future__ import print_function
+
+import timeit
+
+import nengo.spa as spa
+import numpy as np
+
+from nengo_gui.components.spa_similarity import SpaSimilarity
+
+DIMENSIONS = 64
+# simulator steps between two updates of the client
+STEPS_PER_UPDATE = 20
+
+
+class Config(object):
+    show_pairs = False
+
+
+class Page(object):
+    def configure_buffer(self, buffer):
+        pass
+
+
+class Client(object):
+    def __init__(self):
+        self.n_bytes = 0
+
+    def write_text(self, msg):
+        self.n_bytes += len(msg)
+
+    def write_binary(self, frame):
+        self.n_bytes += len(frame)
+
+
+def text_messages(vocab, xs):
+    messages = []
+    for t, x in enumerate(xs):
+        key_similarity = np.dot(vocab.vectors, x)
+        simi_list = ["{:.2f}".format(simi) for simi in key_similarity]
+        messages.append('["data_msg", %g, %s]' % (t * 0.001, ",".join(simi_list)))
+    return sum(len(msg) for msg in messages)
+
+
+def binary_frames(similarity, xs):
+    client = Client()
+    for t, x in enumerate(xs):
+        similarity.gather_data(t * 0.001, x)
+        if t % STEPS_PER_UPDATE == STEPS_PER_UPDATE - 1:
+            similarity.update_client(client)
+    similarity.update_client(client)
+    return client.n_bytes
+
+
+def compare(n_keys, n_steps=200, repeat=3):
+    rng = np.random.RandomState(0)
+    with spa.SPA() as model:
+        model.state = spa.State(DIMENSIONS)
+    vocab = model.get_output_vocab("state")
+    for i in range(n_keys):
+        vocab.add("K%d" % i, rng.randn(DIMENSIONS) / np.sqrt(DIMENSIONS))
+    xs = rng.randn(n_steps, DIMENSIONS) / np.sqrt(DIMENSIONS)
+
+    similarity = SpaSimilarity(model.state, args="default")
+    similarity.page = Page()
+    similarity.config = Config()
+    similarity.gather_data(0.0, xs[0])  # compute the matrix
+    similarity.update_client(Client())
+
+    results = []
+    for send in (
+        lambda: text_messages(vocab, xs),
+        lambda: binary_frames(similarity, xs),
+    ):
+        times = []
+        for _ in range(repeat):
+            start = timeit.default_timer()
+            n_bytes = send()
+            times.append(timeit.default_timer() - start)
+        results.append((min(times) / n_steps, n_bytes / float(n_steps)))
+    return results
+
+
+def run(n_keys=(10, 100, 1000, 5000)):
+    return [(n, compare(n)) for n in n_keys]
+
+
+def main():
+    print(
+        "%8s %12s %12s %16s %16s %8s"
+        % (
+            "keys",
+            "text (us)",
+            "binary (us)",
+            "text (B/step)",
+            "binary (B/step)",
+            "speedup",
+        )
+    )
+    for n_keys, ((text_time, text_bytes), (binary_time, binary_bytes)) in run():
+        print(
+            "%8d %12.1f %12.1f %16.0f %16.0f %7.1fx"
+            % (
+                n_keys,
+                text_time * 1e6,
+                binary_time * 1e6,
+                text_bytes,
+                binary_bytes,
+                text_time / binary_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Measure the bytes and CPU time saved by permessage-deflate per message type.
+
+Each type of message is sent as a stream of typical messages through a
+`.PerMessageDeflate` with the default size thresholds and with all messages
+compressed, and compared to sending them uncompressed.
+
+Run with ``python -m nengo_gui.benchmarks.ws_compression``.
+"""
+
+from __future__ import print_function
+
+import json
+import timeit
+
+import numpy as np
+
+from nengo_gui.components.raster import encode_spikes
+from nengo_gui.server import PerMessageDeflate, WebSocketFrame
+
+
+def netgraph_messages(n_objects=200, seed=0):
+    rng = np.random.RandomState(seed)
+    for i in range(n_objects):
+        info = dict(
+            uid="model.ensembles[%d]" % i,
+            label="ens%d" % i,
+            pos=list(rng.rand(2)),
+            type="ens",
+            size=[0.05, 0.05],
+            parent="model",
+            dimensions=int(rng.randint(1, 4)),
+            n_neurons=int(rng.randint(10, 500)),
+            sp_targets=[],
+        )
+        yield WebSocketFrame.create_text_frame(json.dumps(info))
+        info = dict(
+            uid="model.connections[%d]" % i,
+            pre=["model.ensembles[%d]" % i],
+            post=["model.ensembles[%d]" % ((i + 1) % n_objects)],
+            type="conn",
+            parent="model",
+            kind="normal",
+        )
+        yield WebSocketFrame.create_text_frame(json.dumps(info))
+
+
+def similarity_messages(n_keys=20, n_messages=500, seed=0):
+    rng = np.random.RandomState(seed)
+    for i in range(n_messages):
+        values = ",".join("%.2f" % v for v in rng.uniform(-1, 1, n_keys))
+        yield WebSocketFrame.create_text_frame(
+            '["data_msg", %g, %s]' % (0.001 * i, values)
+        )
+
+
+def status_messages(n_messages=100):
+    backends = "".join("<option>%s</option>" % b for b in ("nengo", "nengo_ocl"))
+    for i in range(n_messages):
+        yield WebSocketFrame.create_text_frame("status:running")
+        if i % 10 == 0:
+            yield WebSocketFrame.create_text_frame("sims:" + backends)
+
+
+def value_messages(dims, steps_per_message, n_messages=500, seed=0):
+    rng = np.random.RandomState(seed)
+    for i in range(n_messages):
+        t = 0.001 * (np.arange(steps_per_message) + i * steps_per_message)
+        rows = np.hstack([t[:, None], rng.standard_normal((steps_per_message, dims))])
+        yield WebSocketFrame.create_binary_frame(rows.astype("<f4").tobytes())
+
+
+def raster_messages(n_neurons, steps_per_message, n_messages=200, seed=0):
+    rng = np.random.RandomState(seed)
+    for i in range(n_messages):
+        t = 0.001 * (np.arange(steps_per_message) + i * steps_per_message)
+        spikes = rng.rand(steps_per_message, n_neurons) < 0.02
+        bits = np.packbits(spikes, axis=1, bitorder="little")
+        yield WebSocketFrame.create_binary_frame(encode_spikes(t, bits, n_neurons))
+
+
+STREAMS = [
+    ("netgraph json", netgraph_messages),
+    ("spa similarity", similarity_messages),
+    ("status/sims", status_messages),
+    ("value 1d x 10", lambda: value_messages(1, 10)),
+    ("value 16d x 100", lambda: value_messages(16, 100)),
+    ("raster 100 x 10", lambda: raster_messages(100, 10)),
+    ("raster 2000 x 50", lambda: raster_messages(2000, 50)),
+]
+
+
+def send(frames, deflate=None):
+    """Return the payload bytes sent and the CPU time per message."""
+    n_bytes = 0
+    start = timeit.default_timer()
+    for frame in frames:
+        if deflate is not None:
+            frame = deflate.compress(frame)
+        n_bytes += len(frame.data)
+    return n_bytes, (timeit.default_timer() - start) / len(frames)
+
+
+def run():
+    results = []
+    for name, stream in STREAMS:
+        frames = list(stream())
+        raw, _ = send(frames)
+        default, default_cost = send(frames, PerMessageDeflate())
+        always = PerMessageDeflate()
+        always.min_text_size = always.min_binary_size = 0
+        compressed, always_cost = send(frames, always)
+        results.append(
+            (name, len(frames), raw, default, default_cost, compressed, always_cost)
+        )
+    return results
+
+
+def main():
+    print(
+        "%18s %8s %10s %18s %18s"
+        % ("messages", "count", "raw bytes", "default (us/msg)", "always (us/msg)")
+    )
+    for name, n, raw, default, default_cost, compressed, always_cost in run():
+        print(
+            "%18s %8d %10d %10d %7.1f %10d %7.1f"
+            % (name, n, raw, default, default_cost * 1e6, compressed, always_cost * 1e6)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare WebSocket frame parsing throughput against the previous parser.
+
+Run with ``python -m nengo_gui.benchmarks.ws_frames``.
+"""
+
+from __future__ import print_function
+
+import os
+import timeit
+
+from nengo_gui.server import WebSocketFrame
+
+
+def legacy_parse(data):
+    """The byte-wise parser used before frames were unmasked vectorized."""
+    offset = 0
+
+    opcode = data[0] & 0x0F
+    masked = (data[1] >> 7) & 0x01
+    datalen = data[1] & 0x7F
+    mask = b"\x00\x00\x00\x00"
+    offset += 2
+
+    if datalen == 126:
+        datalen = WebSocketFrame._to_int(data[offset : offset + 2], 2)
+        offset += 2
+    elif datalen == 127:
+        datalen = WebSocketFrame._to_int(data[offset : offset + 8], 8)
+        offset += 8
+
+    if masked:
+        mask = data[offset : offset + 4]
+        offset += 4
+
+    size = offset + datalen
+    masked_data = data[offset:size]
+    unmasked_data = [masked_data[i] ^ mask[i % 4] for i in range(len(masked_data))]
+    return opcode, bytearray(unmasked_data), size
+
+
+def legacy_read(buf):
+    """Consume all frames from buf by re-slicing, as WebSocket used to."""
+    while len(buf) > 0:
+        _, _, size = legacy_parse(buf)
+        buf = buf[size:]
+
+
+def current_read(buf):
+    offset = 0
+    while offset < len(buf):
+        _, size = WebSocketFrame.parse(buf, offset)
+        offset += size
+
+
+def masked_frame(payload):
+    mask = os.urandom(4)
+    frame = WebSocketFrame.create_binary_frame(
+        bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    ).pack()
+    header_len = len(frame) - len(payload)
+    header = bytearray(frame[:header_len])
+    header[1] |= 0x80
+    return bytes(header) + mask + frame[header_len:]
+
+
+def run(sizes=(10, 1024, 1024 * 1024), total_bytes=4 * 1024 * 1024):
+    results = []
+    for size in sizes:
+        n_frames = max(total_bytes // max(size, 1), 1)
+        n_frames = min(n_frames, 20000)
+        buf = bytearray(masked_frame(os.urandom(size)) * n_frames)
+        for name, fn in (("legacy", legacy_read), ("current", current_read)):
+            if name == "legacy" and size * n_frames > total_bytes // 4:
+                # the legacy parser is too slow to parse the full buffer
+                n = max(n_frames // 16, 1)
+                sub = buf[: len(buf) // n_frames * n]
+            else:
+                n, sub = n_frames, buf
+            t = min(timeit.repeat(lambda: fn(bytearray(sub)), number=1, repeat=3))
+            results.append((size, name, n / t))
+    return results
+
+
+def main():
+    print("%10s %10s %14s" % ("payload", "parser", "frames/s"))
+    for size, name, rate in run():
+        print("%10d %10s %14.1f" % (size, name, rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Measure the CPU used by idle component websockets.
+
+Opens N websocket connections that have nothing to send and compares the
+process CPU time of the `WebSocketLoop` against the previous one thread per
+websocket polling every 10 ms.
+
+Run with ``python -m nengo_gui.benchmarks.ws_idle``.
+"""
+
+from __future__ import print_function
+
+import socket
+import threading
+import time
+
+from nengo_gui.server import WebSocket, WebSocketLoop
+
+
+class IdleChannel(object):
+    def receive(self, ws, frame):
+        return True
+
+    def update(self, ws):
+        pass
+
+    def close(self, ws, error):
+        pass
+
+
+def open_websockets(n):
+    pairs = [socket.socketpair() for _ in range(n)]
+    websockets = []
+    for server_side, _ in pairs:
+        ws = WebSocket(server_side)
+        ws.set_blocking(False)
+        websockets.append(ws)
+    return pairs, websockets
+
+
+def close_websockets(pairs):
+    for a, b in pairs:
+        a.close()
+        b.close()
+
+
+def measure(fn, duration):
+    start_cpu = time.process_time()
+    start = time.time()
+    fn(duration)
+    return (time.process_time() - start_cpu) / (time.time() - start)
+
+
+def polling_threads(n, duration):
+    pairs, websockets = open_websockets(n)
+    stop = threading.Event()
+    channel = IdleChannel()
+
+    def poll(ws):
+        while not stop.is_set():
+            msg = ws.read_frame()
+            while msg is not None:
+                channel.receive(ws, msg)
+                msg = ws.read_frame()
+            channel.update(ws)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=poll, args=(ws,)) for ws in websockets]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    close_websockets(pairs)
+
+
+def websocket_loop(n, duration):
+    pairs, websockets = open_websockets(n)
+    loop = WebSocketLoop()
+    for ws in websockets:
+        loop.register(ws, IdleChannel())
+    time.sleep(duration)
+    loop.stop()
+    close_websockets(pairs)
+
+
+def run(n_sockets=(1, 10, 60, 200), duration=2.0):
+    results = []
+    for n in n_sockets:
+        for name, fn in (("polling", polling_threads), ("loop", websocket_loop)):
+            cpu = measure(lambda d: fn(n, d), duration)
+            results.append((n, name, cpu))
+    return results
+
+
+def main():
+    print("%8s %10s %12s" % ("sockets", "mode", "idle CPU %"))
+    for n, name, cpu in run():
+        print("%8d %10s %12.2f" % (n, name, 100.0 * cpu))
+
+
+if __name__ == "__main__":
+    main()
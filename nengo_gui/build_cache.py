@@ -0,0 +1,346 @@
+"""Reuse the expensive parts of building a model from earlier builds.
+
+Most of the time needed to build a model goes into sampling the evaluation
+points and encoders of the ensembles and into solving for the decoders of
+the connections. Both only depend on the parameters of the objects and on
+the state of the random number generator, which is fixed by the seeds the
+`.Page` assigns to every object before building. When one part of a model
+is edited, the `BuildCache` provides the results for all other parts.
+
+The entries are stored in a directory next to the ``.cfg`` file of the
+model (or in a directory shared by a project), one file per entry. Entries
+are keyed on a hash of all inputs, so stale entries are never used; they
+are removed when the directory grows larger than its size limit, least
+recently used first.
+
+`warm` fills the cache for the models in a directory without starting the
+GUI, so that their first interactive build is fast.
+"""
+
+from __future__ import print_function
+
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import struct
+import sys
+import timeit
+import traceback
+
+import nengo
+import nengo.utils.numpy as npext
+import numpy as np
+from nengo.cache import Fingerprint, FingerprintError
+from nengo.dists import Distribution
+from nengo.utils.cache import bytes2human
+
+import nengo_gui.exec_env
+import nengo_gui.seed_generation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def get_cache_dir(filename_cfg, cache_dir=None):
+    """Return the cache directory for a model with the given .cfg file."""
+    if cache_dir is not None:
+        return cache_dir
+    return os.path.splitext(filename_cfg)[0] + ".cache"
+
+
+def model_seed(filename):
+    """The seed of a model without one, derived from its file name."""
+    path = os.path.abspath(filename).encode("utf-8")
+    return int(hashlib.sha1(path).hexdigest()[:8], 16) % npext.maxint
+
+
+def hash_rng_state(h, rng):
+    name, keys, pos, has_gauss, cached_gaussian = rng.get_state()
+    h.update(name.encode("utf-8"))
+    h.update(np.ascontiguousarray(keys).data)
+    h.update(struct.pack("<qqd", pos, has_gauss, cached_gaussian))
+
+
+class CachedDistribution(Distribution):
+    """Wraps a Distribution to take its samples from a `BuildCache`.
+
+    The random number generator is left in the same state as if the
+    samples had been drawn, so that the rest of the build is not affected
+    by whether the samples were cached.
+    """
+
+    def __init__(self, dist, cache):
+        super(CachedDistribution, self).__init__()
+        self.dist = dist
+        self.cache = cache
+
+    def __repr__(self):
+        return "CachedDistribution(%r)" % (self.dist,)
+
+    def sample(self, n, d=None, rng=np.random):
+        h = hashlib.sha1(b"sample")
+        h.update(str(Fingerprint(self.dist)).encode("utf-8"))
+        h.update(struct.pack("<qq", n, -1 if d is None else d))
+        hash_rng_state(h, rng)
+        key = h.hexdigest()
+
+        entry = self.cache.get(key)
+        if entry is None:
+            samples = self.dist.sample(n, d, rng=rng)
+            self.cache.set(key, (samples, rng.get_state()))
+        else:
+            samples, state = entry
+            rng.set_state(state)
+        return samples
+
+
+class BuildCache(object):
+    """Stores sampled distributions and solved decoders in a directory.
+
+    Provides the decoder cache interface of `nengo.builder.Model`, so the
+    decoders are cached by passing the BuildCache as ``decoder_cache``.
+    The evaluation points and encoders of ensembles are cached while
+    building inside the `.cached_samples` context.
+
+    Parameters
+    ----------
+    directory : str
+        Where to store the entries.
+    max_bytes : int, optional
+        Size of the directory above which the least recently used entries
+        are removed after a build.
+    """
+
+    # sampling is cheap for ensembles with fewer values than this
+    min_sample_size = 1000
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.readonly = False
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def get(self, key):
+        """Return the entry stored under ``key`` or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)  # mark as recently used
+        except (IOError, OSError):
+            pass
+        self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        """Store an entry under ``key``."""
+        if self.readonly:
+            return
+        path = self._path(key)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # write to a temporary file so other processes never read
+            # a partially written entry
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(path + ".tmp", path)
+        except (IOError, OSError) as err:
+            logger.warning("Could not write to build cache %s: %s", self.directory, err)
+            self.readonly = True
+
+    def get_files(self):
+        try:
+            names = os.listdir(self.directory)
+        except (IOError, OSError):
+            return []
+        return [os.path.join(self.directory, n) for n in names if n.endswith(".pkl")]
+
+    def get_size_in_bytes(self):
+        return sum(os.path.getsize(path) for path in self.get_files())
+
+    def get_size(self):
+        return bytes2human(self.get_size_in_bytes())
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def shrink(self, limit=None):
+        """Remove the least recently used entries to meet the size limit."""
+        if limit is None:
+            limit = self.max_bytes
+        entries = []
+        for path in self.get_files():
+            try:
+                stat = os.stat(path)
+            except (IOError, OSError):
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        excess = sum(size for _, size, _ in entries) - limit
+        for _, size, path in sorted(entries):
+            if excess <= 0:
+                break
+            try:
+                os.remove(path)
+            except (IOError, OSError):
+                continue
+            excess -= size
+
+    def invalidate(self):
+        """Remove all entries."""
+        self.shrink(limit=0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def wrap_solver(self, solver_fn):
+        """Wrap a decoder solver to look up its result in the cache."""
+
+        def cached_solver(conn, gain, bias, x, targets, rng=np.random, **kwargs):
+            try:
+                h = hashlib.sha1(b"decoders")
+                h.update(str(Fingerprint(conn.solver)).encode("utf-8"))
+                h.update(str(Fingerprint(conn.pre_obj.neuron_type)).encode("utf-8"))
+            except FingerprintError:
+                return solver_fn(conn, gain, bias, x, targets, rng=rng, **kwargs)
+            for array in (gain, bias, x, targets):
+                h.update(np.ascontiguousarray(array).data)
+            for name in sorted(kwargs):
+                h.update(name.encode("utf-8"))
+                if kwargs[name] is not None:
+                    h.update(np.ascontiguousarray(kwargs[name]).data)
+            hash_rng_state(h, rng)
+            key = h.hexdigest()
+
+            entry = self.get(key)
+            if entry is None:
+                decoders, info = solver_fn(
+                    conn, gain, bias, x, targets, rng=rng, **kwargs
+                )
+                self.set(key, (decoders, info, rng.get_state()))
+            else:
+                decoders, info, state = entry
+                rng.set_state(state)
+            return decoders, info
+
+        return cached_solver
+
+    @contextlib.contextmanager
+    def cached_samples(self, network):
+        """Take the evaluation points and encoders of ensembles from the cache.
+
+        The parameters of the ensembles are replaced by a
+        `CachedDistribution` while inside the context.
+        """
+        replaced = []
+        try:
+            for ens in network.all_ensembles:
+                if ens.n_neurons * ens.dimensions < self.min_sample_size:
+                    continue
+                for attr in ("eval_points", "encoders"):
+                    dist = getattr(ens, attr)
+                    if isinstance(dist, Distribution) and Fingerprint.supports(dist):
+                        setattr(ens, attr, CachedDistribution(dist, self))
+                        replaced.append((ens, attr, dist))
+            yield
+        finally:
+            for ens, attr, dist in replaced:
+                setattr(ens, attr, dist)
+
+
+def build(network, cache, filename=None):
+    """Build a network the way a `.Page` does, with the given cache.
+
+    All objects get the seeds assigned by `.Page.build` for the given file,
+    so the cached entries are used when the model is opened in the GUI.
+    """
+    seeds = {}
+    if filename is not None:
+        seeds[network] = model_seed(filename)
+    seeds = nengo_gui.seed_generation.define_all_seeds(network, seeds)
+    for obj, s in seeds.items():
+        obj.seed = s
+    try:
+        model = nengo.builder.Model(decoder_cache=cache)
+        with cache.cached_samples(network):
+            # only build the model; the signals and the optimizer are
+            # not needed to fill the cache
+            model.build(network)
+    finally:
+        for obj in seeds:
+            obj.seed = None
+
+
+def find_models(path):
+    """Return the Python files in a directory (or the file itself)."""
+    if not os.path.isdir(path):
+        return [path]
+    filenames = []
+    for dirpath, dirnames, names in os.walk(path):
+        dirnames[:] = sorted(
+            d for d in dirnames if not d.startswith(".") and d != "__pycache__"
+        )
+        filenames.extend(
+            os.path.join(dirpath, n) for n in sorted(names) if n.endswith(".py")
+        )
+    return filenames
+
+
+def warm(path, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, stream=sys.stdout):
+    """Build every model in a directory to fill their build caches.
+
+    Files that do not define a ``model`` or fail to build are skipped.
+    Returns the number of models built.
+    """
+    n_built = 0
+    for filename in find_models(path):
+        code_locals = dict(nengo_gui=nengo_gui, __file__=filename, __page__=None)
+        start = timeit.default_timer()
+        exec_env = nengo_gui.exec_env.ExecutionEnvironment(filename)
+        try:
+            with open(filename) as f:
+                code = f.read()
+            with exec_env:
+                compiled = compile(code, nengo_gui.exec_env.compiled_filename, "exec")
+                exec(compiled, code_locals)
+            network = code_locals.get("model", None)
+            if not isinstance(network, nengo.Network):
+                print("%s: skipped, no model defined" % filename, file=stream)
+                continue
+
+            cache = BuildCache(
+                get_cache_dir(filename + ".cfg", cache_dir), max_bytes=max_bytes
+            )
+            build(network, cache, filename)
+        except Exception:
+            print("%s: skipped, error" % filename, file=stream)
+            logger.debug(traceback.format_exc())
+            continue
+        n_built += 1
+        print(
+            "%s: %d hits, %d misses in %.1f s, cache size %s"
+            % (
+                filename,
+                cache.hits,
+                cache.misses,
+                timeit.default_timer() - start,
+                cache.get_size(),
+            ),
+            file=stream,
+        )
+    return n_built
@@ -0,0 +1,173 @@
+"""Execution of the code in the editor in a background thread.
+
+The editor sends its code to the server while the user types. A
+`CodeExecutor` waits until the code has not changed for a short time
+before executing it, so that typing does not construct the model over and
+over, and it executes the code outside of the threads serving the
+websockets, so that the plots keep streaming in the meantime.
+
+The code is hashed to never execute the code of the current model again.
+An execution whose code was changed while it ran is abandoned: its result
+is never used. The results of executions that failed are cached, since the
+code often returns to an earlier state while typing (and, unlike models,
+they are not changed once they are used).
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def code_hash(code):
+    return hashlib.sha1(code.encode("utf-8")).hexdigest()
+
+
+class CodeExecutor(object):
+    """Executes the latest submitted code in a background thread.
+
+    The thread is started by the first `submit` and stopped by `close`.
+
+    Parameters
+    ----------
+    execute : callable
+        Executes the code and returns an `.Execution`. It must not change
+        the state of the Page, which is done when the result is used.
+    delay : float, optional
+        Time in seconds the submitted code has to be unchanged before it
+        is executed.
+    max_failed : int, optional
+        Number of failed executions to keep for repeated code.
+    """
+
+    def __init__(self, execute, delay=0.25, max_failed=16):
+        self.execute = execute
+        self.delay = delay
+        self.max_failed = max_failed
+        self.failed = OrderedDict()  # code hash -> Execution
+        self.current_hash = None  # hash of the code of the latest result
+        self.n_executed = 0
+        self.n_skipped = 0
+        self.n_abandoned = 0
+
+        self._condition = threading.Condition()
+        self._thread = None
+        self._code = None  # submitted code waiting to be executed
+        self._due = None  # time at which self._code is executed
+        self._latest_code = None  # the latest submitted code
+        self._latest_hash = None  # hash of the latest submitted code
+        self._generation = 0  # incremented with every new submitted code
+        self._reruns = 0  # failures from before a rerun are not cached
+        self._result = None
+
+    def set_current(self, code):
+        """Set the code of the model currently in use."""
+        with self._condition:
+            self.current_hash = None if code is None else code_hash(code)
+            self._latest_code = code
+            self._latest_hash = self.current_hash
+
+    def submit(self, code, delay=None):
+        """Execute the code once it is unchanged for ``delay`` seconds.
+
+        Earlier code that is still waiting or being executed is superseded.
+        """
+        h = code_hash(code)
+        with self._condition:
+            if h == self._latest_hash:
+                return  # already waiting, being executed or executed
+            self._latest_code = code
+            self._latest_hash = h
+            self._generation += 1
+            self._code = code
+            self._due = time.time() + (self.delay if delay is None else delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def rerun(self, delay=0):
+        """Execute the latest code again, even though it has not changed.
+
+        This is needed when modules imported by the code have changed.
+        """
+        with self._condition:
+            code = self._latest_code
+            self.current_hash = None
+            self._latest_hash = None
+            self._reruns += 1
+            self.failed.clear()
+        if code is not None:
+            self.submit(code, delay=delay)
+
+    def pop_result(self):
+        """Return the `.Execution` of the latest code once, or None."""
+        with self._condition:
+            result, self._result = self._result, None
+            return result
+
+    def close(self):
+        """Stop the thread; an execution in progress is abandoned."""
+        with self._condition:
+            self._thread = None
+            self._code = None
+            self._generation += 1
+            self._condition.notify()
+
+    def _next(self, thread):
+        """Wait for code that is due, return it or None if closed."""
+        with self._condition:
+            while self._thread is thread:
+                if self._code is not None:
+                    timeout = self._due - time.time()
+                    if timeout <= 0:
+                        code, self._code = self._code, None
+                        return (
+                            code,
+                            self._latest_hash,
+                            self._generation,
+                            self._reruns,
+                        )
+                else:
+                    timeout = None
+                self._condition.wait(timeout)
+            return None
+
+    def _run(self):
+        thread = threading.current_thread()
+        while True:
+            job = self._next(thread)
+            if job is None:
+                return
+            code, h, generation, reruns = job
+            if h == self.current_hash:
+                self.n_skipped += 1
+                continue
+
+            with self._condition:
+                execution = self.failed.pop(h, None)
+            if execution is None:
+                try:
+                    execution = self.execute(code)
+                except Exception:
+                    logger.exception("Executing the code failed.")
+                    continue
+                self.n_executed += 1
+            else:
+                self.n_skipped += 1
+            with self._condition:
+                if execution.error is not None and reruns == self._reruns:
+                    self.failed[h] = execution
+                    while len(self.failed) > self.max_failed:
+                        self.failed.popitem(last=False)
+
+                if generation != self._generation:
+                    # the code was changed while it was executed
+                    self.n_abandoned += 1
+                    continue
+                self._result = execution
+                self.current_hash = h
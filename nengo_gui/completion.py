@@ -1,23 +1,268 @@
+"""Code completion for the editor with jedi.
+
+Completions are computed by a `CompletionService` in a child process, so
+that jedi neither holds the GIL of the server nor blocks the threads
+handling requests. The child keeps jedi's caches of imported modules
+(e.g. nengo and numpy) warm between requests, so that only the edited
+script itself has to be parsed again, and caches recent results.
+
+The editor requests completions while the user types, so a request is
+usually superseded by the next one before it is answered. Requests from
+the same editor session that are still waiting when a newer one arrives
+are cancelled and answered with no completions.
+"""
+
+import hashlib
+import logging
+import multiprocessing
 import threading
 import warnings
+from collections import OrderedDict
 
 try:
-    from jedi.api import Script
+    import jedi
 except ImportError:
+    jedi = None
     warnings.warn("Install the jedi module to get autocompletion in Nengo GUI.")
 
-    class Script(object):
-        def __init__(self, *args, **kwargs):
-            pass
+logger = logging.getLogger(__name__)
+
+_jedi_lock = threading.Lock()
+
+
+class Completer(object):
+    """Computes completions, caching recent results.
+
+    Parameters
+    ----------
+    max_results : int, optional
+        Number of results to keep for repeated requests.
+    """
+
+    def __init__(self, max_results=256):
+        self.max_results = max_results
+        self.results = OrderedDict()
 
-        def completions(self):
+    def complete(self, code, line, column, path=None):
+        """Return the completions as a list of (name, type) tuples.
+
+        ``line`` starts at 1, ``column`` at 0 (as in jedi).
+        """
+        if jedi is None:
             return []
+        code_hash = hashlib.sha1(code.encode("utf-8")).hexdigest()
+        key = (path, code_hash, line, column)
+        if key in self.results:
+            self.results[key] = self.results.pop(key)  # most recently used
+            return self.results[key]
 
+        if hasattr(jedi.Script, "complete"):  # jedi >= 0.16
+            completions = jedi.Script(code, path=path).complete(line, column)
+        else:
+            script = jedi.Script(code, line, column, path=path)
+            completions = script.completions()
+        result = [(c.name, c.type) for c in completions]
 
-_jedi_lock = threading.Lock()
+        self.results[key] = result
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        return result
 
 
 def get_completions(code, line, column, path=None):
+    """Compute completions in this process (see `Completer.complete`)."""
     with _jedi_lock:
-        script = Script(code, line, column, path=path)
-        return script.completions()
+        return _completer.complete(code, line, column, path)
+
+
+_completer = Completer()
+
+
+class CompletionService(object):
+    """Computes completions in a child process.
+
+    The child process is started by `start` (or with the first request)
+    and restarted if it exits. If child processes cannot be forked (e.g., on
+    Windows), the completions are computed in the server process.
+
+    Parameters
+    ----------
+    timeout : float, optional
+        Time in seconds after which a request is answered with no
+        completions if the child has not answered it.
+    """
+
+    # code completed once at startup to load the modules most models use
+    warm_up_code = "import nengo\nimport numpy as np\nnengo.Ensemble\nnp.ar"
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self.process = None
+        self.conn = None
+        self.thread = None
+        self.closed = False
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._next_id = 0
+        self._pending = {}  # request id -> [event, result]
+        self._sessions = {}  # session -> request id of its latest request
+        self.n_cancelled = 0
+
+        self.use_process = (
+            jedi is not None and "fork" in multiprocessing.get_all_start_methods()
+        )
+
+    def complete(self, code, line, column, path=None, session=None):
+        """Return the completions as a list of (name, type) tuples.
+
+        A request from a ``session`` cancels the earlier requests of that
+        session that are still waiting; these return an empty list.
+        """
+        if not self.use_process:
+            return get_completions(code, line, column, path)
+
+        event = threading.Event()
+        entry = [event, []]
+        with self._lock:
+            if self.closed:
+                return []
+            self._start_process()
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = entry
+            superseded = None
+            if session is not None:
+                superseded = self._sessions.get(session, None)
+                self._sessions[session] = request_id
+        if superseded is not None:
+            self._cancel(superseded)
+
+        try:
+            self._send(("complete", request_id, session, code, line, column, path))
+        except (OSError, IOError, ValueError):
+            self._cancel(request_id)
+        if not event.wait(self.timeout):
+            logger.warning("Code completion timed out.")
+            self._cancel(request_id)
+        with self._lock:
+            self._pending.pop(request_id, None)
+            if session is not None and self._sessions.get(session) == request_id:
+                del self._sessions[session]
+        return entry[1]
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            process, conn = self.process, self.conn
+            self.process = None
+        if process is None:
+            return
+        try:
+            self._send(("close",))
+        except (OSError, IOError, ValueError):
+            pass
+        process.join(1.0)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        conn.close()
+        for request_id in list(self._pending):
+            self._cancel(request_id)
+
+    def start(self):
+        """Start the child process, which loads jedi and common modules."""
+        if self.use_process:
+            with self._lock:
+                if not self.closed:
+                    self._start_process()
+
+    def _start_process(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        context = multiprocessing.get_context("fork")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_child_main, args=(child_conn, self.warm_up_code)
+        )
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.thread = threading.Thread(target=self._receive, args=(self.conn,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _send(self, msg):
+        with self._send_lock:
+            self.conn.send(msg)
+
+    def _cancel(self, request_id):
+        """Answer a request with no completions and skip it in the child."""
+        entry = self._pending.get(request_id, None)
+        if entry is not None and not entry[0].is_set():
+            self.n_cancelled += 1
+            entry[0].set()
+            try:
+                self._send(("cancel", request_id))
+            except (OSError, IOError, ValueError):
+                pass
+
+    def _receive(self, conn):
+        while True:
+            try:
+                request_id, result = conn.recv()
+            except (EOFError, OSError, IOError):
+                break
+            entry = self._pending.get(request_id, None)
+            if entry is not None and not entry[0].is_set():
+                entry[1] = result
+                entry[0].set()
+        if conn is self.conn:
+            # answer the requests the exited child did not answer
+            for request_id in list(self._pending):
+                self._cancel(request_id)
+
+
+def _child_main(conn, warm_up_code):
+    """Entry point of the child process computing completions."""
+    completer = Completer()
+    try:
+        completer.complete(warm_up_code, 4, 5)
+    except Exception:
+        logger.debug("Warming up code completion failed.", exc_info=True)
+
+    requests = OrderedDict()  # request id -> request
+    cancelled = set()
+    while True:
+        try:
+            # collect all waiting messages so cancelled and superseded
+            # requests are not computed
+            while not requests or conn.poll():
+                msg = conn.recv()
+                if msg[0] == "close":
+                    return
+                elif msg[0] == "cancel":
+                    # the request might still be on its way
+                    if requests.pop(msg[1], None) is None:
+                        cancelled.add(msg[1])
+                elif msg[1] in cancelled:
+                    cancelled.remove(msg[1])
+                else:
+                    requests[msg[1]] = msg[2:]
+        except (EOFError, OSError, IOError):
+            return
+        if len(cancelled) > 1000:
+            cancelled.clear()  # cancelled after being answered
+
+        request_id, (session, code, line, column, path) = requests.popitem(last=False)
+        if session is not None and any(r[0] == session for r in requests.values()):
+            continue  # superseded, the parent cancels it
+
+        try:
+            result = completer.complete(code, line, column, path)
+        except Exception:
+            logger.debug("Code completion failed.", exc_info=True)
+            result = []
+        try:
+            conn.send((request_id, result))
+        except (OSError, IOError):
+            return
@@ -66,7 +66,8 @@ class AceEditor(Editor):
             else:
                 try:
                     self.page.filename_cfg = save_as + ".cfg"
-                    self.page.save_config(force=True)
+                    self.page.modified_config()
+                    self.page.save_config(lazy=True, force=True)
                     self.page.filename = save_as
                     with open(self.page.filename, "w") as f:
                         f.write(self.current_code)
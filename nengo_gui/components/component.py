@@ -14,7 +14,7 @@ class Component(object):
     required data or input overriding data (in the case of Pointer and Slider)
     to/from the running model.  Communication from server to
     client is done via Component.update_client(), which is called regularly
-    by the Server.ws_viz_component handler.  Communication from client to
+    by the server's WebSocketLoop.  Communication from client to
     server is via Component.message().
     """
 
@@ -22,6 +22,11 @@ class Component(object):
     # Subclasses should override this as needed.
     config_defaults = dict(x=0, y=0, width=100, height=100, label_visible=True)
 
+    # Whether update_client and message are handled in the child process
+    # when the simulator runs in a SimProcess. Components that do not
+    # exchange data with the running simulation should set this to False.
+    runs_in_sim_process = True
+
     def __init__(self, component_order=0):
         # when generating Javascript for all the Components in a Page, they
         # will be sorted by component_order.  This way some Components can
@@ -42,11 +47,23 @@ class Component(object):
         self.config = config  # the nengo.Config[component] for this component
         self.page = page  # the Page this component is in
         self.uid = uid  # The Python string referencing this component
+        for buffer in self.buffers():
+            page.configure_buffer(buffer)
+
+    def buffers(self):
+        """Return the buffers holding data until it is sent to the client.
+
+        The overflow policy of the Page is applied to these buffers (see
+        `.BoundedBuffer`) and the data they dropped is reported.
+        """
+        return []
 
     def update_client(self, client):
         """Send any required information to the client.
 
-        This method is called regularly by Server.ws_viz_component().  You
+        This method is called by the server's WebSocketLoop whenever data
+        was received from any client, Page.notify_clients() was called, or
+        at least every WebSocketLoop.idle_interval seconds.  You
         send text data to the client-side via a WebSocket as follows:
             client.write_text(data)
         You send binary data as:
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+class Decimator(object):
+    """Limit the number of ``[t, x...]`` rows per simulated second sent to
+    the client.
+
+    Rows are grouped into buckets of simulated time. With ``mode="minmax"``
+    each bucket is sent as two rows holding the minimum and the maximum of
+    every value, in the order they occurred, so short spikes are not lost.
+    With ``mode="last"`` only the last row of each bucket is sent.
+
+    The bucket size follows from the resolution reported by the client
+    (the plot width in pixels divided by the shown time) and `max_rate`.
+    Without either, all rows are passed through unchanged.
+
+    Parameters
+    ----------
+    row_dtype : numpy.dtype
+        Structured dtype of the rows (see `.RingBuffer`).
+    mode : "minmax" or "last", optional
+        How the rows of a bucket are reduced.
+    max_rate : float, optional
+        Maximum number of rows per simulated second. 0 means no fixed limit.
+    """
+
+    def __init__(self, row_dtype, mode="minmax", max_rate=0):
+        if mode not in ("minmax", "last"):
+            raise ValueError("Unknown decimation mode %r." % mode)
+        self.row_dtype = row_dtype
+        self.mode = mode
+        self.max_rate = max_rate
+        self.resolution = 0  # pixels per simulated second, set by the client
+        # rows of the last bucket, held back until the bucket is complete
+        self.pending = np.zeros(0, dtype=row_dtype)
+
+    @property
+    def rows_per_bucket(self):
+        return 2 if self.mode == "minmax" else 1
+
+    @property
+    def rate(self):
+        """Maximum number of rows per simulated second (0 if unlimited)."""
+        rate = self.resolution * self.rows_per_bucket
+        if self.max_rate > 0 and (rate <= 0 or self.max_rate < rate):
+            rate = self.max_rate
+        return rate
+
+    def process(self, chunks):
+        """Decimate the rows in `chunks` and return the buffers to send."""
+        rate = self.rate
+        if rate <= 0:
+            if len(self.pending) == 0:
+                return chunks
+            chunks = [self.pending.view(np.uint8)] + list(chunks)
+            self.pending = self.pending[:0]
+            return chunks
+        if len(chunks) == 0:
+            return []
+
+        rows = np.concatenate(
+            [self.pending]
+            + [np.frombuffer(chunk, dtype=self.row_dtype) for chunk in chunks]
+        )
+        bucket = np.floor(rows["t"] * (rate / self.rows_per_bucket))
+        starts = np.flatnonzero(bucket[1:] != bucket[:-1]) + 1
+        if len(starts) == 0:
+            self.pending = rows
+            return []
+        self.pending = rows[starts[-1] :].copy()
+        rows = rows[: starts[-1]]
+        starts = np.concatenate([[0], starts])
+        counts = np.diff(starts)
+        starts = starts[:-1]
+
+        if np.all(counts <= self.rows_per_bucket):
+            decimated = rows
+        elif self.mode == "last":
+            decimated = rows[starts + counts - 1]
+        else:
+            decimated = self._minmax(rows, starts, counts)
+        return [decimated.view(np.uint8)]
+
+    def _minmax(self, rows, starts, counts):
+        x = rows["x"]
+        low = np.minimum.reduceat(x, starts, axis=0)
+        high = np.maximum.reduceat(x, starts, axis=0)
+
+        # index of the first occurrence of the extremes within each bucket
+        index = np.arange(len(rows))[:, None]
+        i_low = np.minimum.reduceat(
+            np.where(x == np.repeat(low, counts, axis=0), index, len(rows)),
+            starts,
+            axis=0,
+        )
+        i_high = np.minimum.reduceat(
+            np.where(x == np.repeat(high, counts, axis=0), index, len(rows)),
+            starts,
+            axis=0,
+        )
+        low_first = i_low <= i_high
+
+        decimated = np.zeros(2 * len(starts), dtype=self.row_dtype)
+        decimated["t"][0::2] = rows["t"][starts]
+        decimated["t"][1::2] = rows["t"][starts + counts - 1]
+        decimated["x"][0::2] = np.where(low_first, low, high)
+        decimated["x"][1::2] = np.where(low_first, high, low)
+
+        # a bucket with a single row only needs that row
+        keep = np.ones(len(decimated), dtype=bool)
+        keep[1::2] = counts > 1
+        return decimated[keep]
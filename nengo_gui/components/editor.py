@@ -3,6 +3,7 @@ from nengo_gui.components.component import Component
 
 class Editor(Component):
     config_defaults = {}
+    runs_in_sim_process = False
 
     def __init__(self):
         # the IPython integration requires this component to be early
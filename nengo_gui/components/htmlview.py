@@ -1,6 +1,5 @@
-import collections
-
 from nengo_gui.components.component import Component
+from nengo_gui.components.ring_buffer import MessageQueue
 
 
 class HTMLView(Component):
@@ -12,12 +11,15 @@ class HTMLView(Component):
         super(HTMLView, self).__init__()
         self.obj = obj
         self.obj_output = obj.output
-        self.data = collections.deque()
+        self.data = MessageQueue()
 
     def attach(self, page, config, uid):
         super(HTMLView, self).attach(page, config, uid)
         self.label = page.get_label(self.obj)
 
+    def buffers(self):
+        return [self.data]
+
     def add_nengo_objects(self, page):
         with page.model:
             self.obj.output = self.gather_data
@@ -32,8 +34,7 @@ class HTMLView(Component):
         return value
 
     def update_client(self, client):
-        while len(self.data) > 0:
-            item = self.data.popleft()
+        for item in self.data.read():
             client.write_text(item)
 
     def javascript(self):
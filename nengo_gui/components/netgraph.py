@@ -1,11 +1,11 @@
 import collections
 import json
 import os
-import threading
-import time
+import sys
 import traceback
 
 import nengo
+import nengo_gui.code_executor
 import nengo_gui.layout
 import nengo_gui.user_action
 import numpy as np
@@ -25,6 +25,14 @@ class NetGraph(Component):
 
     config_defaults = {}
     configs = {}
+    runs_in_sim_process = False
+
+    # the kinds of objects displayed in the NetGraph
+    object_classes = (nengo.Ensemble, nengo.Node, nengo.Network, nengo.Connection)
+
+    # time in seconds the code in the editor has to be unchanged before
+    # it is executed
+    execute_delay = 0.25
 
     def __init__(self):
         # this component must be ordered before all the normal graphs (so that
@@ -32,80 +40,97 @@ class NetGraph(Component):
         # order is between that of SimControl and the default (0)
         super(NetGraph, self).__init__(component_order=-5)
 
-        # this lock ensures safety between check_for_reload() and update_code()
-        self.code_lock = threading.Lock()
-        self.new_code = None
-
         self.uids = {}
+        self.fingerprints = {}  # uid -> fingerprint of the item on the client
         self.parents = {}
         self.initialized_pan_and_zoom = False
 
     def attach(self, page, config, uid):
         super(NetGraph, self).attach(page, config, uid)
-        self.layout = nengo_gui.layout.Layout(self.page.model)
+        self.layout = nengo_gui.layout.Layout(
+            self.page.model, cache=self.page.layout_cache
+        )
         self.to_be_expanded = collections.deque([self.page.model])
         self.to_be_sent = collections.deque()
 
         self.networks_to_search = [self.page.model]
 
-        try:
-            self.last_modify_time = os.path.getmtime(self.page.filename)
-        except OSError:
-            self.last_modify_time = None
-        except TypeError:  # happens if self.filename is None
-            self.last_modify_time = None
+        # executes new code in the background (see update_code)
+        self.executor = nengo_gui.code_executor.CodeExecutor(
+            self.page.run_code, delay=self.execute_delay
+        )
+        self.executor.set_current(self.page.code)
+        self.pending_execution = None
 
-        self.last_reload_check = time.time()
+        # watches the file and the modules imported from its directory,
+        # created once a client is connected (see update_client)
+        self.watch = None
 
-    def check_for_reload(self):
+    def watched_files(self):
+        files = set(self.page.imported.values())
         if self.page.filename is not None:
-            try:
-                t = os.path.getmtime(self.page.filename)
-                if self.last_modify_time is None or self.last_modify_time < t:
-                    self.reload()
-                    self.last_modify_time = t
-            except OSError:
-                pass
+            files.add(self.page.filename)
+        return files
 
-        with self.code_lock:
-            new_code = self.new_code
-            # the lock is in case update_code() is called between these lines
-            self.new_code = None
+    def files_changed(self, paths):
+        """Execute the code again after files were changed on disk.
 
-        if new_code is not None:
-            self.reload(code=new_code)
+        This is called by the `.FileWatcher` with the changed files.
+        """
+        filename = self.page.filename
+        if filename is not None and os.path.abspath(filename) in paths:
+            try:
+                with open(filename) as f:
+                    code = f.read()
+            except (OSError, IOError):
+                # replaced by an editor, the new file is reported later
+                code = None
+            if code is not None and code != self.page.code:
+                # send the new code to the client
+                self.page.editor.update_code(code)
+                self.executor.submit(code, delay=0)
+
+        imported = self.page.imported
+        if any(filename in paths for filename in imported.values()):
+            # import all of them again, since they might import each other
+            for name in list(imported):
+                sys.modules.pop(name, None)
+            self.executor.rerun()
 
     def update_code(self, code):
-        """Set new version of code to display."""
-        with self.code_lock:
-            self.new_code = code
-
-    def reload(self, code=None):
-        """Called when new code has been detected
-        checks that the page is not currently being used
-        and thus can be updated"""
-        with self.page.lock:
-            self._reload(code=code)
-
-    def _reload(self, code=None):  # noqa: C901
-        """Loads and executes the code, removing old items,
+        """Set new version of code to display.
+
+        The code is executed in the background once it has not been
+        changed for `execute_delay` seconds, and the model is updated by
+        `update_client` when the execution is finished.
+        """
+        if self.watch is not None:
+            self.watch.update(self.watched_files())  # the file might be renamed
+        self.executor.submit(code)
+
+    def timer(self, name):
+        """Time a block as ``name`` in the metrics of the server."""
+        return self.page.gui.metrics.timer(name, page=self.page.filename)
+
+    def finish(self):
+        self.executor.close()
+        if self.watch is not None:
+            self.watch.cancel()
+            self.watch = None
+
+    def _reload(self, execution):  # noqa: C901
+        """Uses the model of an execution of new code, removing old items,
         updating changed items
-        and adding new ones"""
+        and adding new ones
+        """
 
         old_locals = self.page.last_good_locals
         old_default_labels = self.page.default_labels
+        code = execution.code
 
-        if code is None:
-            with open(self.page.filename) as f:
-                code = f.read()
-            if self.page.code == code:
-                # don't re-execute the identical code
-                return
-            else:
-                # send the new code to the client
-                self.page.editor.update_code(code)
-
-        self.page.execute(code)
+        self.page.set_execution(execution)
+        if self.watch is not None:
+            self.watch.update(self.watched_files())
 
         if self.page.error is not None:
             return
@@ -116,58 +141,26 @@ class NetGraph(Component):
         self.parents = {}
 
         removed_uids = {}
-        rebuilt_objects = []
-
-        # for each item in the old model, find the matching new item
-        # for Nodes, Ensembles, and Networks, this means to find the item
-        # with the same uid.  For Connections, we don't really have a uid,
-        # so we use the uids of the pre and post objects.
-        for uid, old_item in iteritems(dict(self.uids)):
-            try:
-                new_item = eval(uid, self.page.locals)
-            except:
-                new_item = None
-
-            # check to make sure the new item's uid is the same as the
-            # old item.  This is to catch situations where an old uid
-            # happens to still refer to something in the new model, but that's
-            # not the normal uid for that item.  For example, the uid
-            # "ensembles[0]" might still refer to something even after that
-            # ensemble is removed.
-            new_uid = self.page.get_uid(new_item, default_labels=name_finder.known_name)
-            if new_uid != uid:
-                new_item = None
-
-            same_class = False
-            for cls in [nengo.Ensemble, nengo.Node, nengo.Network, nengo.Connection]:
-                if isinstance(new_item, cls) and isinstance(old_item, cls):
-                    same_class = True
-                    break
-
-            # find reasons to delete the object.  Any deleted object will
-            # be recreated, so try to keep this to a minimum
-            keep_object = True
-            if new_item is None:
-                keep_object = False
-            elif not same_class:
-                # don't allow changing classes
-                keep_object = False
-            elif self.get_extra_info(new_item) != self.get_extra_info(old_item):
-                keep_object = False
-
-            if not keep_object:
-                self.to_be_sent.append(dict(type="remove", uid=uid))
-                del self.uids[uid]
-                removed_uids[old_item] = uid
-                rebuilt_objects.append(uid)
-            else:
-                # fix aspects of the item that may have changed
-                if self._reload_update_item(uid, old_item, new_item, name_finder):
-                    # something has changed about this object, so rebuild
-                    # the components that use it
-                    rebuilt_objects.append(uid)
-
-                self.uids[uid] = new_item
+        rebuilt_objects = set()
+
+        # for each item in the old model, find the new item with the same
+        # uid.  All of them are looked up in an index of the new model
+        # built once, rather than evaluating each uid in the new locals.
+        removed, kept = self.diff(self.index_model(name_finder.known_name))
+        for uid, old_item in removed:
+            self.to_be_sent.append(dict(type="remove", uid=uid))
+            del self.uids[uid]
+            self.fingerprints.pop(uid, None)
+            removed_uids[old_item] = uid
+            rebuilt_objects.add(uid)
+        for uid, old_item, new_item in kept:
+            # fix aspects of the item that may have changed
+            if self._reload_update_item(uid, old_item, new_item, name_finder):
+                # something has changed about this object, so rebuild
+                # the components that use it
+                rebuilt_objects.add(uid)
+
+            self.uids[uid] = new_item
 
         self.to_be_expanded.append(self.page.model)
 
@@ -175,7 +168,9 @@ class NetGraph(Component):
         self.page.default_labels = name_finder.known_name
         self.page.config = self.page.load_config()
         self.page.uid_prefix_counter = {}
-        self.layout = nengo_gui.layout.Layout(self.page.model)
+        self.layout = nengo_gui.layout.Layout(
+            self.page.model, cache=self.page.layout_cache
+        )
         self.page.code = code
 
         orphan_components = []
@@ -187,7 +182,7 @@ class NetGraph(Component):
         collapsed_items = []
 
         # remove graphs no longer associated to NetgraphItems
-        removed_items = list(removed_uids.values())
+        removed_items = set(removed_uids.values())
         for c in self.page.components[:]:
             for item in c.code_python_args(old_default_labels):
                 if item not in self.uids.keys() and item not in collapsed_items:
@@ -215,11 +210,11 @@ class NetGraph(Component):
                         new_obj = None
 
                     if new_obj is None:
-                        removed_items.append(item)
+                        removed_items.add(item)
                     elif not isinstance(new_obj, old_obj.__class__):
-                        rebuilt_objects.append(item)
+                        rebuilt_objects.add(item)
                     elif self.get_extra_info(new_obj) != self.get_extra_info(old_obj):
-                        rebuilt_objects.append(item)
+                        rebuilt_objects.add(item)
 
                     # add this to the list of collapsed items, so we
                     # don't recheck it if there's another Component that
@@ -299,6 +294,56 @@ class NetGraph(Component):
         # notifies SimControl to pause the simulation
         self.page.changed = True
 
+    @staticmethod
+    def index_model(known_name):
+        """Map the uids of the objects in a model to the objects.
+
+        ``known_name`` is the mapping from objects to names of the
+        `.NameFinder` of the model.
+        """
+        return dict(
+            (uid, obj)
+            for obj, uid in iteritems(known_name)
+            if isinstance(obj, NetGraph.object_classes)
+        )
+
+    def fingerprint(self, obj):
+        """Describe how an object is displayed, apart from its label and
+        where its connections are attached.
+
+        An item is recreated on reload if its fingerprint changes.
+        """
+        for cls in self.object_classes:
+            if isinstance(obj, cls):
+                return cls, self.get_extra_info(obj)
+        return None
+
+    def diff(self, objects):
+        """Match the items on the client to the objects of a new model.
+
+        ``objects`` maps uids to the objects of the new model (see
+        `index_model`).  An item is kept if there is an object with the
+        same uid and fingerprint; the fingerprints of the items were
+        computed when they were sent to the client.
+
+        Returns a list of ``(uid, old_item)`` to remove and a list of
+        ``(uid, old_item, new_item)`` to keep.
+        """
+        removed = []
+        kept = []
+        for uid, old_item in iteritems(self.uids):
+            new_item = objects.get(uid, None)
+            if new_item is not None:
+                old_fingerprint = self.fingerprints.get(uid, None)
+                if old_fingerprint is None:
+                    old_fingerprint = self.fingerprint(old_item)
+                # the cached fingerprint stays valid for the new item
+                if self.fingerprint(new_item) == old_fingerprint:
+                    kept.append((uid, old_item, new_item))
+                    continue
+            removed.append((uid, old_item))
+        return removed, kept
+
     def _reload_update_item(
         self, uid, old_item, new_item, new_name_finder
     ):  # noqa: C901
@@ -372,23 +417,49 @@ class NetGraph(Component):
         self.page.modified_config()
 
     def update_client(self, client):
-        now = time.time()
-        if now > self.last_reload_check + 0.5:
-            self.check_for_reload()
-            self.last_reload_check = now
+        if self.watch is None:
+            # reload when the files are changed on disk
+            self.watch = self.page.gui.file_watcher.watch(
+                self.watched_files(), self.files_changed
+            )
+
+        # use the model of the latest finished execution, unless the Page
+        # is in use (e.g. building), so that the other updates continue
+        execution = self.executor.pop_result()
+        if execution is not None:
+            self.pending_execution = execution
+        if self.pending_execution is not None and self.page.lock.acquire(False):
+            try:
+                with self.timer("netgraph_reload"):
+                    self._reload(self.pending_execution)
+            finally:
+                self.pending_execution = None
+                self.page.lock.release()
 
         if not self.initialized_pan_and_zoom:
             self.send_pan_and_zoom(client)
             self.initialized_pan_and_zoom = True
 
+        messages = []
         while len(self.to_be_sent) > 0:
-            info = self.to_be_sent.popleft()
-            client.write_text(json.dumps(info))
+            messages.append(self.to_be_sent.popleft())
+        self.send_messages(client, messages)
 
-        if len(self.to_be_expanded) > 0:
-            with self.page.lock:
+        # the networks are expanded in a later update while the Page is in
+        # use, since this is called from the server's websocket loop
+        if len(self.to_be_expanded) > 0 and self.page.lock.acquire(False):
+            try:
                 network = self.to_be_expanded.popleft()
                 self.expand_network(network, client)
+            finally:
+                self.page.lock.release()
+
+    def send_messages(self, client, messages):
+        """Send messages to the client, several of them as a single update."""
+        if len(messages) == 1:
+            client.write_text(json.dumps(messages[0]))
+        elif len(messages) > 1:
+            client.write_text(json.dumps(dict(type="update", messages=messages)))
 
     def javascript(self):
         return 'new Nengo.NetGraph(main, {uid:"%s"});' % id(self)
@@ -463,6 +534,7 @@ class NetGraph(Component):
                 uid = self.page.get_uid(item)
                 if uid in self.uids:
                     del self.uids[uid]
+                    self.fingerprints.pop(uid, None)
         for n in net.networks:
             self.remove_uids(n)
 
@@ -483,7 +555,8 @@ class NetGraph(Component):
         """Display an expanded network, including the root network"""
 
         if not self.page.config[network].has_layout:
-            pos = self.layout.make_layout(network)
+            with self.timer("layout"):
+                pos = self.layout.make_layout(network)
             for obj, layout in pos.items():
                 self.page.config[obj].pos = layout["y"], layout["x"]
                 self.page.config[obj].size = layout["h"] / 2, layout["w"] / 2
@@ -493,26 +566,32 @@ class NetGraph(Component):
             parent = None
         else:
             parent = self.page.get_uid(network)
+        messages = []
         for ens in network.ensembles:
-            self.create_object(client, ens, obj_type="ens", parent=parent)
+            messages.append(self.create_object(ens, obj_type="ens", parent=parent))
         for node in network.nodes:
-            self.create_object(client, node, obj_type="node", parent=parent)
+            messages.append(self.create_object(node, obj_type="node", parent=parent))
         for net in network.networks:
-            self.create_object(client, net, obj_type="net", parent=parent)
+            messages.append(self.create_object(net, obj_type="net", parent=parent))
         for conn in network.connections:
-            self.create_connection(client, conn, parent=parent)
+            messages.append(self.create_connection(conn, parent=parent))
+        self.send_messages(client, [info for info in messages if info is not None])
         self.page.config[network].expanded = True
 
-    def create_object(self, client, obj, obj_type, parent):
-        """Send the JSON of the newly created objects to client-side"""
+    def create_object(self, obj, obj_type, parent):
+        """Return the JSON of a newly created object for the client-side.
+
+        Returns None if the object is already displayed.
+        """
         uid = self.page.get_uid(obj)
 
         # if the uid already exists, then it's already been inserted in
         # the netgraph, so don't send anything
         if uid in self.uids:
-            return
+            return None
 
         self.uids[uid] = obj
+        self.fingerprints[uid] = self.fingerprint(obj)
 
         pos = self.page.config[obj].pos
         if pos is None:
@@ -536,18 +615,18 @@ class NetGraph(Component):
             size=size,
             parent=parent,
         )
-        info.update(self.get_extra_info(obj))
+        info.update(self.fingerprints[uid][1])
 
         if type == "net":
             info["expanded"] = self.page.config[obj].expanded
 
-        client.write_text(json.dumps(info))
+        return info
 
     def get_extra_info(self, obj):
         """Determine helper information for each nengo object.
 
         This is used by the client side to configure the display.  It is also
-        used by the reload() code to determine if a NetGraph object should
+        used by the reload code to determine if a NetGraph object should
         be recreated.
         """
         info = {}
@@ -703,41 +782,45 @@ class NetGraph(Component):
 
         return pres, posts
 
-    def create_connection(self, client, conn, parent):
+    def create_connection(self, conn, parent):
         """
-        Assembles the a JSON description of the given connection object and
-        sends it to the client.
+        Assembles the a JSON description of the given connection object for
+        the client.
 
         Parameters
         ----------
-        client : WebSocket
-                 Websocket object to which the assembled JSON description is
-                 sent.
         conn : nengo.Connection
                Connection object for which the description should be generated.
         parent : str
                  UID of the parent network the connection belongs to.
+
+        Returns
+        -------
+        dict or None
+            The description, or None if the connection is not displayed or
+            already displayed.
         """
 
         # Fetch the connection kind
-        kind = kind = NetGraph.connection_kind(conn)
+        fingerprint = self.fingerprint(conn)
+        kind = fingerprint[1]["kind"]
         if kind == "dead":
-            return
+            return None
 
         # Generate a uid for the connection
         uid = self.page.get_uid(conn)
         if uid in self.uids:
-            return
+            return None
         self.uids[uid] = conn
+        self.fingerprints[uid] = fingerprint
 
         # Fetch the pre and post object hierarchy
         pres, posts = self.get_connection_hierarchy(conn)
 
-        # Serialise the connection descriptor and send it to the client
-        info = dict(
+        # Serialise the connection descriptor for the client
+        return dict(
             uid=uid, pre=pres, post=posts, type="conn", parent=parent, kind=kind
         )
-        client.write_text(json.dumps(info))
 
     def handle_event(self, event, info):
         if event == "keyup":
@@ -1,12 +1,10 @@
 import copy
-import itertools
 
 import nengo
 import nengo.spa as spa
 
 try:
     import nengo_spa
-    from nengo_spa.examine import pairs
 except ImportError:
     nengo_spa = None
 import numpy as np
@@ -15,12 +13,33 @@ from nengo_gui.components.spa_plot import SpaPlot
 
 
 class Pointer(SpaPlot):
-    """Server side component for the Semantic Pointer Cloud"""
+    """Server side component for the Semantic Pointer Cloud
+
+    The similarities of the output to the keys (and pairs) of the
+    vocabulary are computed at most ``max_updates_per_second`` times per
+    simulated second. Of the keys more similar than ``threshold``, the
+    ``max_matches`` most similar ones are sent, but only if they or their
+    similarities changed by more than ``tolerance`` (or the last update is
+    older than ``max_unchanged_time``). Setting ``max_matches``,
+    ``tolerance`` and ``max_updates_per_second`` to 0 sends all keys more
+    similar than ``threshold`` on every time step.
+    """
 
     config_defaults = dict(
-        show_pairs=False, max_size=1000.0, **Component.config_defaults
+        show_pairs=False,
+        max_size=1000.0,
+        max_matches=10,
+        tolerance=0.01,
+        max_updates_per_second=100,
+        **Component.config_defaults,
     )
 
+    threshold = 0.01
+
+    # the client forgets data older than the time it keeps, so the
+    # matches are sent at least this often (in simulated seconds)
+    max_unchanged_time = 0.5
+
     def __init__(self, obj, **kwargs):
         super(Pointer, self).__init__(obj, **kwargs)
 
@@ -39,6 +58,14 @@ class Pointer(SpaPlot):
         if nengo_spa is not None:
             self.loop_in_whitelist.extend([nengo_spa.State])
 
+        # the labels and the matrix of the key (and pair) vectors, replaced
+        # when the vocabulary grows or the pairs are toggled
+        self.similarity = None
+        # the time, indices and similarities of the last sent matches
+        self.last_matches = None
+        self.next_update_time = 0.0
+        self.last_time = 0.0
+
         self.node = None
         self.conn1 = None
         self.conn2 = None
@@ -71,53 +98,69 @@ class Pointer(SpaPlot):
         page.model.nodes.remove(self.node)
 
     def gather_data(self, t, x):
-        vocab = self.vocab_out
-        key_similarities = np.dot(vocab.vectors, x)
-        over_threshold = key_similarities > 0.01
-        if isinstance(vocab, spa.Vocabulary):
-            matches = zip(
-                key_similarities[over_threshold], np.array(vocab.keys)[over_threshold]
-            )
-            if self.config.show_pairs:
-                self.vocab_out.include_pairs = True
-                pair_similarities = np.dot(vocab.vector_pairs, x)
-                over_threshold = pair_similarities > 0.01
-                pair_matches = zip(
-                    pair_similarities[over_threshold],
-                    np.array(vocab.key_pairs)[over_threshold],
-                )
-                matches = itertools.chain(matches, pair_matches)
-        else:
-            matches = zip(
-                key_similarities[over_threshold],
-                [k for i, k in enumerate(vocab) if over_threshold[i]],
-            )
-            if self.config.show_pairs:
-                pair_similarities = np.array(
-                    [np.dot(vocab.parse(p).v, x) for p in pairs(vocab)]
-                )
-                over_threshold = pair_similarities > 0.01
-                pair_matches = zip(
-                    pair_similarities[over_threshold],
-                    (k for i, k in enumerate(pairs(vocab)) if over_threshold[i]),
-                )
-                matches = itertools.chain(matches, pair_matches)
-
-        text = ";".join(["%0.2f%s" % (min(sim, 9.99), key) for sim, key in matches])
+        if t < self.last_time:
+            # the simulation was reset
+            self.last_matches = None
+            self.next_update_time = 0.0
+        self.last_time = t
+        if t >= self.next_update_time:
+            rate = self.config.max_updates_per_second
+            if rate > 0:
+                # allow for rounding errors in the time steps
+                self.next_update_time = t + 1.0 / rate - 1e-9
+            self.send_matches(t, x)
 
-        # msg sent as a string due to variable size of pointer names
-        msg = "%g %s" % (t, text)
-        self.data.append(msg)
         if self.override_target is None:
             return np.zeros(self.vocab_out.dimensions)
         else:
             v = (self.override_target.v - x) * 3
             return v
 
-    def update_client(self, client):
-        while len(self.data) > 0:
-            data = self.data.popleft()
-            client.write_text(data)
+    def find_matches(self, x):
+        """Return the indices and similarities of the most similar labels."""
+        length = self.vocab_length()
+        show_pairs = self.config.show_pairs
+        similarity = self.similarity
+        if similarity is None or similarity[:2] != (length, show_pairs):
+            labels, matrix = self.compute_labels_and_vectors()
+            similarity = length, show_pairs, np.array(labels, dtype=object), matrix
+            self.similarity = similarity
+            self.last_matches = None
+
+        similarities = np.dot(similarity[3], x)
+        k = self.config.max_matches
+        if 0 < k < len(similarities):
+            indices = np.sort(np.argpartition(similarities, -k)[-k:])
+            indices = indices[similarities[indices] > self.threshold]
+        else:
+            indices = np.flatnonzero(similarities > self.threshold)
+        return indices, similarities[indices]
+
+    def send_matches(self, t, x):
+        indices, similarities = self.find_matches(x)
+        if self.last_matches is not None and self.config.tolerance > 0:
+            last_t, last_indices, last_similarities = self.last_matches
+            if (
+                t - last_t < self.max_unchanged_time
+                and np.array_equal(indices, last_indices)
+                and np.all(
+                    np.abs(similarities - last_similarities) <= self.config.tolerance
+                )
+            ):
+                return
+        self.last_matches = t, indices, similarities
+
+        labels = self.similarity[2][indices]
+        text = ";".join(
+            [
+                "%0.2f%s" % (min(sim, 9.99), key)
+                for sim, key in zip(similarities, labels)
+            ]
+        )
+
+        # msg sent as a string due to variable size of pointer names
+        msg = "%g %s" % (t, text)
+        self.data.append(msg)
 
     def javascript(self):
         info = dict(uid=id(self), label=self.label)
@@ -129,14 +172,14 @@ class Pointer(SpaPlot):
             self.override_target = None
         elif msg[0:12] == ":check only:":
             if len(msg) == 12:
-                self.data.append("good_pointer")
+                self.data.append("good_pointer", droppable=False)
             else:
                 vocab = copy.deepcopy(self.vocab_out)
                 try:
                     vocab.parse(msg[12:])
-                    self.data.append("good_pointer")
+                    self.data.append("good_pointer", droppable=False)
                 except:
-                    self.data.append("bad_pointer")
+                    self.data.append("bad_pointer", droppable=False)
         else:
             # The message value is the new value for the output of the pointer
             try:
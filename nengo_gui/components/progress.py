@@ -12,12 +12,21 @@ class Progress(Component, ProgressBar):
 
     def update(self, progress):
         self.progress = progress
+        self.page.notify_clients()
+
+    def cache_stats(self):
+        """The hits, misses and size of the build cache, if it was used."""
+        cache = getattr(self.page, "build_cache", None)
+        if cache is None or cache.hits + cache.misses == 0:
+            return None
+        return {"hits": cache.hits, "misses": cache.misses, "size": cache.get_size()}
 
     def update_client(self, client):
         if self.progress is not None:
             client.write_text(
                 json.dumps(
                     {
+                        "cache": self.cache_stats() if self.progress.finished else None,
                         "name_during": escape(
                             getattr(self.progress, "name_during", "Building")
                         ),
@@ -1,9 +1,69 @@
-import collections
 import struct
 
 import nengo
 import numpy as np
 from nengo_gui.components.component import Component
+from nengo_gui.components.ring_buffer import RingBuffer
+
+# Spike raster frames start with a header of the encoding, the number of
+# neurons and the number of time steps, followed by the float32 time stamps
+# of all steps and the spikes of all steps in one of two encodings
+RASTER_HEADER = struct.Struct("<B3xII")
+# for each step the number of spikes followed by the neuron indices, each
+# stored as the difference to the previous index minus 1, as varints
+ENCODING_DELTA_VARINT = 0
+# for each step one bit per neuron, least significant bit first
+ENCODING_BITSET = 1
+
+# upper limit for the memory used by the buffer of spikes per raster
+MAX_BUFFER_BYTES = 4 * 1024 * 1024
+
+
+def encode_varints(values):
+    """Encode non-negative integers below 2**35 as LEB128 varints."""
+    values = np.asarray(values, dtype=np.int64)
+    n_bytes = 1 + sum((values >> shift) > 0 for shift in (7, 14, 21, 28))
+    starts = np.cumsum(n_bytes) - n_bytes
+    data = np.zeros(np.sum(n_bytes), dtype=np.uint8)
+    for i in range(5):
+        has_byte = n_bytes > i
+        more = n_bytes[has_byte] > i + 1
+        data[starts[has_byte] + i] = (values[has_byte] >> (7 * i)) & 0x7F | more << 7
+    return data
+
+
+def encode_spikes(t, bits, n_neurons):
+    """Encode the spikes of several time steps into one raster frame.
+
+    ``bits`` holds one row per time step with the spiking neurons packed
+    as a little endian bitset. The frame is sent as a bitset or as
+    delta-varint index lists, whichever is smaller.
+    """
+    n_steps = len(t)
+    header = RASTER_HEADER.pack(ENCODING_BITSET, n_neurons, n_steps)
+    times = np.asarray(t, dtype="<f4").tobytes()
+
+    spikes = np.unpackbits(bits, axis=1, count=n_neurons, bitorder="little")
+    steps, indices = np.nonzero(spikes)
+    # every varint takes at least a byte, so only try the index lists if
+    # they can be smaller than the bitset
+    if n_steps + len(indices) < bits.size:
+        counts = np.bincount(steps, minlength=n_steps)
+        deltas = indices.copy()
+        same_step = np.zeros(len(steps), dtype=bool)
+        same_step[1:] = steps[1:] == steps[:-1]
+        deltas[same_step] -= indices[np.flatnonzero(same_step) - 1] + 1
+
+        values = np.zeros(n_steps + len(indices), dtype=np.int64)
+        is_count = np.zeros(len(values), dtype=bool)
+        is_count[np.arange(n_steps) + np.cumsum(counts) - counts] = True
+        values[is_count] = counts
+        values[~is_count] = deltas
+        varints = encode_varints(values)
+        if len(varints) < bits.size:
+            header = RASTER_HEADER.pack(ENCODING_DELTA_VARINT, n_neurons, n_steps)
+            return header + times + varints.tobytes()
+    return header + times + np.ascontiguousarray(bits).tobytes()
 
 
 def is_spiking(neuron_type):
@@ -22,12 +82,13 @@ class Raster(Component):
         super(Raster, self).__init__()
         self.neuron_type = obj.neuron_type
         self.obj = obj.neurons
-        self.data = collections.deque()
         self.max_neurons = obj.n_neurons
 
         self.conn = None
         self.node = None
-        self.chosen = None
+        # the chosen neurons and the buffer for their spikes are replaced
+        # together, since the simulator thread may be using them
+        self.selection = None
 
     def attach(self, page, config, uid):
         super(Raster, self).attach(page, config, uid)
@@ -45,21 +106,35 @@ class Raster(Component):
             page.model.connections.remove(self.conn)
 
     def gather_data(self, t, x):
-        if self.chosen is None:
+        if self.selection is None:
             self.compute_chosen_neurons()
-        indices = np.nonzero(x[self.chosen])[0]
-        data = struct.pack("<f%dH" % len(indices), t, *indices)
-        self.data.append(data)
+        chosen, data = self.selection
+        data.append(t, np.packbits(x[chosen] != 0, bitorder="little"))
 
     def compute_chosen_neurons(self):
         n_neurons = self.page.config[self].n_neurons
         n_neurons = min(n_neurons, self.max_neurons)
-        self.chosen = np.linspace(0, self.max_neurons - 1, n_neurons).astype(int)
+        chosen = np.linspace(0, self.max_neurons - 1, n_neurons).astype(int)
+        row_bytes = (n_neurons + 7) // 8
+        capacity = int(np.clip(MAX_BUFFER_BYTES // max(row_bytes, 1), 64, 1024))
+        data = RingBuffer(row_bytes, capacity=capacity, dtype=np.uint8)
+        self.page.configure_buffer(data)
+        self.selection = chosen, data
+
+    def buffers(self):
+        return [] if self.selection is None else [self.selection[1]]
 
     def update_client(self, client):
-        while len(self.data) > 0:
-            data = self.data.popleft()
-            client.write_binary(data)
+        if self.selection is None:
+            return
+        chosen, data = self.selection
+        chunks = data.read()
+        if len(chunks) == 0:
+            return
+        rows = np.concatenate(
+            [np.frombuffer(chunk, dtype=data.row_dtype) for chunk in chunks]
+        )
+        client.write_binary(encode_spikes(rows["t"], rows["x"], len(chosen)))
 
     def javascript(self):
         info = dict(uid=id(self), label=self.label, max_neurons=self.max_neurons)
@@ -0,0 +1,229 @@
+import collections
+import threading
+
+import numpy as np
+
+# what a buffer does when the client does not keep up with the simulator
+DROP_OLDEST = "drop-oldest"
+DECIMATE = "decimate"
+THROTTLE = "throttle"
+OVERFLOW_POLICIES = (DROP_OLDEST, DECIMATE, THROTTLE)
+
+
+class BoundedBuffer(object):
+    """Base class of the buffers passing data from the simulator to the
+    websocket thread.
+
+    The buffers have a fixed capacity, so a client that falls behind
+    (slow network, background tab, ...) cannot make the server run out of
+    memory. What happens once a buffer is full is set by `policy`:
+
+    ``"drop-oldest"``
+        The oldest data is dropped (the default).
+    ``"decimate"``
+        Every other new item is dropped while the buffer is full, so the
+        client keeps receiving data at a lower time resolution.
+    ``"throttle"``
+        The simulation is slowed down by calling `throttle` (usually
+        `.SimControl.throttle`) until the client has caught up. If it does
+        not catch up in time, the oldest data is dropped until the client
+        reads from the buffer again.
+
+    The number of items dropped so far is counted in `dropped`.
+    """
+
+    def __init__(self, capacity, policy=DROP_OLDEST):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy %r" % (policy,))
+        self.capacity = capacity
+        self.policy = policy
+        self.throttle = None
+        self.dropped = 0
+        self.stalled = False  # the client did not catch up when throttled
+        self._skip = False
+
+    def is_full(self):
+        raise NotImplementedError
+
+    def make_room(self):
+        """Apply the overflow policy before an item is added.
+
+        Returns False if the item should be dropped instead.
+        """
+        if self.policy == DROP_OLDEST or not self.is_full():
+            return True
+        if self.policy == DECIMATE:
+            self._skip = not self._skip
+            if self._skip:
+                self.dropped += 1
+            return not self._skip
+        if self.throttle is not None and not self.stalled:
+            self.stalled = not self.throttle(self)
+        return True
+
+
+class RingBuffer(BoundedBuffer):
+    """Preallocated buffer of ``[t, x...]`` rows passed from the simulator
+    to the websocket thread.
+
+    The simulator thread appends rows with `append` (or `extend`) and the
+    websocket thread sends them with `read`, which returns memoryviews into
+    the buffer instead of copies. Each row is stored in the binary format
+    sent to the client: a little endian float32 time stamp followed by the
+    values in `dtype`.
+
+    The buffer is full once the consumer falls behind by more than
+    `capacity` rows minus a safety margin. Then the `policy` is applied;
+    rows that are overwritten before being read are dropped.
+
+    Parameters
+    ----------
+    size : int
+        Number of values per row (not including the time stamp).
+    capacity : int, optional
+        Number of rows in the buffer.
+    dtype : str, optional
+        Data type of the values.
+    policy : str, optional
+        What to do when the buffer is full (see `.BoundedBuffer`).
+    """
+
+    def __init__(self, size, capacity=1024, dtype="<f4", policy=DROP_OLDEST):
+        super(RingBuffer, self).__init__(capacity, policy=policy)
+        self.size = size
+        self.row_dtype = np.dtype([("t", "<f4"), ("x", dtype, (size,))])
+        self.rows = np.zeros(capacity, dtype=self.row_dtype)
+        self._t = self.rows["t"]
+        self._x = self.rows["x"]
+        self._bytes = self.rows.view(np.uint8)
+
+        # rows that are not read within this many rows of being overwritten
+        # are dropped, so they are not modified while being sent
+        self.margin = max(capacity // 4, 1)
+
+        # total number of rows ever written and read
+        self.write_index = 0
+        self.read_index = 0
+
+    def __len__(self):
+        return self.write_index - self.read_index
+
+    def is_full(self):
+        return len(self) >= self.capacity - self.margin
+
+    def append(self, t, x):
+        if not self.make_room():
+            return
+        i = self.write_index % self.capacity
+        self._t[i] = t
+        self._x[i] = x
+        self.write_index += 1
+
+    def extend(self, t, x):
+        """Append several rows given as an array of time stamps and an
+        array of values with one row per time stamp."""
+        if self.policy == DECIMATE and self.is_full():
+            self.dropped += len(t) // 2
+            t, x = t[1::2], x[1::2]
+        elif not self.make_room():
+            return
+        n = len(t)
+        if n > self.capacity:
+            t, x = t[-self.capacity :], x[-self.capacity :]
+            self.write_index += n - self.capacity
+            n = self.capacity
+        i = self.write_index % self.capacity
+        first = min(n, self.capacity - i)
+        self._t[i : i + first] = t[:first]
+        self._x[i : i + first] = x[:first]
+        self._t[: n - first] = t[first:]
+        self._x[: n - first] = x[first:]
+        self.write_index += n
+
+    def read(self):
+        """Return the unread rows as a list of (at most two) memoryviews.
+
+        The returned memoryviews are only valid until rows are written to
+        the same position again, so they should be sent immediately.
+        """
+        self.stalled = False
+        write_index = self.write_index
+        n = write_index - self.read_index
+        if n > self.capacity - self.margin:
+            n_dropped = n - (self.capacity - self.margin)
+            self.dropped += n_dropped
+            self.read_index += n_dropped
+            n -= n_dropped
+        if n <= 0:
+            return []
+
+        itemsize = self.row_dtype.itemsize
+        start = self.read_index % self.capacity
+        end = start + n
+        self.read_index = write_index
+        if end <= self.capacity:
+            return [memoryview(self._bytes[start * itemsize : end * itemsize])]
+        end -= self.capacity
+        return [
+            memoryview(self._bytes[start * itemsize :]),
+            memoryview(self._bytes[: end * itemsize]),
+        ]
+
+    def reset(self):
+        """Drop all unread rows."""
+        self.read_index = self.write_index
+
+
+class MessageQueue(BoundedBuffer):
+    """Bounded queue of messages (text or bytes) for the client.
+
+    Used for data that does not fit into the fixed size rows of a
+    `.RingBuffer`. The simulator thread adds messages with `append` and
+    the websocket thread takes them all with `read`.
+
+    Messages appended with ``droppable=False`` (e.g. a change of the
+    legend or the reply to a request from the client) are never dropped.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Number of messages in the queue before it overflows.
+    policy : str, optional
+        What to do when the queue is full (see `.BoundedBuffer`).
+    """
+
+    def __init__(self, capacity=1024, policy=DROP_OLDEST):
+        super(MessageQueue, self).__init__(capacity, policy=policy)
+        self.messages = collections.deque()
+        # messages that are not droppable but were at the front of the
+        # queue when the oldest message was dropped
+        self.kept = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.kept) + len(self.messages)
+
+    def is_full(self):
+        return len(self.messages) >= self.capacity
+
+    def append(self, msg, droppable=True):
+        if droppable and not self.make_room():
+            return
+        with self.lock:
+            self.messages.append((droppable, msg))
+            while len(self.messages) > self.capacity:
+                droppable, oldest = self.messages.popleft()
+                if droppable:
+                    self.dropped += 1
+                else:
+                    self.kept.append(oldest)
+
+    def read(self):
+        """Remove and return all messages in the order they were added."""
+        with self.lock:
+            messages = self.kept
+            messages.extend(msg for _, msg in self.messages)
+            self.kept = []
+            self.messages.clear()
+        self.stalled = False
+        return messages
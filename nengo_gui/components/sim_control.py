@@ -7,16 +7,23 @@ import nengo
 import nengo_gui.exec_env
 import numpy as np
 from nengo_gui.components.component import Component
-from nengo_gui.server import WebSocketFrame
 
 
 class SimControl(Component):
     """Controls simulation via control node embedded in the neural model.
 
     Also instantiates and communicates with the SimControl and the Toolbar
-    on the JavaScript side, which includes the task of back-end selection."""
+    on the JavaScript side, which includes the task of back-end selection.
 
-    config_defaults = dict(shown_time=0.5, kept_time=4.0)
+    The time and speed of the simulation are sent at most
+    ``max_updates_per_second`` times per second and only when they have
+    changed: the time at all, or the speed by more than ``rate_tolerance``
+    (relative). The status and the number of dropped items are sent when
+    they change. The available back-ends are discovered once and cached
+    (see `.exec_env.discover_backends`)."""
+
+    config_defaults = dict(shown_time=0.5, kept_time=4.0, max_updates_per_second=60)
+    runs_in_sim_process = False
 
     def __init__(self, dt=0.001):
         # this component must be the very first one defined, so
@@ -27,12 +34,13 @@ class SimControl(Component):
         self.rate = 0.0
         self.model_dt = dt
         self.rate_tau = 0.5
-        self.last_send_rate = None
+        self.last_send_rate = None  # (time, rate, rate_proportion) last sent
+        self.next_send_time = 0.0  # earliest wall time of the next rate packet
+        self.rate_tolerance = 0.01
         self.sim_ticks = 0
         self.skipped = 1
         self.time = 0.0
         self.last_status = None
-        self.next_ping_time = None
         self.send_config_options = False
         self.reset_inform = False
         self.node = None
@@ -42,10 +50,23 @@ class SimControl(Component):
         self.rate_proportion = 1.0  # current proportion of full speed
         self.smart_sleep_offset = 0.0  # difference from actual sleep time
 
+        # used by run_batch to run several steps per runner iteration
+        self.batching = False  # is a batch of steps being run?
+        self.steps_per_batch = 1
+        self.max_steps_per_batch = 1000
+        self.max_batch_latency = 0.02  # longest wall time of a batch (s)
+        self.step_cost = None  # wall time to compute one step (s)
+        self.paused_time = 0.0  # wall time paused during the current batch
+
+        # used by throttle to wait for clients that fall behind
+        self.max_throttle_time = 1.0  # longest wait for a client (s)
+        self.last_dropped = 0  # items dropped by Components, last sent
+
     def attach(self, page, config, uid):
         super(SimControl, self).attach(page, config, uid)
         self.shown_time = config.shown_time
         self.kept_time = config.kept_time
+        self.max_updates_per_second = config.max_updates_per_second
 
     def add_nengo_objects(self, page):
         with page.model:
@@ -66,6 +87,11 @@ class SimControl(Component):
         self.actual_model_dt = t - self.time
         self.time = t
         self.sim_ticks += 1
+        if self.batching:
+            # timing is done once per batch by run_batch
+            self.wait_while_paused()
+            return
+        self.page.notify_clients()
 
         now = timeit.default_timer()
         if self.last_tick is not None:
@@ -107,12 +133,100 @@ class SimControl(Component):
             self.smart_sleep(self.delay_time)
 
         self.last_tick = now
+        self.wait_while_paused()
 
-        # Sleeps to prevent the simulation from advancing
-        # while the simulation is paused
+    def wait_while_paused(self):
+        """Sleeps to prevent the simulation from advancing while paused."""
+        start = None
         while self.paused and self.page.sim is not None:
+            if start is None:
+                start = timeit.default_timer()
             time.sleep(0.01)
             self.last_tick = None
+        if start is not None:
+            self.paused_time += timeit.default_timer() - start
+
+    def throttle(self, buffer):
+        """Sleeps until the client has caught up with a full buffer.
+
+        Called from the simulator thread by Components whose buffer is
+        full if the overflow policy of the Page is "throttle" (see
+        `.BoundedBuffer`). This slows the simulation down to the speed at
+        which the client receives the data. Returns False if the client
+        did not catch up within ``max_throttle_time`` seconds.
+        """
+        start = timeit.default_timer()
+        self.page.notify_clients()
+        while buffer.is_full():
+            if self.page.sim is None:
+                return False
+            if timeit.default_timer() - start > self.max_throttle_time:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def run_batch(self, sim):
+        """Run several simulator steps at once and keep to the target rate.
+
+        The number of steps is chosen from the measured cost of a step and
+        the target rate, such that a batch takes at most
+        ``max_batch_latency`` seconds. This bounds how long a reset or a
+        model change takes to stop the simulation and how long the plots
+        wait for new data. Pausing takes effect at the next step.
+        """
+        n_steps = self.steps_per_batch
+        start_time = self.time
+        self.paused_time = 0.0
+        self.batching = True
+        start = timeit.default_timer()
+        try:
+            # the build progress bar would otherwise be updated (and its
+            # update thread joined) for every batch
+            sim.run_steps(n_steps, progress_bar=False)
+        finally:
+            self.batching = False
+        elapsed = timeit.default_timer() - start - self.paused_time
+        self.page.notify_clients()
+
+        step_cost = elapsed / n_steps
+        if self.step_cost is None:
+            self.step_cost = step_cost
+        else:
+            self.step_cost = 0.5 * (self.step_cost + step_cost)
+
+        # how long the batch should have taken
+        model_time = max(self.time - start_time, 0.0)
+        if self.target_scale is not None:
+            if self.target_scale <= 0:
+                target = elapsed + 0.5 * n_steps
+            else:
+                target = elapsed / self.target_scale
+        elif self.target_rate is not None:
+            target = model_time / self.target_rate
+        else:
+            target = elapsed
+
+        # a change of the target rate may ask for a long delay, which is
+        # spread over the following (smaller) batches
+        self.delay_time = np.clip((target - elapsed) / n_steps, 0, 0.5)
+        if self.delay_time > 0:
+            self.smart_sleep(
+                min(
+                    self.delay_time * n_steps,
+                    max(self.max_batch_latency, self.delay_time),
+                )
+            )
+
+        total = timeit.default_timer() - start - self.paused_time
+        if total > 0:
+            decay = np.exp(-total / self.rate_tau)
+            self.rate = self.rate * decay + (1 - decay) * model_time / total
+            self.rate_proportion = elapsed / total
+
+        step_time = max(self.step_cost, target / n_steps, 1e-9)
+        self.steps_per_batch = int(
+            np.clip(self.max_batch_latency / step_time, 1, self.max_steps_per_batch)
+        )
 
     def busy_sleep(self, delay_time):
         now = timeit.default_timer()
@@ -142,22 +256,41 @@ class SimControl(Component):
         for i in data:
             print(i)
 
-    def update_client(self, client):
-        now = time.time()
-        # send off a ping now and then so we'll notice when connection closes
-        if self.next_ping_time is None or now > self.next_ping_time:
-            client.write_frame(WebSocketFrame(1, 0, WebSocketFrame.OP_PING, 0, b""))
-            self.next_ping_time = now + 2.0
+    def rate_changed(self, values):
+        """Whether the time, rate and proportion differ from the last sent."""
+        if self.last_send_rate is None:
+            return True
+        t, rate, proportion = values
+        last_t, last_rate, last_proportion = self.last_send_rate
+        tol = self.rate_tolerance
+        return (
+            t != last_t
+            or abs(rate - last_rate) > tol * max(abs(last_rate), 1e-3)
+            or abs(proportion - last_proportion) > tol
+        )
 
+    def update_client(self, client):
+        # the connection is kept alive by the pings of the WebSocketLoop
         if self.page.changed:
             self.paused = True
             self.page.sim = None
             self.page.changed = False
-        if not self.paused or self.reset_inform:
-            client.write_binary(
-                struct.pack("<fff", self.time, self.rate, self.rate_proportion)
-            )
+        # while paused the values do not change, but the latest values are
+        # sent if they were held back by the rate limit
+        now = time.time()
+        values = (self.time, self.rate, self.rate_proportion)
+        if self.reset_inform or (
+            now >= self.next_send_time and self.rate_changed(values)
+        ):
+            client.write_binary(struct.pack("<fff", *values))
+            self.last_send_rate = values
             self.reset_inform = False
+            if self.max_updates_per_second > 0:
+                self.next_send_time = now + 1.0 / self.max_updates_per_second
+        dropped = sum(self.page.count_dropped().values())
+        if dropped != self.last_dropped:
+            client.write_text("dropped:%d" % dropped)
+            self.last_dropped = dropped
         status = self.get_status()
         if status != self.last_status:
             client.write_text("status:%s" % status)
@@ -191,16 +324,14 @@ class SimControl(Component):
     def message(self, msg):
         if msg == "pause":
             self.paused = True
-            if "on_pause" in self.page.locals:
-                self.page.locals["on_pause"](self.page.sim)
+            self.page.call_hook("on_pause", self.page.sim)
         elif msg == "config":
             self.send_config_options = True
         elif msg == "continue":
             if self.page.sim is None:
                 self.page.rebuild = True
             else:
-                if "on_continue" in self.page.locals:
-                    self.page.locals["on_continue"](self.page.sim)
+                self.page.call_hook("on_continue", self.page.sim)
             self.paused = False
         elif msg == "reset":
             self.paused = True
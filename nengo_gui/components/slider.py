@@ -1,4 +1,3 @@
-import collections
 import struct
 
 import numpy as np
@@ -13,6 +12,7 @@ except ImportError:
 
 from nengo_gui.compat import is_iterable
 from nengo_gui.components.component import Component
+from nengo_gui.components.ring_buffer import MessageQueue
 
 
 class OverriddenOutput(Process):
@@ -87,7 +87,7 @@ class Slider(Component):
         self.node = node
         self.base_output = node.output
 
-        self.to_client = collections.deque()
+        self.to_client = MessageQueue()
         self.from_client = np.zeros(node.size_out, dtype=np.float64) * np.nan
         self.override_output = OverriddenOutput(
             self.base_output, self.to_client, self.from_client
@@ -104,6 +104,9 @@ class Slider(Component):
         super(Slider, self).attach(page, config, uid)
         self.label = page.get_label(self.node)
 
+    def buffers(self):
+        return [self.to_client]
+
     def add_nengo_objects(self, page):
         if Process.__module__ == "nengo_gui.components.slider":
             self.node.output = self.override_output.make_step(
@@ -132,8 +135,7 @@ class Slider(Component):
         return "new Nengo.Slider(main, sim, %s);" % json
 
     def update_client(self, client):
-        while len(self.to_client) > 0:
-            to_client = self.to_client.popleft()
+        for to_client in self.to_client.read():
             client.write_binary(to_client)
 
     def message(self, msg):
@@ -1,13 +1,15 @@
-import collections
-
 import nengo.spa as spa
+import numpy as np
 
 try:
     import nengo_spa
+    from nengo_spa.examine import pairs
 except ImportError:
     nengo_spa = None
+    pairs = None
 
 from nengo_gui.components.component import Component
+from nengo_gui.components.ring_buffer import MessageQueue
 
 
 class SpaPlot(Component):
@@ -16,7 +18,7 @@ class SpaPlot(Component):
     def __init__(self, obj, **kwargs):
         super(SpaPlot, self).__init__()
         self.obj = obj
-        self.data = collections.deque()
+        self.data = MessageQueue()
         self.target = kwargs.get("args", "default")
         if self.target.startswith("<"):
             target_obj = getattr(obj, self.target[1:-1])
@@ -29,9 +31,38 @@ class SpaPlot(Component):
         self.label = page.get_label(self.obj)
         self.vocab_out.include_pairs = config.show_pairs
 
+    def buffers(self):
+        return [self.data]
+
+    def vocab_length(self):
+        vocab = self.vocab_out
+        return len(vocab.keys) if isinstance(vocab, spa.Vocabulary) else len(vocab)
+
+    def compute_labels_and_vectors(self):
+        """Return the labels and vectors of the keys and, if shown, pairs."""
+        vocab = self.vocab_out
+        if isinstance(vocab, spa.Vocabulary):
+            labels = list(vocab.keys)
+        else:
+            labels = list(vocab.keys())
+        vectors = [np.asarray(vocab.vectors).reshape(len(labels), vocab.dimensions)]
+
+        if self.config.show_pairs:
+            vocab.include_pairs = True
+            # briefly there can be no pairs
+            if isinstance(vocab, spa.Vocabulary):
+                if vocab.vector_pairs is not None and len(vocab.key_pairs) > 0:
+                    labels += vocab.key_pairs
+                    vectors.append(vocab.vector_pairs)
+            elif pairs is not None:
+                key_pairs = sorted(pairs(vocab))
+                if len(key_pairs) > 0:
+                    labels += key_pairs
+                    vectors.append(np.array([vocab.parse(p).v for p in key_pairs]))
+        return labels, np.vstack(vectors)
+
     def update_client(self, client):
-        while len(self.data) > 0:
-            data = self.data.popleft()
+        for data in self.data.read():
             client.write_text(data)
 
     def code_python_args(self, uids):
@@ -1,15 +1,28 @@
+import struct
+import threading
+
 import nengo
 import nengo.spa as spa
 import numpy as np
-
-try:
-    from nengo_spa.examine import pairs
-except ImportError:
-    pairs = None
-
 from nengo_gui.components.component import Component
+from nengo_gui.components.ring_buffer import RingBuffer
 from nengo_gui.components.spa_plot import SpaPlot
 
+# Similarity frames start with a header of the number of similarities per
+# time step and the number of time steps, followed by the float32 time
+# stamps of all steps and the float16 similarities of all steps
+SIMILARITY_HEADER = struct.Struct("<II")
+
+
+def encode_similarities(t, similarities):
+    """Encode the similarities of several time steps into one frame."""
+    n_steps, n_lines = similarities.shape
+    return (
+        SIMILARITY_HEADER.pack(n_lines, n_steps)
+        + np.asarray(t, dtype="<f4").tobytes()
+        + np.asarray(similarities, dtype="<f2").tobytes()
+    )
+
 
 class SpaSimilarity(SpaPlot):
     """Line graph showing semantic pointer decoded values over time"""
@@ -21,19 +34,26 @@ class SpaSimilarity(SpaPlot):
     def __init__(self, obj, **kwargs):
         super(SpaSimilarity, self).__init__(obj, **kwargs)
 
+        # the labels shown in the legend on the client
         if isinstance(self.vocab_out, spa.Vocabulary):
-            self.old_vocab_length = len(self.vocab_out.keys)
-            self.labels = self.vocab_out.keys
+            self.labels = list(self.vocab_out.keys)
         else:
-            self.old_vocab_length = len(self.vocab_out)
-            self.labels = tuple(self.vocab_out.keys())
-        self.old_pairs_length = 0
-        self.previous_pairs = False
+            self.labels = list(self.vocab_out.keys())
+
+        # the matrix of the key (and pair) vectors and the buffer for the
+        # similarities are replaced together when the vocabulary grows
+        self.similarity = None
+        self.lock = threading.Lock()
 
         # Nengo objects for data collection
         self.node = None
         self.conn = None
 
+    def buffers(self):
+        if self.similarity is None:
+            return [self.data]
+        return [self.data, self.similarity[2]]
+
     def add_nengo_objects(self, page):
         with page.model:
             if self.target.startswith("<"):
@@ -48,57 +68,63 @@ class SpaSimilarity(SpaPlot):
         page.model.connections.remove(self.conn)
         page.model.nodes.remove(self.node)
 
-    def gather_data(self, t, x):
-        vocab = self.vocab_out
-
-        if isinstance(vocab, spa.Vocabulary):
-            length = len(vocab.keys)
-        else:
-            length = len(vocab)
-        if self.old_vocab_length != length:
-            self.update_legend(vocab)
-
-        # get the similarity and send it
-        key_similarity = np.dot(vocab.vectors, x)
-        simi_list = ["{:.2f}".format(simi) for simi in key_similarity]
-
-        if self.config.show_pairs:
-
-            # briefly there can be no pairs, so catch the error
-            try:
-                if isinstance(vocab, spa.Vocabulary):
-                    pair_similarity = np.dot(vocab.vector_pairs, x)
-                else:
-                    pair_similarity = (
-                        np.dot(vocab.parse(p).v, x) for p in pairs(vocab)
+    def compute_similarity(self, length):
+        labels, matrix = self.compute_labels_and_vectors()
+        data = RingBuffer(len(labels), dtype="<f2")
+        self.page.configure_buffer(data)
+
+        with self.lock:
+            if self.similarity is not None:
+                # send the similarities computed with the old matrix first
+                frame = self.encode(self.similarity[2])
+                if frame is not None:
+                    self.data.append(frame, droppable=False)
+            if labels[: len(self.labels)] == self.labels:
+                new_labels = labels[len(self.labels) :]
+                if len(new_labels) > 0:
+                    self.data.append(
+                        '["update_legend", "%s"]' % '","'.join(new_labels),
+                        droppable=False,
                     )
-                simi_list += ["{:.2f}".format(simi) for simi in pair_similarity]
-            except TypeError:
-                pass
-
-        if simi_list != []:
-            self.data.append('["data_msg", %g, %s]' % (t, ",".join(simi_list)))
-
-    def update_legend(self, vocab):
-        # pass all the missing keys
-        legend_update = []
-        if isinstance(vocab, spa.Vocabulary):
-            legend_update += vocab.keys[self.old_vocab_length :]
-            self.old_vocab_length = len(vocab.keys)
-        else:
-            legend_update += list(vocab.keys())[self.old_vocab_length :]
-            self.old_vocab_length = len(vocab)
-        # and all the missing pairs if we're showing pairs
-        if self.config.show_pairs:
-            # briefly there can be no pairs, so catch the error
-            try:
-                key_pairs = list(pairs(vocab))
-                legend_update += key_pairs[self.old_pairs_length :]
-                self.old_pairs_length = len(key_pairs)
-            except TypeError:
-                pass
-
-        self.data.append('["update_legend", "%s"]' % ('","'.join(legend_update)))
+            else:
+                self.data.append(
+                    '["reset_legend_and_data", "%s"]' % '","'.join(labels),
+                    droppable=False,
+                )
+            self.labels = labels
+            self.similarity = length, matrix, data
+        return self.similarity
+
+    def gather_data(self, t, x):
+        length = self.vocab_length()
+        similarity = self.similarity
+        if similarity is None or similarity[0] != length:
+            similarity = self.compute_similarity(length)
+        _, matrix, data = similarity
+        if len(matrix) > 0:
+            data.append(t, np.dot(matrix, x))
+
+    @staticmethod
+    def encode(data):
+        chunks = data.read()
+        if len(chunks) == 0:
+            return None
+        rows = np.concatenate(
+            [np.frombuffer(chunk, dtype=data.row_dtype) for chunk in chunks]
+        )
+        return encode_similarities(rows["t"], rows["x"])
+
+    def update_client(self, client):
+        with self.lock:
+            messages = self.data.read()
+            frame = None if self.similarity is None else self.encode(self.similarity[2])
+        for msg in messages:
+            if isinstance(msg, bytes):
+                client.write_binary(msg)
+            else:
+                client.write_text(msg)
+        if frame is not None:
+            client.write_binary(frame)
 
     def javascript(self):
         """Generate the javascript that will create the client-side object"""
@@ -114,32 +140,14 @@ class SpaSimilarity(SpaPlot):
 
     def message(self, msg):
         """Message receive function for show_pairs toggling and reset"""
-        vocab = self.vocab_out
-        # Send the new labels
-        if self.config.show_pairs:
-            vocab.include_pairs = True
-            if isinstance(vocab, spa.Vocabulary):
-                self.data.append(
-                    '["reset_legend_and_data", "%s"]'
-                    % ('","'.join(vocab.keys + vocab.key_pairs))
-                )
-                # if we're starting to show pairs, track pair length
-                self.old_pairs_length = len(vocab.key_pairs)
-
-            else:
-                self.data.append(
-                    '["reset_legend_and_data", "%s"]'
-                    % ('","'.join(set(vocab.keys()) | pairs(vocab)))
-                )
-                # if we're starting to show pairs, track pair length
-                self.old_pairs_length = len(pairs(vocab))
-        else:
-            vocab.include_pairs = False
-            if isinstance(vocab, spa.Vocabulary):
-                self.data.append(
-                    '["reset_legend_and_data", "%s"]' % ('","'.join(vocab.keys))
-                )
-            else:
-                self.data.append(
-                    '["reset_legend_and_data", "%s"]' % ('","'.join(vocab))
-                )
+        labels, _ = self.compute_labels_and_vectors()
+        if not self.config.show_pairs:
+            self.vocab_out.include_pairs = False
+        with self.lock:
+            # the similarities are computed again for the new labels
+            self.similarity = None
+            self.labels = labels
+            self.data.append(
+                '["reset_legend_and_data", "%s"]' % '","'.join(labels),
+                droppable=False,
+            )
@@ -1,8 +1,7 @@
-import struct
-
 import nengo
 import numpy as np
 from nengo_gui.components.component import Component
+from nengo_gui.components.ring_buffer import RingBuffer
 
 
 class SpikeGrid(Component):
@@ -14,7 +13,6 @@ class SpikeGrid(Component):
     def __init__(self, obj, n_neurons=None):
         super(SpikeGrid, self).__init__()
         self.obj = obj
-        self.data = []
         self.max_neurons = self.obj.neurons.size_out
         if n_neurons is None:
             n_neurons = self.max_neurons
@@ -22,7 +20,9 @@ class SpikeGrid(Component):
         self.pixels_x = np.ceil(np.sqrt(self.n_neurons))
         self.pixels_y = np.ceil(float(self.n_neurons) / self.pixels_x)
         self.n_pixels = self.pixels_x * self.pixels_y
-        self.struct = struct.Struct("<f%dB" % (self.n_pixels))
+        # rows of a float32 time stamp followed by one byte per pixel
+        self.data = RingBuffer(int(self.n_pixels), dtype=np.uint8)
+        self.pixels = np.zeros(int(self.n_pixels), dtype=np.uint8)
         self.max_value = 1.0
         self.node = None
         self.conn = None
@@ -31,6 +31,9 @@ class SpikeGrid(Component):
         super(SpikeGrid, self).attach(page, config, uid)
         self.label = page.get_label(self.obj)
 
+    def buffers(self):
+        return [self.data]
+
     def add_nengo_objects(self, page):
         with page.model:
             self.node = nengo.Node(self.gather_data, size_in=self.obj.neurons.size_out)
@@ -44,19 +47,14 @@ class SpikeGrid(Component):
         self.max_value = max(self.max_value, np.max(x))
         if len(x) > self.n_neurons:
             x = x[: self.n_neurons]
-        y = np.zeros(int(self.n_pixels), dtype=np.uint8)
         if self.max_value > 0:
-            y[: x.size] = x * 255 / self.max_value
-        data = self.struct.pack(t, *y)
-        self.data.append(data)
+            self.pixels[: x.size] = x * 255 / self.max_value
+        self.data.append(t, self.pixels)
 
     def update_client(self, client):
-        length = len(self.data)
-        if length > 0:
-            item = bytes().join(self.data[:length])
-            del self.data[:length]
+        for chunk in self.data.read():
             try:
-                client.write_binary(item)
+                client.write_binary(chunk)
             except:
                 # if there is a communication problem, just drop the frames
                 # (this usually happens when there is too much data to send)
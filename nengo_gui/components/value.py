@@ -1,8 +1,8 @@
-import struct
-
 import nengo
 from nengo import spa
 from nengo_gui.components.component import Component
+from nengo_gui.components.decimator import Decimator
+from nengo_gui.components.ring_buffer import RingBuffer
 
 
 class Value(Component):
@@ -15,6 +15,7 @@ class Value(Component):
         show_legend=False,
         legend_labels=[],
         synapse=0.01,
+        max_points_per_second=0,
         **Component.config_defaults,
     )
 
@@ -23,9 +24,6 @@ class Value(Component):
         # the object whose decoded value should be displayed
         self.obj = obj
 
-        # the pending data to be sent to the client
-        self.data = []
-
         # grab the output of the object
         self.output = obj
         default_out = Value.default_output(self.obj)
@@ -35,10 +33,12 @@ class Value(Component):
         # the number of data values to send
         self.n_lines = int(self.output.size_out)
 
-        # the binary data format to sent in.  In this case, it is a list of
+        # the pending data to be sent to the client.  Each row is a list of
         # floats, with the first float being the time stamp and the rest
         # being the vector values, one per dimension.
-        self.struct = struct.Struct("<%df" % (1 + self.n_lines))
+        self.data = RingBuffer(self.n_lines)
+        # reduces the rows to what the client can actually display
+        self.decimator = Decimator(self.data.row_dtype)
 
         # Nengo objects for data collection
         self.node = None
@@ -48,6 +48,10 @@ class Value(Component):
         super(Value, self).attach(page, config, uid)
         # use the label of the object being plotted as our label
         self.label = page.get_label(self.obj)
+        self.decimator.max_rate = config.max_points_per_second
+
+    def buffers(self):
+        return [self.data]
 
     def add_nengo_objects(self, page):
         # create a Node and a Connection so the Node will be given the
@@ -66,18 +70,13 @@ class Value(Component):
         """This is the Node function for the Node created in add_nengo_objects
         It will be called by the running model, and will store the data
         that should be sent to the client"""
-        self.data.append(self.struct.pack(t, *x))
+        self.data.append(t, x)
 
     def update_client(self, client):
-        length = len(self.data)
-        if length > 0:
-            # we do this slicing because self.gather_data is concurrently
-            # appending things to self.data.  This means that self.data may
-            # increase in length during this call, so we do the slicing
-            # and deletion to maintain thread safety
-            item = bytes().join(self.data[:length])
-            del self.data[:length]
-            client.write_binary(item)
+        # self.gather_data is concurrently appending to self.data, the
+        # ring buffer only hands out the rows completed before this call
+        for chunk in self.decimator.process(self.data.read()):
+            client.write_binary(chunk)
 
     def javascript(self):
         # generate the javascript that will create the client-side object
@@ -97,6 +96,8 @@ class Value(Component):
             self.page.config[self].synapse = synapse
             self.page.modified_config()
             self.page.sim = None
+        elif msg.startswith("resolution:"):
+            self.decimator.resolution = float(msg[11:])
 
     @staticmethod
     def default_output(obj):
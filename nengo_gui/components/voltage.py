@@ -1,10 +1,10 @@
 from __future__ import division
 
-import struct
-
 import nengo
 import numpy as np
 from nengo_gui.components.component import Component
+from nengo_gui.components.decimator import Decimator
+from nengo_gui.components.ring_buffer import RingBuffer
 
 
 class Voltage(Component):
@@ -15,20 +15,25 @@ class Voltage(Component):
         min_value=0.0,
         show_legend=False,
         legend_labels=[],
+        max_points_per_second=0,
         **Component.config_defaults,
     )
 
     def __init__(self, obj, n_neurons=5):
         super(Voltage, self).__init__()
         self.obj = obj.neurons
-        self.data = []
         self.max_neurons = int(self.obj.size_out)
         self.n_neurons = min(n_neurons, self.max_neurons)
-        self.struct = struct.Struct("<%df" % (1 + self.n_neurons))
+        self.data = RingBuffer(self.n_neurons)
+        self.decimator = Decimator(self.data.row_dtype)
 
     def attach(self, page, config, uid):
         super(Voltage, self).attach(page, config, uid)
         self.label = page.get_label(self.obj.ensemble)
+        self.decimator.max_rate = config.max_points_per_second
+
+    def buffers(self):
+        return [self.data]
 
     def add_nengo_objects(self, page):
         with page.model:
@@ -37,10 +42,6 @@ class Voltage(Component):
     def remove_nengo_objects(self, page):
         page.model.probes.remove(self.probe)
 
-    def format_data(self, t, x):
-        data = self.struct.pack(t, *x[: self.n_neurons])
-        self.data.append(data)
-
     def update_client(self, client):
         sim = self.page.sim
         if sim is None:
@@ -50,12 +51,17 @@ class Voltage(Component):
         # can't limit the size of probes. Fix this up with Nengo 2.1.
         data = sim.data.raw[self.probe][:]
         del sim.data.raw[self.probe][:]  # clear the data
+        if len(data) == 0:
+            return
         trange = sim.trange()[-len(data) :]
 
-        for t, datum in zip(trange, data):
-            datum = datum + np.arange(self.n_neurons)
-            packet = self.struct.pack(t, *datum)
-            client.write_binary(packet)
+        self.data.extend(trange, np.asarray(data) + np.arange(self.n_neurons))
+        for chunk in self.decimator.process(self.data.read()):
+            client.write_binary(chunk)
+
+    def message(self, msg):
+        if msg.startswith("resolution:"):
+            self.decimator.resolution = float(msg[11:])
 
     def javascript(self):
         info = dict(uid=id(self), label=self.label, n_lines=self.n_neurons, synapse=0)
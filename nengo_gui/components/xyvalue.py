@@ -1,8 +1,7 @@
-import collections
-import struct
-
 import nengo
 from nengo_gui.components.component import Component
+from nengo_gui.components.decimator import Decimator
+from nengo_gui.components.ring_buffer import RingBuffer
 
 
 class XYValue(Component):
@@ -10,21 +9,31 @@ class XYValue(Component):
     x-y plot."""
 
     config_defaults = dict(
-        max_value=1, min_value=-1, index_x=0, index_y=1, **Component.config_defaults
+        max_value=1,
+        min_value=-1,
+        index_x=0,
+        index_y=1,
+        max_points_per_second=0,
+        **Component.config_defaults,
     )
 
     def __init__(self, obj):
         super(XYValue, self).__init__()
         self.obj = obj
-        self.data = collections.deque()
         self.n_lines = int(obj.size_out)
-        self.struct = struct.Struct("<%df" % (1 + self.n_lines))
+        self.data = RingBuffer(self.n_lines)
+        # min/max rows would distort the trajectory, so only keep the last
+        self.decimator = Decimator(self.data.row_dtype, mode="last")
         self.node = None
         self.conn = None
 
     def attach(self, page, config, uid):
         super(XYValue, self).attach(page, config, uid)
         self.label = page.get_label(self.obj)
+        self.decimator.max_rate = config.max_points_per_second
+
+    def buffers(self):
+        return [self.data]
 
     def add_nengo_objects(self, page):
         with page.model:
@@ -36,12 +45,15 @@ class XYValue(Component):
         page.model.nodes.remove(self.node)
 
     def gather_data(self, t, x):
-        self.data.append(self.struct.pack(t, *x))
+        self.data.append(t, x)
 
     def update_client(self, client):
-        while len(self.data) > 0:
-            data = self.data.popleft()
-            client.write_binary(data)
+        for chunk in self.decimator.process(self.data.read()):
+            client.write_binary(chunk)
+
+    def message(self, msg):
+        if msg.startswith("resolution:"):
+            self.decimator.resolution = float(msg[11:])
 
     def javascript(self):
         info = dict(uid=id(self), n_lines=self.n_lines, label=self.label)
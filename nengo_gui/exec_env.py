@@ -19,18 +19,33 @@ known_modules = [
 ]
 
 
-def discover_backends():
-    found_modules = {}
-    for name in known_modules:
-        try:
-            mod = importlib.import_module(name)
-        except Exception as e:
-            # TODO only ignore ImportErrors "No module named ...", display
-            # other errors to the user as they might help debugging broken
-            # backend installations
-            continue
-        found_modules[name] = mod
-    return found_modules
+# backends found by discover_backends, None until they are discovered
+_backends = None
+_backends_lock = threading.Lock()
+
+
+def discover_backends(refresh=False):
+    """Return a dictionary of the importable backends in `known_modules`.
+
+    Trying to import the backends that are not installed is slow, so they
+    are discovered once and cached for the lifetime of the process; pass
+    ``refresh=True`` to discover them again (e.g., after installing one).
+    """
+    global _backends
+    with _backends_lock:
+        if _backends is None or refresh:
+            found_modules = {}
+            for name in known_modules:
+                try:
+                    mod = importlib.import_module(name)
+                except Exception as e:
+                    # TODO only ignore ImportErrors "No module named ...",
+                    # display other errors to the user as they might help
+                    # debugging broken backend installations
+                    continue
+                found_modules[name] = mod
+            _backends = found_modules
+        return dict(_backends)
 
 
 class StartedSimulatorException(Exception):
@@ -50,19 +65,81 @@ def make_dummy(cls):
                 raise StartedSimulatorException()
             super(DummySimulator, self).__init__(*args, **kwargs)
 
+    DummySimulator.original = cls
     return DummySimulator
 
 
+def simulator_class(backend):
+    """Return the Simulator of a backend.
+
+    While a script is executed, the Simulators of all backends are
+    replaced for all threads; this returns the original class.
+    """
+    cls = backend.Simulator
+    while getattr(cls, "original", None) is not None:
+        cls = cls.original
+    return cls
+
+
 # thread local storage for storing whether we are executing a script
 flag = threading.local()
 
 compiled_filename = "<nengo_gui_compiled>"
 
 
+# scripts are executed one at a time, since each ExecutionEnvironment
+# replaces the Simulators for all threads and restores them when it exits
+_execution_lock = threading.RLock()
+
+
 def is_executing():
     return getattr(flag, "executing", False)
 
 
+class ThreadLocalStdout(object):
+    """Replaces sys.stdout while ExecutionEnvironments are in use.
+
+    What a thread inside an ExecutionEnvironment prints is recorded by that
+    environment; the output of all other threads goes to ``stdout``.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def _stream(self):
+        stream = getattr(flag, "stdout", None)
+        return self.stdout if stream is None else stream
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        self._stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream(), name)
+
+
+_stdout_lock = threading.Lock()
+_n_capturing = 0  # number of ExecutionEnvironments recording stdout
+
+
+def _capture_stdout():
+    global _n_capturing
+    with _stdout_lock:
+        if _n_capturing == 0 and not isinstance(sys.stdout, ThreadLocalStdout):
+            sys.stdout = ThreadLocalStdout(sys.stdout)
+        _n_capturing += 1
+
+
+def _release_stdout():
+    global _n_capturing
+    with _stdout_lock:
+        _n_capturing -= 1
+        if _n_capturing == 0 and isinstance(sys.stdout, ThreadLocalStdout):
+            sys.stdout = sys.stdout.stdout
+
+
 def determine_line_number():
     """Checks stack trace to determine the line number we are currently at.
 
@@ -100,20 +177,26 @@ class ExecutionEnvironment(object):
             self.directory = os.path.dirname(filename)
         self.added_directory = None
         self.allow_sim = allow_sim
+        self.imported = {}  # module name -> file, see imported_modules()
 
     def __enter__(self):
+        if not self.allow_sim:
+            _execution_lock.acquire()
         if self.directory is not None and self.directory not in sys.path:
             sys.path.insert(0, self.directory)
             self.added_directory = self.directory
 
         self.stdout = StringIO()
+        self.modules_before = set(sys.modules)
 
-        flag.executing = True
+        self.was_executing = is_executing()
+        flag.executing = not self.allow_sim
         self.simulators = {}
 
-        # add hooks to record stdout
-
-        sys.stdout = self.stdout
+        # record stdout of this thread
+        self.previous_stdout = getattr(flag, "stdout", None)
+        flag.stdout = self.stdout
+        _capture_stdout()
 
         if not self.allow_sim:
             for mod in discover_backends().values():
@@ -123,9 +206,10 @@ class ExecutionEnvironment(object):
     def __exit__(self, exc_type, exc_value, traceback):
         for mod, cls in self.simulators.items():
             mod.Simulator = cls
-        flag.executing = False
+        flag.executing = self.was_executing
 
-        sys.stdout = sys.__stdout__
+        flag.stdout = self.previous_stdout
+        _release_stdout()
 
         # ensure what has been printed is safe to show in html
         s = self.stdout.getvalue()
@@ -133,6 +217,32 @@ class ExecutionEnvironment(object):
         self.stdout = StringIO(s)
 
         if not self.allow_sim:
+            self.imported = self.imported_modules()
             if self.added_directory is not None:
                 sys.path.remove(self.added_directory)
                 self.added_directory = None
+            _execution_lock.release()
+
+    def imported_modules(self):
+        """Find the modules imported from the directory of the script.
+
+        Only modules of packages that were not imported before the script
+        was executed are considered, so that e.g. nengo_gui itself is
+        excluded even if it can be imported from that directory.
+        """
+        imported = {}
+        if self.directory is None:
+            return imported
+        directory = os.path.join(os.path.abspath(self.directory), "")
+        for name in set(sys.modules) - self.modules_before:
+            if name.split(".", 1)[0] in self.modules_before:
+                continue
+            filename = getattr(sys.modules[name], "__file__", None)
+            if filename is None:
+                continue
+            filename = os.path.abspath(filename)
+            if filename.endswith(".pyc"):
+                filename = filename[:-1]
+            if filename.startswith(directory):
+                imported[name] = filename
+        return imported
@@ -0,0 +1,260 @@
+"""Notifications about changed files, shared by all pages of a server.
+
+On Linux, the directories of the watched files are watched with inotify:
+the thread of the `FileWatcher` sleeps until one of them changes, so
+watching costs nothing while the files are unchanged and changes are seen
+immediately. Elsewhere (or if inotify is not available) the modification
+times of the watched files are polled.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# inotify flags (from sys/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# written files are closed, replaced files (e.g., by editors saving
+# atomically) are moved or created
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_event_header = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        for name in ("inotify_init1", "inotify_add_watch", "inotify_rm_watch"):
+            getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class Watch(object):
+    """Files watched for a callback, created by `FileWatcher.watch`."""
+
+    def __init__(self, watcher, paths, callback):
+        self.watcher = watcher
+        self.paths = frozenset()
+        self.callback = callback
+        self.update(paths)
+
+    def update(self, paths):
+        """Watch these files instead of the ones watched so far."""
+        paths = frozenset(os.path.abspath(p) for p in paths)
+        if paths != self.paths:
+            self.watcher._update(self, paths)
+
+    def cancel(self):
+        """Stop watching the files."""
+        self.watcher._update(self, frozenset())
+
+
+class FileWatcher(object):
+    """Calls the callbacks of `Watch` objects when their files change.
+
+    The callbacks are called from the thread of the watcher with the set of
+    changed paths (as absolute paths). Several changes detected at once are
+    passed in one call.
+
+    Parameters
+    ----------
+    poll_interval : float, optional
+        Time in seconds between checks of the modification times, if the
+        files cannot be watched with inotify.
+    use_inotify : bool, optional
+        Whether to use inotify where it is available.
+    """
+
+    def __init__(self, poll_interval=0.5, use_inotify=True):
+        self.poll_interval = poll_interval
+        self.watches = {}  # Watch -> paths
+        self.closed = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._libc = _load_inotify() if use_inotify else None
+        self._fd = None
+        self._wakeup = None
+        self._directories = {}  # directory -> inotify watch descriptor
+        self._wds = {}  # inotify watch descriptor -> directory
+        self._mtimes = {}  # path -> modification time, when polling
+        self._stopped = threading.Event()
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                logger.info("inotify is not available, polling files instead.")
+                self._libc = None
+            else:
+                self._fd = fd
+                self._wakeup = os.pipe()
+
+    @property
+    def uses_inotify(self):
+        return self._fd is not None
+
+    def watch(self, paths, callback):
+        """Call ``callback`` with the changed paths when files change."""
+        return Watch(self, paths, callback)
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.watches.clear()
+            thread = self._thread
+        if self._wakeup is not None:
+            os.write(self._wakeup[1], b"x")
+        self._stopped.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            for fd in self._wakeup:
+                os.close(fd)
+
+    def _update(self, watch, paths):
+        with self._lock:
+            if self.closed:
+                return
+            watch.paths = paths
+            if paths:
+                self.watches[watch] = paths
+            else:
+                self.watches.pop(watch, None)
+            watched = set()
+            for p in self.watches.values():
+                watched.update(p)
+
+            if self._fd is not None:
+                self._update_directories(set(os.path.dirname(p) for p in watched))
+            else:
+                for path in watched:
+                    if path not in self._mtimes:
+                        self._mtimes[path] = self._mtime(path)
+                for path in list(self._mtimes):
+                    if path not in watched:
+                        del self._mtimes[path]
+
+            if self._thread is None and watched:
+                target = self._read_events if self._fd is not None else self._poll
+                self._thread = threading.Thread(target=target)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _update_directories(self, directories):
+        for directory in directories:
+            if directory in self._directories:
+                continue
+            wd = self._libc.inotify_add_watch(
+                self._fd, directory.encode(sys.getfilesystemencoding()), WATCH_MASK
+            )
+            if wd < 0:
+                logger.warning(
+                    "Cannot watch %s: %s",
+                    directory,
+                    os.strerror(ctypes.get_errno()),
+                )
+                continue
+            self._directories[directory] = wd
+            self._wds[wd] = directory
+        for directory in list(self._directories):
+            if directory not in directories:
+                wd = self._directories.pop(directory)
+                del self._wds[wd]
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _notify(self, changed):
+        with self._lock:
+            watches = [
+                (watch, paths & changed)
+                for watch, paths in self.watches.items()
+                if not paths.isdisjoint(changed)
+            ]
+        for watch, paths in watches:
+            try:
+                watch.callback(paths)
+            except Exception:
+                logger.exception("Error handling changed files %s", sorted(paths))
+
+    def _read_events(self):
+        while not self.closed:
+            try:
+                readable, _, _ = select.select([self._fd, self._wakeup[0]], [], [])
+            except (OSError, select.error) as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+            if self._wakeup[0] in readable or self.closed:
+                break
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as err:
+                if err.errno in (errno.EAGAIN, errno.EINTR):
+                    continue
+                raise
+            self._notify(self._parse_events(data))
+
+    def _parse_events(self, data):
+        changed = set()
+        offset = 0
+        with self._lock:
+            while offset + _event_header.size <= len(data):
+                wd, mask, _, length = _event_header.unpack_from(data, offset)
+                offset += _event_header.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost, so any of the files could have changed
+                    for paths in self.watches.values():
+                        changed.update(paths)
+                directory = self._wds.get(wd, None)
+                if directory is not None and name and not mask & IN_IGNORED:
+                    changed.add(
+                        os.path.join(
+                            directory, name.decode(sys.getfilesystemencoding())
+                        )
+                    )
+        return changed
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            st = os.stat(path)
+            return st.st_mtime, st.st_size
+        except OSError:
+            return None
+
+    def _poll(self):
+        while not self.closed:
+            self._stopped.wait(self.poll_interval)
+            with self._lock:
+                paths = list(self._mtimes)
+            changed = set()
+            for path in paths:
+                mtime = self._mtime(path)
+                with self._lock:
+                    if path in self._mtimes and self._mtimes[path] != mtime:
+                        self._mtimes[path] = mtime
+                        changed.add(path)
+            if changed and not self.closed:
+                self._notify(changed)
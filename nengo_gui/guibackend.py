@@ -4,7 +4,6 @@ from __future__ import print_function
 
 import json
 import logging
-import mimetypes
 import os
 import os.path
 import pkgutil
@@ -22,11 +21,15 @@ import time
 
 import nengo_gui
 import nengo_gui.exec_env
+import nengo_gui.file_watcher
+import nengo_gui.metrics
 import nengo_gui.page
+import nengo_gui.static_assets
 from nengo_gui import server, url
 from nengo_gui._vendor.cookies import Cookie
-from nengo_gui.completion import get_completions
+from nengo_gui.completion import CompletionService
 from nengo_gui.password import checkpw, gensalt
+from nengo_gui.sim_process import SimProcess
 
 logger = logging.getLogger(__name__)
 
@@ -104,6 +107,102 @@ class RequireAuthentication(object):
         request_handler.persist_session(session)
 
 
+class ComponentChannel(object):
+    """Connects a Component to its websocket in the server's WebSocketLoop."""
+
+    def __init__(self, request_handler, component):
+        self.request_handler = request_handler
+        self.component = component
+        self.error = None
+
+    def _current_component(self):
+        if self.component.replace_with is not None:
+            self.component.finish()
+            self.component = self.component.replace_with
+        return self.component
+
+    def receive(self, ws, msg):
+        component = self._current_component()
+        return self.request_handler._handle_ws_msg(component, msg)
+
+    def update(self, ws):
+        # send data to the component
+        component = self._current_component()
+        sim = component.page.sim
+        if isinstance(sim, SimProcess) and sim.relays(component):
+            sim.update_client(component, ws)
+        else:
+            component.update_client(ws)
+        component.page.save_config(lazy=True)
+
+    def close(self, ws, error):
+        self.error = error
+
+    def finish(self):
+        if self.error is None:
+            # the component was removed by the client
+            return
+        # the connection was closed or the server has shut down
+        self.component.page.save_config(lazy=False)  # Stop nicely
+        self.component.finish()
+
+
+class PageChannel(object):
+    """Multiplexes the connections of all Components of a Page over one
+    websocket.
+
+    The client opens a channel to a component with an ``open:<n>:<uid>``
+    message, where ``<n>`` is a channel number chosen by the client and
+    ``<uid>`` the component uid. Messages for a component are sent as
+    ``<n>:<message>`` and ``close:<n>`` closes the channel. All data that
+    the components send to the client in one update is batched into a
+    single frame by a `server.MultiplexedWriter`.
+    """
+
+    def __init__(self, request_handler):
+        self.request_handler = request_handler
+        self.channels = {}
+        self.error = None
+
+    def receive(self, ws, msg):
+        if msg.data.startswith("open:"):
+            n, uid = msg.data[5:].split(":", 1)
+            component = self.request_handler.server.component_uids[int(uid)]
+            self.channels[int(n)] = ComponentChannel(self.request_handler, component)
+        elif msg.data.startswith("close:"):
+            self.channels.pop(int(msg.data[6:]), None)
+        else:
+            n, data = msg.data.split(":", 1)
+            channel = self.channels.get(int(n), None)
+            if channel is None:
+                logger.warning("Message for unknown channel %s", n)
+            else:
+                msg = server.WebSocketFrame(msg.fin, msg.rsv, msg.opcode, 0, data)
+                if channel.receive(ws, msg) is False:
+                    del self.channels[int(n)]
+        return True
+
+    def update(self, ws):
+        writer = server.MultiplexedWriter(ws)
+        for n, channel in list(self.channels.items()):
+            writer.channel = n
+            try:
+                channel.update(writer)
+            except server.SocketClosedError:
+                raise
+            except Exception:
+                logger.exception("Error during websocket communication.")
+        writer.flush()
+
+    def close(self, ws, error):
+        self.error = error
+
+    def finish(self):
+        for channel in self.channels.values():
+            channel.error = self.error
+            channel.finish()
+
+
 class GuiRequestHandler(server.HttpWsRequestHandler):
     http_commands = {
         "/": "serve_main",
@@ -113,12 +212,17 @@ class GuiRequestHandler(server.HttpWsRequestHandler):
         "/complete": "complete",
         "/shutdown": "request_shutdown",
         "/favicon.ico": "serve_favicon",
+        "/metrics": "serve_metrics",
     }
 
     def get_expected_origins(self):
         login_host = self.get_session().login_host
         return [login_host] if login_host is not None else []
 
+    @property
+    def ws_compression(self):
+        return self.server.settings.ws_compression
+
     def http_GET(self):
         if self.server.settings.prefix is None:
             if self.server.verify_token(RequireAuthentication.get_token(self)):
@@ -175,9 +279,30 @@ class GuiRequestHandler(server.HttpWsRequestHandler):
         fn = os.path.normpath(self.resource[1:])
         if os.path.commonprefix((static_dir, fn)) != static_dir:
             raise server.Forbidden()
-        mimetype, encoding = mimetypes.guess_type(fn)
-        data = pkgutil.get_data("nengo_gui", fn)
-        return server.HttpResponse(data, mimetype)
+        asset = self.server.static_assets.get(fn)
+        if asset is None:
+            raise server.InvalidResource(self.resource)
+
+        encoding = asset.choose_encoding(self.headers.get("Accept-Encoding"))
+        if self.query.get("v", [None])[0] == asset.version:
+            cache_control = nengo_gui.static_assets.CACHE_FOREVER
+        else:
+            cache_control = nengo_gui.static_assets.REVALIDATE
+        headers = (
+            ("ETag", asset.etag(encoding)),
+            ("Last-Modified", asset.last_modified),
+            ("Cache-Control", cache_control),
+            ("Vary", "Accept-Encoding"),
+        )
+        if asset.is_not_modified(
+            self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")
+        ):
+            return server.HttpResponse(b"", code=304, headers=headers)
+        if encoding is not None:
+            headers += (("Content-Encoding", encoding),)
+        return server.HttpResponse(
+            asset.variants[encoding], asset.mimetype, headers=headers
+        )
 
     @RequireAuthentication("/login")
     def browse(self):
@@ -222,21 +347,22 @@ class GuiRequestHandler(server.HttpWsRequestHandler):
 
     @RequireAuthentication("/login")
     def complete(self):
-        completions = get_completions(
+        completions = self.server.completion.complete(
             self.db["code"],
             int(self.db["row"]) + 1,
             int(self.db["col"]),
             self.db["filename"],
+            session=self.db.get("session", None),
         )
         return server.JsonResponse(
             [
                 {
-                    "name": c.name,
-                    "value": c.name,
+                    "name": name,
+                    "value": name,
                     "score": 1,
-                    "meta": c.type,
+                    "meta": type_,
                 }
-                for c in completions
+                for name, type_ in completions
             ]
         )
 
@@ -256,9 +382,23 @@ class GuiRequestHandler(server.HttpWsRequestHandler):
 
         # fill in the javascript needed and return the complete page
         components = page.create_javascript()
+        html = self.server.static_assets.versioned(html)
         data = (html % dict(components=components)).encode("utf-8")
         return server.HttpResponse(data)
 
+    @RequireAuthentication("/login")
+    def serve_metrics(self):
+        """Handles http://host:port/metrics (see `nengo_gui.metrics`)"""
+        metrics = self.server.metrics
+        if not metrics.enabled:
+            raise server.InvalidResource(self.resource)
+        if self.query.get("format", [None])[0] == "json":
+            return server.JsonResponse(metrics.to_json())
+        return server.HttpResponse(
+            metrics.to_prometheus().encode("utf-8"),
+            mimetype="text/plain; version=0.0.4",
+        )
+
     @RequireAuthentication("/login")
     def request_shutdown(self):
         self.server.shutdown()
@@ -269,39 +409,22 @@ class GuiRequestHandler(server.HttpWsRequestHandler):
 
     @RequireAuthentication("/login")
     def ws_default(self):
-        """Handles ws://host:port/viz_component with a websocket"""
-        # figure out what component is being connected to
+        """Handles ws://host:port/viz_component with a websocket
 
-        gui = self.server
-        uid = int(self.query["uid"][0])
-
-        component = gui.component_uids[uid]
-        while self.ws.state is server.WebSocket.ST_OPEN:
-            try:
-                if component.replace_with is not None:
-                    component.finish()
-                    component = component.replace_with
-
-                # read all data coming from the component
-                msg = self.ws.read_frame()
-                while msg is not None:
-                    if not self._handle_ws_msg(component, msg):
-                        return
-                    msg = self.ws.read_frame()
-
-                # send data to the component
-                component.update_client(self.ws)
-                component.page.save_config(lazy=True)
-                time.sleep(0.01)
-            except server.SocketClosedError:
-                # This error means the server has shut down
-                component.page.save_config(lazy=False)  # Stop nicely
-                break
-            except:
-                logger.exception("Error during websocket communication.")
+        With a `uid` in the query, the websocket connects to a single
+        component. With `page` in the query, the websocket is shared by all
+        components of a page (see PageChannel)."""
+        if "page" in self.query:
+            channel = PageChannel(self)
+        else:
+            # figure out what component is being connected to
+            uid = int(self.query["uid"][0])
+            component = self.server.component_uids[uid]
+            channel = ComponentChannel(self, component)
 
-        # After hot loop
-        component.finish()
+        # the websocket is serviced by the server's websocket loop, which
+        # calls channel.finish() in a worker once the connection is closed
+        self.server.serve_websocket(self, channel)
 
     def _handle_ws_msg(self, component, msg):
         """Handle websocket message. Returns True when further messages should
@@ -313,6 +436,9 @@ class GuiRequestHandler(server.HttpWsRequestHandler):
         else:
             try:
                 component.message(msg.data)
+                sim = component.page.sim
+                if isinstance(sim, SimProcess):
+                    sim.message(component, msg.data)
                 return True
             except:
                 logging.exception("Error processing: %s", repr(msg.data))
@@ -413,6 +539,8 @@ class GuiServerSettings(object):
         "ssl_key",
         "session_duration",
         "prefix",
+        "ws_compression",
+        "metrics",
     ]
 
     def __init__(
@@ -424,6 +552,8 @@ class GuiServerSettings(object):
         ssl_key=None,
         session_duration=60 * 60 * 24 * 30,
         prefix="",
+        ws_compression=True,
+        metrics=False,
     ):
         self.listen_addr = listen_addr
         self.auto_shutdown = auto_shutdown
@@ -432,6 +562,8 @@ class GuiServerSettings(object):
         self.ssl_key = ssl_key
         self.session_duration = session_duration
         self.prefix = prefix
+        self.ws_compression = ws_compression
+        self.metrics = metrics
 
     @property
     def use_ssl(self):
@@ -480,8 +612,52 @@ class GuiServer(server.ManagedThreadHttpServer):
         self.model_context = model_context
         self.page_settings = page_settings
 
+        # the static files, read once to serve them from memory
+        self.static_assets = nengo_gui.static_assets.StaticAssets()
+
+        # notifies the pages when their files are changed
+        self.file_watcher = nengo_gui.file_watcher.FileWatcher()
+
+        # code completion for the editor, computed in a child process that
+        # loads the commonly used modules before the first request
+        self.completion = CompletionService()
+        self.completion.start()
+
+        # performance counters, served at /metrics if enabled
+        self.metrics = nengo_gui.metrics.Metrics(enabled=self.settings.metrics)
+        self.metrics.add_collector(self.collect_metrics)
+
         self._last_access = time.time()
 
+    def shutdown(self):
+        server.ManagedThreadHttpServer.shutdown(self)
+        self.completion.close()
+        self.file_watcher.close()
+
+    def collect_metrics(self):
+        """Return the current state of the server and its pages as samples
+        of `nengo_gui.metrics.Metrics`."""
+        websockets = self.websockets
+        samples = [
+            ("pages", "gauge", {}, len(self.pages)),
+            ("websockets", "gauge", {}, self.ws_loop.n_websockets),
+            (
+                "websocket_sent_frames",
+                "counter",
+                {},
+                sum(ws.n_frames_sent for ws in websockets),
+            ),
+            (
+                "websocket_sent_bytes",
+                "counter",
+                {},
+                sum(ws.n_bytes_sent for ws in websockets),
+            ),
+        ]
+        for page in list(self.pages):
+            samples.extend(page.collect_metrics())
+        return samples
+
     def create_page(self, filename, reset_cfg=False):
         """Create a new Page with this configuration"""
         page = nengo_gui.page.Page(
@@ -1,15 +1,63 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import timeit
 from collections import OrderedDict
 
 import nengo
+import numpy as np
 from nengo_gui.grandalf.graphs import Edge, Graph, Vertex
 from nengo_gui.grandalf.layouts import SugiyamaLayout, VertexViewer
 
+logger = logging.getLogger(__name__)
+
 
 class Layout(object):
-    """Generates layouts for nengo Networks"""
+    """Generates layouts for nengo Networks
+
+    Parameters
+    ----------
+    model : nengo.Network
+        The model containing the networks to lay out.
+    engine : "auto", "layered" or "sugiyama", optional
+        ``"sugiyama"`` lays out with grandalf's `SugiyamaLayout`, whose
+        crossing reduction gets slow for large networks. ``"layered"`` uses
+        `layered_layout`, which works on arrays and stops reducing crossings
+        after ``time_budget``. ``"auto"`` uses grandalf for networks with up
+        to ``max_sugiyama_vertices`` children and `layered_layout` otherwise.
+    time_budget : float, optional
+        Time in seconds after which `layered_layout` stops reducing the
+        crossings and uses the best ordering found so far.
+    max_sugiyama_vertices : int, optional
+        Largest number of children of a network laid out by grandalf if
+        ``engine`` is ``"auto"``.
+    cache : LayoutCache, optional
+        Where to look up the layouts of networks with the same topology as
+        an earlier one before computing them.
+    """
+
+    engines = ("auto", "layered", "sugiyama")
 
-    def __init__(self, model):
+    def __init__(
+        self,
+        model,
+        engine="auto",
+        time_budget=0.5,
+        max_sugiyama_vertices=50,
+        cache=None,
+    ):
+        if engine not in self.engines:
+            raise ValueError(
+                "Unknown layout engine %r (expected one of %s)"
+                % (engine, ", ".join(self.engines))
+            )
         self.model = model
+        self.engine = engine
+        self.time_budget = time_budget
+        self.max_sugiyama_vertices = max_sugiyama_vertices
+        self.cache = cache
 
         # dictionary to keep track of parents of items in Network
         self.parents = {}
@@ -52,18 +100,18 @@ class Layout(object):
             parent = self.parents.get(obj, None)
         return parent
 
-    def compute_bounds(self, core):
-        """Determine the min/max x/y values in the graph_core"""
+    def compute_bounds(self, views):
+        """Determine the min/max x/y values of the views of a graph core"""
         minx = None
         maxx = None
         miny = None
         maxy = None
 
-        for v in core.V():
-            x0 = v.view.xy[0] - v.view.w / 2.0
-            x1 = v.view.xy[0] + v.view.w / 2.0
-            y0 = v.view.xy[1] - v.view.h / 2.0
-            y1 = v.view.xy[1] + v.view.h / 2.0
+        for view in views:
+            x0 = view.xy[0] - view.w / 2.0
+            x1 = view.xy[0] + view.w / 2.0
+            y0 = view.xy[1] - view.h / 2.0
+            y1 = view.xy[1] + view.h / 2.0
             if minx is None or x0 < minx:
                 minx = x0
             if maxx is None or x1 > maxx:
@@ -77,22 +125,18 @@ class Layout(object):
     def make_layout(self, network):
         """Generate a feed-forward layout for this network"""
 
-        # build the graph to pass into grandalf
-        # note that grandalf flows from top to bottom, so x and y are switched
-        # from what we do in nengo_gui (so the flow is left to right)
+        # note that the layouts flow from top to bottom, so x and y are
+        # switched from what we do in nengo_gui (so the flow is left to right)
         vertices = OrderedDict()
         for n in network.nodes:
-            vertices[n] = Vertex(n)
             # default sizes for nodes: 10x20
-            vertices[n].view = VertexViewer(w=8, h=16)
+            vertices[n] = VertexViewer(w=8, h=16)
         for e in network.ensembles:
-            vertices[e] = Vertex(e)
             # default sizes for ensembles: 10x20
-            vertices[e].view = VertexViewer(w=10, h=20)
+            vertices[e] = VertexViewer(w=10, h=20)
         for n in network.networks:
-            vertices[n] = Vertex(n)
             # default sizes for networks: 40x40
-            vertices[n].view = VertexViewer(w=40, h=40)
+            vertices[n] = VertexViewer(w=40, h=40)
 
         # define the connections.  Any connection to a component inside a
         # subnetwork is replaced with a connection to the parent that is a
@@ -123,23 +167,30 @@ class Layout(object):
                 # so ignore it.
                 print("error processing", c)
             else:
-                edges[c] = Edge(vertices[pre], vertices[post], data=c)
+                edges[c] = (pre, post)
 
-        # generate the graph. Since OrderedDict instances are used for both
-        # vertices and edges, the output generated by grandalf will be stable.
-        graph = Graph(vertices.values(), edges.values())
+        engine = self.engine
+        if engine == "auto":
+            small = len(vertices) <= self.max_sugiyama_vertices
+            engine = "sugiyama" if small else "layered"
 
-        # do the layouts.  Note that each graph core is laid out separately,
-        # since the layout algorithm requires a connected graph.  (The graph
-        # cores are the separate connected graphs in the full network)
-        layouts = [SugiyamaLayout(g) for g in graph.C]
-        for layout in layouts:
-            layout.init_all()
-            layout.draw(3)  # do three passes to improve crossings
+        if self.cache is not None:
+            key = topology_key(engine, vertices, edges)
+            layouts = self.cache.get(key)
+            if layouts is not None and len(layouts) == len(vertices):
+                return dict(
+                    (obj, dict(zip("xywh", layout)))
+                    for obj, layout in zip(vertices, layouts)
+                )
+
+        if engine == "sugiyama":
+            cores = self.sugiyama_cores(vertices, edges)
+        else:
+            cores = self.layered_cores(vertices, edges)
 
         # now rescale all the layouts to fit within a (0,0,1,1) bounding box
 
-        bounds = [self.compute_bounds(g) for g in graph.C]
+        bounds = [self.compute_bounds(views.values()) for views in cores]
 
         widths = [b[2] - b[0] for b in bounds]
         heights = [b[3] - b[1] for b in bounds]
@@ -161,7 +212,7 @@ class Layout(object):
         # do the rescaling
         # minx, miny, maxx, maxy are in the space of the core being laid out
         # x0, y0, x1, y1 are in the space of the network positions
-        for i, core in enumerate(graph.C):
+        for i, views in enumerate(cores):
             scale_y = 1.0 / (heights[i] + spacing * 2)
             x1 = x0 + widths[i] * scale_x
             y0 = spacing * scale_y
@@ -169,14 +220,458 @@ class Layout(object):
 
             minx, miny, maxx, maxy = bounds[i]
 
-            for v in core.V():
-                x = x0 + (v.view.xy[0] - minx) * (x1 - x0) / (maxx - minx)
-                y = y0 + (v.view.xy[1] - miny) * (y1 - y0) / (maxy - miny)
-                w = v.view.w * (x1 - x0) / (maxx - minx)
-                h = v.view.h * (y1 - y0) / (maxy - miny)
-                pos[v.data] = dict(x=x, y=y, w=w, h=h)
+            for obj, view in views.items():
+                x = x0 + (view.xy[0] - minx) * (x1 - x0) / (maxx - minx)
+                y = y0 + (view.xy[1] - miny) * (y1 - y0) / (maxy - miny)
+                w = view.w * (x1 - x0) / (maxx - minx)
+                h = view.h * (y1 - y0) / (maxy - miny)
+                pos[obj] = dict(x=x, y=y, w=w, h=h)
 
             # place the next core beside this one
             x0 = x1 + spacing * scale_x
 
+        if self.cache is not None:
+            self.cache.set(key, [[pos[obj][k] for k in "xywh"] for obj in vertices])
         return pos
+
+    def sugiyama_cores(self, vertices, edges):
+        """Lay out the graph with grandalf.
+
+        Returns a list of the graph cores (the separate connected graphs in
+        the network), each a dictionary mapping objects to their views.
+        """
+        grandalf_vertices = OrderedDict()
+        for obj, view in vertices.items():
+            grandalf_vertices[obj] = Vertex(obj)
+            grandalf_vertices[obj].view = view
+        grandalf_edges = [
+            Edge(grandalf_vertices[pre], grandalf_vertices[post], data=c)
+            for c, (pre, post) in edges.items()
+        ]
+
+        # generate the graph. Since OrderedDict instances are used for both
+        # vertices and edges, the output generated by grandalf will be stable.
+        graph = Graph(grandalf_vertices.values(), grandalf_edges)
+
+        # do the layouts.  Note that each graph core is laid out separately,
+        # since the layout algorithm requires a connected graph.  (The graph
+        # cores are the separate connected graphs in the full network)
+        layouts = [SugiyamaLayout(g) for g in graph.C]
+        for layout in layouts:
+            layout.init_all()
+            layout.draw(3)  # do three passes to improve crossings
+
+        return [OrderedDict((v.data, v.view) for v in core.V()) for core in graph.C]
+
+    def layered_cores(self, vertices, edges):
+        """Lay out the graph with `layered_layout`.
+
+        Returns the graph cores like `sugiyama_cores`.
+        """
+        objs = list(vertices)
+        index = dict((obj, i) for i, obj in enumerate(objs))
+        src = np.array([index[pre] for pre, _ in edges.values()], dtype=int)
+        dst = np.array([index[post] for _, post in edges.values()], dtype=int)
+        w = np.array([vertices[obj].w for obj in objs], dtype=float)
+        h = np.array([vertices[obj].h for obj in objs], dtype=float)
+
+        deadline = timeit.default_timer() + self.time_budget
+        cores = []
+        for members in connected_components(len(objs), src, dst):
+            local = np.full(len(objs), -1)
+            local[members] = np.arange(len(members))
+            inside = local[src] >= 0
+            x, y = layered_layout(
+                w[members],
+                h[members],
+                local[src[inside]],
+                local[dst[inside]],
+                deadline=deadline,
+            )
+            views = OrderedDict()
+            for i, j in enumerate(members):
+                view = vertices[objs[j]]
+                view.xy = (float(x[i]), float(y[i]))
+                views[objs[j]] = view
+            cores.append(views)
+        return cores
+
+
+def topology_key(engine, vertices, edges):
+    """Hash the structure of a network as seen by `Layout.make_layout`.
+
+    The layout only depends on the sizes of the children of the network
+    and on the connections between them (in order), so networks with equal
+    keys, like the ones made by the same function, have the same layout.
+    """
+    index = dict((obj, i) for i, obj in enumerate(vertices))
+    h = hashlib.sha1(
+        json.dumps(
+            [
+                LayoutCache.version,
+                engine,
+                [(view.w, view.h) for view in vertices.values()],
+                [(index[pre], index[post]) for pre, post in edges.values()],
+            ]
+        ).encode("utf-8")
+    )
+    return h.hexdigest()
+
+
+class LayoutCache(object):
+    """Layouts of networks, keyed on their `topology_key`.
+
+    The layouts are kept in memory and, if a filename is given, in a JSON
+    file that is read when the cache is created and written by `save`, so
+    that they are used again when the model is opened later.
+
+    Parameters
+    ----------
+    filename : str, optional
+        The file storing the layouts.
+    max_entries : int, optional
+        Number of layouts to keep, least recently used ones are removed.
+    """
+
+    # changes with the way layouts are computed, to not use older ones
+    version = 1
+
+    def __init__(self, filename=None, max_entries=1000):
+        self.filename = filename
+        self.max_entries = max_entries
+        self.layouts = OrderedDict()  # key -> [[x, y, w, h], ...]
+        self.modified = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if filename is not None:
+            self.layouts.update(self._read())
+
+    def _read(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, OSError, ValueError):
+            return OrderedDict()
+        if not isinstance(data, dict) or data.get("version") != self.version:
+            return OrderedDict()
+        return data.get("layouts", OrderedDict())
+
+    def get(self, key):
+        """Return the layout stored under ``key`` or None."""
+        with self._lock:
+            layouts = self.layouts.pop(key, None)
+            if layouts is None:
+                self.misses += 1
+                return None
+            self.layouts[key] = layouts  # mark as recently used
+            self.hits += 1
+            return layouts
+
+    def set(self, key, layouts):
+        """Store the layouts (x, y, w, h) of the children of a network."""
+        with self._lock:
+            self.layouts.pop(key, None)
+            self.layouts[key] = layouts
+            while len(self.layouts) > self.max_entries:
+                self.layouts.popitem(last=False)
+            self.modified = True
+
+    def save(self):
+        """Write the layouts to the file, if new ones were added.
+
+        Layouts stored in the file by other pages in the meantime are kept.
+        """
+        if self.filename is None or not self.modified:
+            return
+        with self._lock:
+            layouts = self._read()
+            for key, layout in self.layouts.items():
+                layouts.pop(key, None)
+                layouts[key] = layout
+            while len(layouts) > self.max_entries:
+                layouts.popitem(last=False)
+            self.modified = False
+        try:
+            directory = os.path.dirname(self.filename)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            # write to a temporary file so other pages never read a
+            # partially written file
+            with open(self.filename + ".tmp", "w") as f:
+                json.dump(dict(version=self.version, layouts=layouts), f)
+            os.rename(self.filename + ".tmp", self.filename)
+        except (IOError, OSError) as err:
+            logger.warning("Could not save layouts to %s: %s", self.filename, err)
+            self.filename = None
+
+
+def connected_components(n, src, dst):
+    """Return the vertices of each connected component, in order.
+
+    The components are ordered by their first vertex.
+    """
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in zip(src.tolist(), dst.tolist()):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    roots = np.array([find(i) for i in range(n)], dtype=int)
+    order = np.argsort(roots, kind="stable")
+    splits = np.flatnonzero(np.diff(roots[order])) + 1
+    return sorted(np.split(order, splits), key=lambda members: members[0])
+
+
+def feedback_edges(n, src, dst):
+    """Find edges whose reversal makes the graph acyclic.
+
+    These are the edges to vertices on the stack of a depth-first search,
+    which starts from the vertices without incoming edges (like grandalf's
+    ``get_scs_with_feedback``).
+    """
+    out_edges = [[] for _ in range(n)]
+    for i, a in enumerate(src.tolist()):
+        out_edges[a].append(i)
+    dst_list = dst.tolist()
+    has_in = np.zeros(n, dtype=bool)
+    has_in[dst] = True
+    roots = np.concatenate([np.flatnonzero(~has_in), np.flatnonzero(has_in)])
+
+    feedback = np.zeros(len(src), dtype=bool)
+    state = [0] * n  # 0: unvisited, 1: on the stack, 2: done
+    for root in roots.tolist():
+        if state[root] != 0:
+            continue
+        state[root] = 1
+        stack = [(root, iter(out_edges[root]))]
+        while stack:
+            v, it = stack[-1]
+            for i in it:
+                w = dst_list[i]
+                if state[w] == 0:
+                    state[w] = 1
+                    stack.append((w, iter(out_edges[w])))
+                    break
+                elif state[w] == 1:
+                    feedback[i] = True
+            else:
+                state[v] = 2
+                stack.pop()
+    return feedback
+
+
+def longest_path_ranks(n, src, dst):
+    """Rank the vertices of an acyclic graph by their longest path from a root.
+
+    The ranks are determined one rank at a time for all vertices at once.
+    """
+    indegree = np.bincount(dst, minlength=n)
+    ranks = np.zeros(n, dtype=int)
+    frontier = np.flatnonzero(indegree == 0)
+    in_frontier = np.zeros(n, dtype=bool)
+    rank = 0
+    while len(frontier) > 0:
+        ranks[frontier] = rank
+        in_frontier[:] = False
+        in_frontier[frontier] = True
+        reached = np.bincount(dst[in_frontier[src]], minlength=n)
+        indegree -= reached
+        frontier = np.flatnonzero((indegree == 0) & (reached > 0))
+        rank += 1
+    return ranks
+
+
+def count_inversions(seq):
+    """Count the pairs ``i < j`` with ``seq[i] > seq[j]`` in an int array.
+
+    Two elements are inverted at the highest bit in which they differ, so
+    this counts, bit by bit, the ones preceding each zero among elements
+    with the same higher bits.
+    """
+    seq = np.asarray(seq)
+    if len(seq) < 2:
+        return 0
+    count = 0
+    for bit in range(int(seq.max()).bit_length()):
+        high = seq >> (bit + 1)
+        order = np.argsort(high, kind="stable")
+        high = high[order]
+        ones = (seq[order] >> bit) & 1
+        before = np.cumsum(ones) - ones
+        starts = np.flatnonzero(np.r_[True, high[1:] != high[:-1]])
+        offsets = np.repeat(before[starts], np.diff(np.r_[starts, len(seq)]))
+        count += int((before - offsets)[ones == 0].sum())
+    return count
+
+
+def layered_layout(
+    w,
+    h,
+    src,
+    dst,
+    deadline=None,
+    max_sweeps=24,
+    xspace=20.0,
+    yspace=20.0,
+    dummy_width=8.0,
+):
+    """Lay out a connected directed graph in layers, top to bottom.
+
+    This follows the steps of the Sugiyama layout on arrays:
+
+    1. cycles are broken by reversing `feedback_edges`,
+    2. vertices are ranked by `longest_path_ranks`, and edges spanning
+       several ranks are split by dummy vertices,
+    3. the vertices of every rank are sorted by the barycenter of their
+       neighbours in the previous rank, sweeping down and up, and the
+       ordering with the fewest crossings is kept. The sweeps stop when
+       there are no crossings, after ``max_sweeps`` or at ``deadline``
+       (compared to `timeit.default_timer`),
+    4. the vertices are moved towards their neighbours in the adjacent
+       ranks, keeping their order and at least ``xspace`` apart.
+
+    Parameters
+    ----------
+    w, h : array_like
+        The widths and heights of the vertices.
+    src, dst : array_like
+        The vertex indices at the start and end of each edge.
+
+    Returns
+    -------
+    x, y : ndarray
+        The centres of the vertices.
+    """
+    w = np.asarray(w, dtype=float)
+    h = np.asarray(h, dtype=float)
+    src = np.asarray(src, dtype=int)
+    dst = np.asarray(dst, dtype=int)
+    n = len(w)
+
+    # 1. make the graph acyclic (self-connections do not affect the layout)
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    flip = feedback_edges(n, src, dst)
+    src, dst = np.where(flip, dst, src), np.where(flip, src, dst)
+
+    # 2. rank, and replace edges spanning k ranks by chains of k segments
+    ranks = longest_path_ranks(n, src, dst)
+    span = ranks[dst] - ranks[src]
+    lengths = span + 1  # vertices in the chain of each edge
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    chain = np.empty(ends[-1] if len(ends) > 0 else 0, dtype=int)
+    is_dummy = np.ones(len(chain), dtype=bool)
+    is_dummy[starts] = False
+    is_dummy[ends - 1] = False
+    n_dummies = int(is_dummy.sum())
+    chain[starts] = src
+    chain[ends - 1] = dst
+    chain[is_dummy] = np.arange(n, n + n_dummies)
+    step = np.arange(len(chain)) - np.repeat(starts, lengths)
+    ranks = np.concatenate([ranks, (np.repeat(ranks[src], lengths) + step)[is_dummy]])
+    not_last = np.ones(len(chain), dtype=bool)
+    not_last[ends - 1] = False
+    upper = chain[:-1][not_last[:-1]]
+    lower = chain[1:][not_last[:-1]]
+
+    n_all = n + n_dummies
+    w = np.concatenate([w, np.full(n_dummies, dummy_width)])
+    n_ranks = int(ranks.max()) + 1
+
+    # vertices of each rank, and segments from each rank to the next
+    by_rank = np.argsort(ranks, kind="stable")
+    rank_bounds = np.searchsorted(ranks[by_rank], np.arange(n_ranks + 1))
+    members = [by_rank[rank_bounds[r] : rank_bounds[r + 1]] for r in range(n_ranks)]
+    local = np.empty(n_all, dtype=int)
+    for m in members:
+        local[m] = np.arange(len(m))
+    seg_order = np.argsort(ranks[upper], kind="stable")
+    upper, lower = upper[seg_order], lower[seg_order]
+    seg_bounds = np.searchsorted(ranks[upper], np.arange(n_ranks))
+    segments = [
+        (
+            upper[seg_bounds[r] : seg_bounds[r + 1]],
+            lower[seg_bounds[r] : seg_bounds[r + 1]],
+        )
+        for r in range(n_ranks - 1)
+    ]
+
+    # 3. order the vertices within each rank
+    pos = local.copy()
+
+    # segments between different ranks never cross, so the segments of all
+    # ranks are counted at once, each rank offset beyond the previous one
+    offsets = ranks[upper] * (max(len(m) for m in members) + 1)
+
+    def crossings():
+        order = np.lexsort((pos[lower], pos[upper], offsets))
+        return count_inversions((offsets + pos[lower])[order])
+
+    def sort_rank(r, neighbours, vertices):
+        m = members[r]
+        sums = np.bincount(local[vertices], weights=pos[neighbours], minlength=len(m))
+        counts = np.bincount(local[vertices], minlength=len(m))
+        current = pos[m]
+        barycenter = np.where(counts > 0, sums / np.maximum(counts, 1), current)
+        order = np.lexsort((current, barycenter))
+        pos[m[order]] = np.arange(len(m))
+
+    best = pos.copy()
+    best_crossings = crossings()
+    for sweep in range(max_sweeps):
+        if best_crossings == 0 or (
+            deadline is not None and timeit.default_timer() > deadline
+        ):
+            break
+        if sweep % 2 == 0:
+            for r in range(1, n_ranks):
+                a, b = segments[r - 1]
+                sort_rank(r, a, b)
+        else:
+            for r in range(n_ranks - 2, -1, -1):
+                a, b = segments[r]
+                sort_rank(r, b, a)
+        c = crossings()
+        if c < best_crossings:
+            best, best_crossings = pos.copy(), c
+    pos = best
+
+    # 4. coordinates: pack each rank, then move the vertices towards their
+    # neighbours without changing their order
+    ordered = [m[np.argsort(pos[m])] for m in members]
+    x = np.zeros(n_all)
+    gaps = []
+    for m in ordered:
+        gap = np.r_[0.0, xspace + (w[m][:-1] + w[m][1:]) / 2.0]
+        gaps.append(np.cumsum(gap))
+        x[m] = gaps[-1] - gaps[-1][-1] / 2.0
+    for sweep in range(4):
+        down = sweep % 2 == 0
+        for r in range(1, n_ranks) if down else range(n_ranks - 2, -1, -1):
+            a, b = segments[r - 1] if down else segments[r]
+            if not down:
+                a, b = b, a
+            m = ordered[r]
+            sums = np.bincount(local[b], weights=x[a], minlength=len(m))
+            counts = np.bincount(local[b], minlength=len(m))
+            target = np.where(counts > 0, sums / np.maximum(counts, 1), x[members[r]])
+            # closest positions in order and apart, pushed right and left
+            d = target[local[m]] - gaps[r]
+            right = np.maximum.accumulate(d)
+            left = np.minimum.accumulate(d[::-1])[::-1]
+            x[m] = gaps[r] + (right + left) / 2.0
+
+    # vertical coordinates as in grandalf's SugiyamaLayout.setxy
+    dy = np.zeros(n_ranks)
+    np.maximum.at(dy, ranks[:n], h / 2.0)
+    top = np.r_[0.0, np.cumsum(2 * dy + yspace)[:-1]]
+    y = top + dy
+    return x[:n], y[ranks[:n]]
@@ -5,8 +5,12 @@ import os.path
 import threading
 import webbrowser
 
+from nengo.utils.cache import human2bytes
+
 import nengo_gui
+import nengo_gui.build_cache
 import nengo_gui.gui
+from nengo_gui.components.ring_buffer import DROP_OLDEST, OVERFLOW_POLICIES
 from nengo_gui.guibackend import GuiServerSettings, ModelContext
 from nengo_gui.password import gensalt, hashpw, prompt_pw
 
@@ -81,6 +85,68 @@ def main():
         help=browser_help,
     )
     parser.add_argument("--no-browser", dest="browser", action="store_false")
+    parser.add_argument(
+        "--page-socket",
+        action="store_true",
+        help="Use a single websocket per page instead of one per component.",
+    )
+    parser.add_argument(
+        "--batch-steps",
+        action="store_true",
+        help="Run several simulation steps at once for models that can run "
+        "faster than real time.",
+    )
+    parser.add_argument(
+        "--sim-process",
+        action="store_true",
+        help="Build and run the simulation of each page in a separate process.",
+    )
+    parser.add_argument(
+        "--no-build-cache",
+        action="store_false",
+        dest="build_cache",
+        help="Do not cache the results of building the model next to its "
+        "config file.",
+    )
+    parser.add_argument(
+        "--build-cache-dir",
+        help="Directory for the build cache shared by all models of a project, "
+        "instead of one next to the config file of each model.",
+    )
+    parser.add_argument(
+        "--build-cache-size",
+        type=human2bytes,
+        default=nengo_gui.build_cache.DEFAULT_MAX_BYTES,
+        help="Size above which the least recently used entries are removed "
+        "from the build cache (e.g. '512 MB').",
+    )
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="Build the models in the given file or directory to fill their "
+        "build cache, then exit.",
+    )
+    parser.add_argument(
+        "--no-ws-compression",
+        action="store_false",
+        dest="ws_compression",
+        help="Do not compress websocket messages (only larger messages are "
+        "compressed, if the browser supports it).",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Record performance counters and serve them at /metrics "
+        "(Prometheus text format, or JSON with ?format=json).",
+    )
+    parser.add_argument(
+        "--overflow-policy",
+        choices=OVERFLOW_POLICIES,
+        default=DROP_OLDEST,
+        help="What to do with plot data when the browser does not keep up with "
+        "the simulation: drop the oldest data, keep every other data point "
+        "or slow down the simulation (default: %(default)s).",
+    )
     parser.add_argument(
         "--auto-shutdown",
         nargs=1,
@@ -96,6 +162,14 @@ def main():
     else:
         logging.basicConfig()
 
+    if args.warm_cache:
+        nengo_gui.build_cache.warm(
+            os.curdir if args.filename is None else args.filename,
+            cache_dir=args.build_cache_dir,
+            max_bytes=args.build_cache_size,
+        )
+        return
+
     if args.port is None:
         port = 8080
     else:
@@ -118,6 +192,8 @@ def main():
         password_hash=password_hash,
         ssl_cert=args.cert[0],
         ssl_key=args.key[0],
+        ws_compression=args.ws_compression,
+        metrics=args.metrics,
     )
     if host != "localhost" and not server_settings.use_ssl and not args.unsecure:
         raise ValueError(
@@ -129,7 +205,16 @@ def main():
             filename = os.path.join(nengo_gui.__path__[0], "examples", "default.py")
         else:
             filename = args.filename
-        page_settings = nengo_gui.page.PageSettings(backend=args.backend)
+        page_settings = nengo_gui.page.PageSettings(
+            backend=args.backend,
+            page_socket=args.page_socket,
+            batch_steps=args.batch_steps,
+            sim_process=args.sim_process,
+            build_cache=args.build_cache,
+            build_cache_dir=args.build_cache_dir,
+            build_cache_size=args.build_cache_size,
+            overflow_policy=args.overflow_policy,
+        )
         s = None
         while s is None:
             try:
@@ -0,0 +1,188 @@
+"""Performance counters of the GUI server, served at ``/metrics``.
+
+The time spent in the Node functions of the Components (``gather_data``),
+in sending their data (``update_client``), and in executing, building,
+reloading and laying out the models is recorded by `Timer` objects of the
+server's `Metrics`. Values that are only interesting when they are looked
+at (the simulation speed, the data waiting to be sent, ...) are computed
+by collector functions when the metrics are requested.
+
+Metrics are disabled unless the server is started with ``--metrics``.
+While disabled, no functions are wrapped and `Metrics.timer` returns a
+context manager that does nothing, so the instrumentation costs nothing
+in the simulation and a check of `Metrics.enabled` elsewhere.
+
+The metrics are served in the Prometheus text format, or as JSON with
+``/metrics?format=json``.
+"""
+
+import threading
+import timeit
+from collections import OrderedDict
+
+PREFIX = "nengo_gui_"
+
+
+class Timer(object):
+    """Number, total and longest duration of the calls of an operation."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+
+class Timing(object):
+    """Context manager adding the time spent in its block to a `Timer`."""
+
+    __slots__ = ("timer", "start")
+
+    def __init__(self, timer):
+        self.timer = timer
+
+    def __enter__(self):
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.add(timeit.default_timer() - self.start)
+
+
+class NoTiming(object):
+    """Context manager used instead of `Timing` while metrics are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NO_TIMING = NoTiming()
+
+
+class Metrics(object):
+    """The timers and collectors of the metrics of a server.
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        Whether anything is recorded.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timers = OrderedDict()  # (name, labels) -> Timer
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def get_timer(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        timer = self.timers.get(key, None)
+        if timer is None:
+            with self._lock:
+                timer = self.timers.setdefault(key, Timer())
+        return timer
+
+    def timer(self, name, **labels):
+        """Return a context manager timing its block as ``name``."""
+        if not self.enabled:
+            return NO_TIMING
+        return Timing(self.get_timer(name, **labels))
+
+    def time_method(self, obj, method, name, **labels):
+        """Time the calls of a method of ``obj`` as ``name``.
+
+        The method is replaced by a wrapper on the instance, once. Nothing
+        is changed while the metrics are disabled.
+        """
+        fn = getattr(obj, method)
+        if not self.enabled or getattr(fn, "timer", None) is not None:
+            return
+        timer = self.get_timer(name, **labels)
+        default_timer = timeit.default_timer
+
+        def timed(*args, **kwargs):
+            start = default_timer()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timer.add(default_timer() - start)
+
+        timed.timer = timer
+        setattr(obj, method, timed)
+
+    def add_collector(self, collect):
+        """Add a function returning samples computed when requested.
+
+        The function returns a list of ``(name, type, labels, value)``
+        tuples, where type is ``"gauge"`` or ``"counter"`` and labels is a
+        dictionary.
+        """
+        self.collectors.append(collect)
+
+    def samples(self):
+        """Return all metrics as ``(name, type, labels, value)`` tuples."""
+        samples = []
+        with self._lock:
+            timers = list(self.timers.items())
+        for (name, labels), timer in timers:
+            labels = dict(labels)
+            name = name + "_seconds"
+            samples.append((name + "_count", "counter", labels, timer.count))
+            samples.append((name + "_sum", "counter", labels, timer.total))
+            samples.append((name + "_max", "gauge", labels, timer.max))
+        for collect in self.collectors:
+            samples.extend(collect())
+        return samples
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        samples = OrderedDict()
+        for name, type_, labels, value in self.samples():
+            samples.setdefault((name, type_), []).append((labels, value))
+        lines = []
+        for (name, type_), values in samples.items():
+            lines.append("# TYPE %s%s %s" % (PREFIX, name, type_))
+            for labels, value in values:
+                if len(labels) > 0:
+                    label_text = "{%s}" % ",".join(
+                        '%s="%s"' % (k, escape_label(v))
+                        for k, v in sorted(labels.items())
+                    )
+                else:
+                    label_text = ""
+                lines.append(
+                    "%s%s%s %s" % (PREFIX, name, label_text, format_value(value))
+                )
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        """Return the metrics as a list of dictionaries."""
+        return [
+            dict(name=PREFIX + name, type=type_, labels=labels, value=value)
+            for name, type_, labels, value in self.samples()
+        ]
+
+
+def format_value(value):
+    value = float(value)
+    if value != value:
+        return "NaN"
+    elif value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -5,6 +5,7 @@ import json
 import nengo
 import numpy as np
 
+from .sim_process import SimProcess
 from .static_plots import node_output_plot, response_curve_plot, tuning_curve_plot
 
 
@@ -55,6 +56,8 @@ def ensemble_infomodal(ng, uid, conn_in_uids, conn_out_uids):
 
     if ng.page.sim is None:
         plots = "Simulation not yet running. " "Start a simulation to see plots."
+    elif isinstance(ng.page.sim, SimProcess):
+        plots = "Plots are not available when simulating in a separate process."
     else:
         plots = []
         plots.append(response_curve_plot(ens, ng.page.sim))
@@ -1,3 +1,4 @@
+import collections
 import importlib
 import inspect
 import json
@@ -11,23 +12,63 @@ import traceback
 
 import nengo
 import nengo_gui
+import nengo_gui.build_cache
 import nengo_gui.config
+import nengo_gui.layout
 import nengo_gui.seed_generation
+import nengo_gui.sim_process
 import nengo_gui.user_action
 
+# the result of executing the code of a model (see Page.run_code)
+Execution = collections.namedtuple(
+    "Execution", ["code", "model", "locals", "error", "stdout", "imported"]
+)
+
 
 class PageSettings(object):
-    __slots__ = ["backend", "editor_class", "filename_cfg"]
+    __slots__ = [
+        "backend",
+        "batch_steps",
+        "build_cache",
+        "build_cache_dir",
+        "build_cache_size",
+        "editor_class",
+        "filename_cfg",
+        "overflow_policy",
+        "page_socket",
+        "sim_process",
+    ]
 
     def __init__(
         self,
         filename_cfg=None,
         backend="nengo",
         editor_class=nengo_gui.components.AceEditor,
+        page_socket=False,
+        batch_steps=False,
+        sim_process=False,
+        build_cache=True,
+        build_cache_dir=None,
+        build_cache_size=nengo_gui.build_cache.DEFAULT_MAX_BYTES,
+        overflow_policy=nengo_gui.components.ring_buffer.DROP_OLDEST,
     ):
         self.filename_cfg = filename_cfg
         self.backend = backend
         self.editor_class = editor_class
+        # share a single websocket between all Components of a Page
+        self.page_socket = page_socket
+        # run several simulator steps per iteration of the runner thread
+        self.batch_steps = batch_steps
+        # build and run the simulator in a child process
+        self.sim_process = sim_process
+        # reuse eval points, encoders and decoders of earlier builds
+        self.build_cache = build_cache
+        # shared by all models instead of one next to each .cfg file
+        self.build_cache_dir = build_cache_dir
+        # bytes above which the least recently used entries are removed
+        self.build_cache_size = build_cache_size
+        # what Components do with data the client is too slow to receive
+        self.overflow_policy = overflow_policy
 
 
 class Page(object):
@@ -73,6 +114,8 @@ class Page(object):
         self.code = None  # the source code currently displayed
         self.error = None  # any execute or build error
         self.stdout = ""  # text printed during execute+build
+        # modules imported from the directory of the model, name -> file
+        self.imported = {}
 
         self.undo_stack = []
         self.redo_stack = []
@@ -114,12 +157,36 @@ class Page(object):
         else:
             self.filename_cfg = self.settings.filename_cfg
 
+        # stored next to the .cfg file
+        self.build_cache = None
+        if self.settings.build_cache and (
+            self.filename_cfg is not None or self.settings.build_cache_dir is not None
+        ):
+            self.build_cache = nengo_gui.build_cache.BuildCache(
+                nengo_gui.build_cache.get_cache_dir(
+                    self.filename_cfg, self.settings.build_cache_dir
+                ),
+                max_bytes=self.settings.build_cache_size,
+            )
+
+        # layouts of networks, stored with the build cache
+        layout_filename = None
+        if self.filename_cfg is not None or self.settings.build_cache_dir is not None:
+            layout_filename = os.path.join(
+                nengo_gui.build_cache.get_cache_dir(
+                    self.filename_cfg, self.settings.build_cache_dir
+                ),
+                "layouts.json",
+            )
+        self.layout_cache = nengo_gui.layout.LayoutCache(layout_filename)
+
         if reset_cfg:
             self.clear_config()
 
         self.load()
 
         self.net_graph = self.get_component(nengo_gui.components.NetGraph)
+        self.sim_control = self.get_component(nengo_gui.components.SimControl)
         self.editor = self.get_component(self.settings.editor_class)
 
         # build and run the model in a separate thread
@@ -206,26 +273,77 @@ class Page(object):
         self.gui.component_uids[id(component)] = component
         uid = self.get_uid(component)
         component.attach(self, self.config[component], uid=uid)
+        self.instrument(component)
         self.components.append(component)
 
+    def instrument(self, component):
+        """Time the methods of a Component called while the model runs."""
+        metrics = self.gui.metrics
+        if not metrics.enabled:
+            return
+        labels = self.metric_labels(component)
+        metrics.time_method(component, "update_client", "update_client", **labels)
+        # with a SimProcess the data is gathered in the child process
+        if hasattr(component, "gather_data") and not self.settings.sim_process:
+            metrics.time_method(component, "gather_data", "gather_data", **labels)
+
+    def metric_labels(self, component):
+        return dict(
+            page=self.filename, component=component.uid, type=type(component).__name__
+        )
+
+    def collect_metrics(self):
+        """Return the state of the simulation and the Components as samples
+        of `nengo_gui.metrics.Metrics`."""
+        page = dict(page=self.filename)
+        samples = []
+        sim_control = self.sim_control
+        if sim_control is not None:
+            samples.extend(
+                [
+                    ("sim_time", "gauge", page, sim_control.time),
+                    ("sim_rate", "gauge", page, sim_control.rate),
+                    ("sim_rate_proportion", "gauge", page, sim_control.rate_proportion),
+                    ("sim_running", "gauge", page, int(self.sim is not None)),
+                ]
+            )
+        dropped = self.count_dropped()
+        for component in list(self.components):
+            labels = self.metric_labels(component)
+            buffers = component.buffers()
+            if len(buffers) > 0:
+                samples.append(
+                    ("queue_items", "gauge", labels, sum(len(b) for b in buffers))
+                )
+            samples.append(
+                ("dropped_items", "counter", labels, dropped.get(component.uid, 0))
+            )
+        return samples
+
     def execute(self, code):
         """Run the given code to generate self.model and self.locals.
 
         The code will be stored in self.code, any output to stdout will
         be a string as self.stdout, and any error will be in self.error.
         """
+        self.set_execution(self.run_code(code))
+
+    def run_code(self, code):
+        """Run the given code and return its `.Execution`.
+
+        Unlike `execute`, this does not change the Page, so the code can
+        be run in another thread while the Page is in use.
+        """
         code_locals = {}
         code_locals["nengo_gui"] = nengo_gui
         code_locals["__file__"] = self.filename
         code_locals["__page__"] = self
 
-        self.code = code
-        self.error = None
-        self.stdout = ""
-
+        error = None
         exec_env = nengo_gui.exec_env.ExecutionEnvironment(self.filename)
+        timing = self.gui.metrics.timer("page_execute", page=self.filename)
         try:
-            with exec_env:
+            with timing, exec_env:
                 compiled = compile(code, nengo_gui.exec_env.compiled_filename, "exec")
                 exec(compiled, code_locals)
         except nengo_gui.exec_env.StartedSimulatorException:
@@ -251,23 +369,31 @@ class Page(object):
             )
         except:
             line = nengo_gui.exec_env.determine_line_number()
-            self.error = dict(trace=traceback.format_exc(), line=line)
-        self.stdout = exec_env.stdout.getvalue()
+            error = dict(trace=traceback.format_exc(), line=line)
+        stdout = exec_env.stdout.getvalue()
 
         # make sure we've defined a nengo.Network
         model = code_locals.get("model", None)
         if not isinstance(model, nengo.Network):
-            if self.error is None:
+            if error is None:
                 line = len(code.split("\n"))
-                self.error = dict(
+                error = dict(
                     trace="must declare a nengo.Network " 'called "model"', line=line
                 )
             model = None
 
-        self.model = model
-        self.locals = code_locals
+        return Execution(code, model, code_locals, error, stdout, exec_env.imported)
+
+    def set_execution(self, execution):
+        """Use the model and locals of an `.Execution`."""
+        self.code = execution.code
+        self.error = execution.error
+        self.stdout = execution.stdout
+        self.model = execution.model
+        self.locals = execution.locals
+        self.imported.update(execution.imported)
         if self.error is None:
-            self.last_good_locals = code_locals
+            self.last_good_locals = execution.locals
 
     def load_config(self):
         """Load the .cfg file"""
@@ -313,6 +439,7 @@ class Page(object):
             if isinstance(v, nengo_gui.components.Component):
                 self.default_labels[v] = k
                 v.attach(page=self, config=config[v], uid=k)
+                self.instrument(v)
 
         return config
 
@@ -323,10 +450,12 @@ class Page(object):
         ----------
         lazy : bool
             If True, then only save if it has been more than config_save_time
-            since the last save and if config_save_needed
+            since the last save and if config_save_needed, and do not wait
+            while the Page is in use (e.g. building); a later call saves it
         force : bool
             If True, then always save right now
         """
+        self.layout_cache.save()
         if not force and not self.config_save_needed:
             return
 
@@ -335,7 +464,10 @@ class Page(object):
             if (now_time - self.config_save_time) < self.config_save_period:
                 return
 
-        with self.lock:
+        # lazy saves are done by the websocket loop, which must not block
+        if not self.lock.acquire(not lazy):
+            return
+        try:
             self.config_save_time = now_time
             self.config_save_needed = False
             try:
@@ -343,11 +475,40 @@ class Page(object):
                     f.write(self.config.dumps(uids=self.default_labels))
             except IOError:
                 print("Could not save %s; permission denied" % self.filename_cfg)
+        finally:
+            self.lock.release()
 
     def modified_config(self):
         """Set a flag that the config file should be saved."""
         self.config_save_needed = True
 
+    def notify_clients(self):
+        """Signal that Components have new data to send to their clients."""
+        self.gui.ws_loop.notify()
+
+    def configure_buffer(self, buffer):
+        """Apply the overflow policy to a buffer of a Component."""
+        buffer.policy = self.settings.overflow_policy
+        buffer.throttle = self.throttle
+
+    def throttle(self, buffer):
+        """Slow down the simulation until a full buffer has been read."""
+        if self.sim_control is None:
+            return False
+        return self.sim_control.throttle(buffer)
+
+    def count_dropped(self):
+        """Return the number of items each Component dropped so far because
+        its client did not keep up, by Component uid."""
+        if isinstance(self.sim, nengo_gui.sim_process.SimProcess):
+            return self.sim.dropped
+        dropped = {}
+        for component in self.components:
+            n = sum(buffer.dropped for buffer in component.buffers())
+            if n > 0:
+                dropped[component.uid] = n
+        return dropped
+
     def create_javascript(self):
         """Generate the javascript for the current model and layout."""
         if self.filename is not None:
@@ -359,6 +520,10 @@ class Page(object):
         assert isinstance(self.components[0], nengo_gui.components.SimControl)
 
         component_js = "\n".join([c.javascript() for c in self.components])
+        if self.settings.page_socket:
+            component_js = "Nengo.page_socket = new Nengo.PageSocket();\n" + (
+                component_js
+            )
         component_js += webpage_title_js
         if not self.gui.model_context.writeable:
             component_js += "$('#Open_file_button').addClass('deactivated');"
@@ -462,7 +627,12 @@ class Page(object):
 
             # set all the seeds so that creating components doesn't affect
             #  the neural model itself
-            seeds = nengo_gui.seed_generation.define_all_seeds(self.model)
+            seeds = {}
+            if self.build_cache is not None and self.filename is not None:
+                # unseeded models get the same seeds for every build,
+                # otherwise the build cache would never be used
+                seeds[self.model] = nengo_gui.build_cache.model_seed(self.filename)
+            seeds = nengo_gui.seed_generation.define_all_seeds(self.model, seeds)
             for obj, s in seeds.items():
                 obj.seed = s
 
@@ -481,19 +651,17 @@ class Page(object):
             exec_env = nengo_gui.exec_env.ExecutionEnvironment(
                 self.filename, allow_sim=True
             )
-            handles_progress = (
-                "progress_bar" in inspect.getargspec(backend.Simulator.__init__).args
-            )
             # build the simulation
+            timing = self.gui.metrics.timer("page_build", page=self.filename)
             try:
-                with exec_env:
-                    if handles_progress:
-                        self.sim = backend.Simulator(
-                            self.model, progress_bar=self.locals["_viz_progress"]
-                        )
+                with timing, exec_env:
+                    if self.settings.sim_process:
+                        self.sim = nengo_gui.sim_process.SimProcess(self, backend)
                     else:
-                        self.sim = backend.Simulator(self.model)
+                        self.sim = self.create_simulator(backend)
 
+            except nengo_gui.sim_process.SimProcessError as err:
+                self.error = err.error
             except:
                 line = nengo_gui.exec_env.determine_line_number()
                 self.error = dict(trace=traceback.format_exc(), line=line)
@@ -507,8 +675,7 @@ class Page(object):
             if self.sim is not None:
                 if self.settings.backend in Page.singleton_sims:
                     Page.singleton_sims[self.settings.backend] = self
-                if "on_start" in self.locals:
-                    self.locals["on_start"](self.sim)
+                self.call_hook("on_start", self.sim)
 
             # remove the temporary components added for visualization
             for c in self.components:
@@ -517,39 +684,81 @@ class Page(object):
 
             self.building = False
             self.rebuild = False
+        self.notify_clients()
+
+    def create_simulator(self, backend):
+        """Create the Simulator for the model (with its Components added)."""
+        # scripts of other pages might be executed during the build
+        simulator = nengo_gui.exec_env.simulator_class(backend)
+        args = inspect.getargspec(simulator.__init__).args
+        kwargs = {}
+        if "progress_bar" in args:
+            kwargs["progress_bar"] = self.locals["_viz_progress"]
+        if self.build_cache is None or "model" not in args:
+            return simulator(self.model, **kwargs)
+
+        # backends accepting a nengo.builder.Model use the nengo builder
+        kwargs["model"] = nengo.builder.Model(decoder_cache=self.build_cache)
+        self.build_cache.reset_stats()
+        with self.build_cache.cached_samples(self.model):
+            return simulator(self.model, **kwargs)
+
+    def call_hook(self, name, sim):
+        """Call a hook (like ``on_start``) if the model defines it.
+
+        The hooks of a simulator running in a `.SimProcess` are called in
+        the child process instead.
+        """
+        if name in self.locals and not isinstance(
+            sim, nengo_gui.sim_process.SimProcess
+        ):
+            self.locals[name](sim)
+
+    def step(self):
+        """Advance the simulation by one step (or one batch of steps)."""
+        if hasattr(self.sim, "max_steps"):
+            # this is only for the nengo_spinnaker simulation
+            self.sim.run_steps(self.sim.max_steps)
+        elif self.settings.batch_steps and "on_step" not in self.locals:
+            # on_step has to be called after every single step,
+            # so models defining it are run step by step
+            self.sim_control.run_batch(self.sim)
+        else:
+            self.sim.step()
+            if "on_step" in self.locals:
+                self.locals["on_step"](self.sim)
 
     def runner(self):
         """Separate thread for running the simulation itself."""
         # run the simulation
         while not self.finished:
-            if self.sim is None:
+            if self.sim is None or isinstance(
+                self.sim, nengo_gui.sim_process.SimProcess
+            ):
                 time.sleep(0.01)
             else:
                 try:
-                    if hasattr(self.sim, "max_steps"):
-                        # this is only for the nengo_spinnaker simulation
-                        self.sim.run_steps(self.sim.max_steps)
-                    else:
-                        self.sim.step()
-                        if "on_step" in self.locals:
-                            self.locals["on_step"](self.sim)
+                    self.step()
                 except Exception as err:
                     if self.finished:
                         return
                     line = nengo_gui.exec_env.determine_line_number()
                     self.error = dict(trace=traceback.format_exc(), line=line)
                     self.sim = None
+                    self.notify_clients()
             while self.sims_to_close:
                 s = self.sims_to_close.pop()
-                if "on_close" in self.locals:
-                    self.locals["on_close"](s)
+                self.call_hook("on_close", s)
                 s.close()
 
             if self.rebuild:
                 self.build()
         self.sim = None
+        # child processes would otherwise keep running with the server
+        for s in self.sims_to_close:
+            if isinstance(s, nengo_gui.sim_process.SimProcess):
+                s.close()
 
     def close(self):
         if self.sim is not None:
-            if "on_close" in self.locals:
-                self.locals["on_close"](self.sim)
+            self.call_hook("on_close", self.sim)
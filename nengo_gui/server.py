@@ -6,9 +6,12 @@ import hashlib
 import json
 import logging
 import select
+import selectors
 import socket
 import struct
 
+import numpy as np
+
 try:
     import ssl
 except ImportError:  # for Python without ssl support
@@ -16,16 +19,18 @@ except ImportError:  # for Python without ssl support
 
 import sys
 import threading
+import time
 import traceback
 import warnings
+import zlib
 
 try:
-    import socketserver
+    import queue
     from http import server
     from urllib.parse import parse_qs, urlparse
 except ImportError:  # Python 2.7
     import BaseHTTPServer as server
-    import SocketServer as socketserver
+    import Queue as queue
     from urlparse import parse_qs, urlparse
 
 from nengo_gui._vendor.cookies import Cookies
@@ -101,12 +106,12 @@ class HttpResponse(object):
         self.headers = headers
 
     def send(self, request):
-        request.protocol_version = "HTTP/1.1"
         request.send_response(self.code)
-        request.send_header("Content-Type", self.mimetype)
-        request.send_header("Content-Length", len(self.data))
-        if hasattr(request, "flush_headers"):
-            request.flush_headers()
+        if request.close_connection:
+            request.send_header("Connection", "close")
+        if self.code != 304:  # a 304 response has no content
+            request.send_header("Content-Type", self.mimetype)
+            request.send_header("Content-Length", len(self.data))
         for cookie in request.response_cookies.render_response():
             request.send_header("Set-Cookie", cookie)
         for header in self.headers:
@@ -144,7 +149,7 @@ class JsonResponse(HttpResponse):
 
 class DualStackHttpServer(object):
     class Binding(object):
-        request_queue_size = 5
+        request_queue_size = 64
 
         def __init__(self, address_family, address):
             self.address_family = address_family
@@ -254,8 +259,8 @@ class DualStackHttpServer(object):
         self.__is_shut_down.set()
 
     def server_close(self):
-        for s in self.sockets:
-            s.close()
+        for b in self.bindings:
+            b.socket.close()
 
     def handle_request(self):
         raise NotImplementedError()
@@ -295,11 +300,214 @@ class DualStackHttpServer(object):
         logger.exception("Exception while handling request.")
 
 
-class ManagedThreadHttpServer(socketserver.ThreadingMixIn, DualStackHttpServer):
+class WorkerPool(object):
+    """A bounded number of threads executing submitted tasks in order.
+
+    Threads are started when tasks are submitted and no thread is idle,
+    up to `max_workers`. A task that will run for a long time (like
+    serving a websocket) can `detach` its thread from the pool, so that
+    it does not take the place of a worker.
+    """
+
+    def __init__(self, max_workers, name="WorkerPool"):
+        self.max_workers = max_workers
+        self.name = name
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._n_workers = 0
+        self._n_idle = 0
+        self._stopped = False
+
+    @property
+    def n_workers(self):
+        return self._n_workers
+
+    def submit(self, fn, *args):
+        self._tasks.put((fn, args))
+        with self._lock:
+            if self._n_idle == 0 and self._n_workers < self.max_workers:
+                self._start_worker()
+
+    def detach(self):
+        """Release the calling worker thread from the pool.
+
+        The thread finishes its current task outside of the pool and
+        another worker is started if tasks are waiting.
+        """
+        if not getattr(self._local, "attached", False):
+            return
+        self._local.attached = False
+        with self._lock:
+            self._n_workers -= 1
+            if not self._tasks.empty() and self._n_idle == 0:
+                self._start_worker()
+
+    def shutdown(self):
+        """Stop the idle workers; busy workers stop after their task."""
+        self._stopped = True
+        for _ in range(self.max_workers):
+            self._tasks.put(None)
+
+    def _start_worker(self):
+        if self._stopped:
+            return
+        self._n_workers += 1
+        thread = threading.Thread(target=self._run, name=self.name)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        self._local.attached = True
+        while self._local.attached:
+            with self._lock:
+                self._n_idle += 1
+            task = self._tasks.get()
+            with self._lock:
+                self._n_idle -= 1
+            if task is None:
+                break
+            fn, args = task
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("Error in %s task.", self.name)
+        if self._local.attached:
+            with self._lock:
+                self._n_workers -= 1
+
+
+class KeepAliveLoop(object):
+    """Waits in one thread for the next request on idle connections.
+
+    Persistent HTTP connections spend most of their time waiting for the
+    next request. Instead of occupying a worker thread, the request
+    handlers of idle connections are passed to this loop, which calls
+    ``ready(handler)`` once the next request arrives and ``expired(handler)``
+    if none arrives within `timeout` seconds.
+    """
+
+    def __init__(self, ready, expired, timeout=15.0):
+        self.ready = ready
+        self.expired = expired
+        self.timeout = timeout
+
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._selector = None
+        self._thread = None
+        self._wakeup_r, self._wakeup_w = None, None
+        self._stopped = False
+
+    @property
+    def n_connections(self):
+        return len(self._handlers)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._wakeup_w.setblocking(False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+            self._thread = threading.Thread(target=self._run, name="KeepAliveLoop")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def add(self, handler):
+        self.start()
+        with self._lock:
+            added = not self._stopped
+            if added:
+                try:
+                    self._selector.register(
+                        handler.request, selectors.EVENT_READ, handler
+                    )
+                except (ValueError, KeyError, OSError, socket.error):
+                    added = False  # the connection has been closed
+                else:
+                    self._handlers[handler] = time.time() + self.timeout
+        if added:
+            self._wakeup()
+        else:
+            self.expired(handler)
+
+    def stop(self):
+        """Stop the loop and expire all idle connections."""
+        with self._lock:
+            self._stopped = True
+        self._wakeup()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _wakeup(self):
+        if self._wakeup_w is not None:
+            try:
+                self._wakeup_w.send(b"\x00")
+            except (OSError, socket.error):
+                pass  # wakeup already pending
+
+    def _remove(self, handler):
+        with self._lock:
+            del self._handlers[handler]
+            self._selector.unregister(handler.request)
+
+    def _run(self):
+        try:
+            while not self._stopped:
+                with self._lock:
+                    deadline = min(self._handlers.values() or [time.time() + 1.0])
+                timeout = max(0.0, deadline - time.time())
+                for key, _ in self._selector.select(timeout):
+                    if key.data is None:
+                        try:
+                            while self._wakeup_r.recv(512):
+                                pass
+                        except (OSError, socket.error):
+                            pass
+                    elif not self._stopped:
+                        self._remove(key.data)
+                        self.ready(key.data)
+
+                now = time.time()
+                with self._lock:
+                    expired = [h for h, t in self._handlers.items() if t <= now]
+                for handler in expired:
+                    self._remove(handler)
+                    self.expired(handler)
+        finally:
+            with self._lock:
+                handlers = list(self._handlers)
+                self._handlers.clear()
+                self._selector.close()
+                self._wakeup_r.close()
+                self._wakeup_w.close()
+                self._wakeup_w = None
+            for handler in handlers:
+                self.expired(handler)
+
+
+class ManagedThreadHttpServer(DualStackHttpServer):
     """Threaded HTTP and WebSocket server that keeps track of its connections
-    to allow a proper shutdown."""
+    to allow a proper shutdown.
+
+    Requests are handled by a bounded pool of worker threads. Connections
+    are kept open for further requests (HTTP/1.1 keep-alive) and wait for
+    them in the `KeepAliveLoop` without occupying a worker. Websockets are
+    served by the `WebSocketLoop` (see `serve_websocket`), so that they do
+    not occupy a worker either.
+    """
 
-    daemon_threads = True  # this ensures all spawned threads exit
+    # maximum number of HTTP requests handled concurrently
+    max_workers = 16
+    # time in seconds to wait for the next request on a persistent connection
+    keep_alive_timeout = 15.0
+    # time in seconds to wait for the rest of a started request
+    request_timeout = 10.0
+
+    persistent_connections = True
 
     def __init__(self, *args, **kwargs):
         DualStackHttpServer.__init__(self, *args, **kwargs)
@@ -308,6 +516,14 @@ class ManagedThreadHttpServer(socketserver.ThreadingMixIn, DualStackHttpServer):
         self._requests = []
         self._websockets = []
 
+        self.pool = WorkerPool(self.max_workers, name="HttpWorker")
+        self.keep_alive = KeepAliveLoop(
+            self.continue_connection, self.close_connection, self.keep_alive_timeout
+        )
+
+        # a single thread services all open websockets
+        self.ws_loop = WebSocketLoop()
+
         self._shutting_down = False
 
     @property
@@ -323,13 +539,91 @@ class ManagedThreadHttpServer(socketserver.ThreadingMixIn, DualStackHttpServer):
         self._websockets.append(ws)
         return ws
 
-    def process_request_thread(self, request, client_address):
+    def serve_websocket(self, handler, channel):
+        """Serve the websocket of a request handler in the `WebSocketLoop`.
+
+        This returns immediately and the thread of the handler is free for
+        other requests. Once the websocket has been removed from the loop,
+        ``channel.finish()`` (if the channel defines it) is called in a
+        worker thread and the connection is closed.
+        """
+        handler.ws_detached = True
+
+        def closed():
+            if self._shutting_down:
+                # the loop is stopping; finish before shutdown returns
+                self._finish_websocket(handler, channel)
+            else:
+                self.pool.submit(self._finish_websocket, handler, channel)
+
+        self.ws_loop.register(handler.ws, channel, closed)
+
+    def _finish_websocket(self, handler, channel):
         thread = threading.current_thread()
-        self._requests.append((thread, request))
-        socketserver.ThreadingMixIn.process_request_thread(
-            self, request, client_address
+        self._requests.append((thread, handler.request))
+        try:
+            finish = getattr(channel, "finish", None)
+            if finish is not None:
+                finish()
+        except Exception:
+            logger.exception("Error while closing websocket.")
+        finally:
+            handler.ws.close()
+            self.close_connection(handler)
+            self._requests.remove((thread, handler.request))
+
+    def process_request(self, request, client_address):
+        request.settimeout(self.request_timeout)
+        # responses are written as headers and content, do not wait for
+        # the acknowledgement of the headers before sending the content
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def continue_connection(self, handler):
+        self.pool.submit(
+            self.process_request_thread,
+            handler.request,
+            handler.client_address,
+            handler,
         )
-        self._requests.remove((thread, request))
+
+    def close_connection(self, handler):
+        handler.close_connection = True
+        try:
+            handler.finish()
+        except (OSError, socket.error):
+            pass
+        self.shutdown_request(handler.request)
+
+    def process_request_thread(self, request, client_address, handler=None):
+        thread = threading.current_thread()
+        self._requests.append((thread, request))
+        try:
+            if handler is None:
+                handler = self.RequestHandlerClass(request, client_address, self)
+            else:
+                handler.handle()
+                handler.finish()
+            # handle requests that were sent without waiting for the
+            # response (HTTP pipelining)
+            while not handler.close_connection and handler.has_buffered_request():
+                handler.handle()
+                handler.finish()
+        except Exception:
+            self.handle_error(request, client_address)
+            if handler is not None:
+                handler.close_connection = True
+        finally:
+            self._requests.remove((thread, request))
+
+        if handler is None:
+            self.shutdown_request(request)
+        elif handler.ws_detached:
+            pass  # closed once the WebSocketLoop is done with the websocket
+        elif handler.close_connection or self._shutting_down:
+            self.close_connection(handler)
+        else:
+            self.keep_alive.add(handler)
 
     def handle_error(self, request, client_address):
         exc_type, exc_value, _ = sys.exc_info()
@@ -348,8 +642,11 @@ class ManagedThreadHttpServer(socketserver.ThreadingMixIn, DualStackHttpServer):
             return
         self._shutting_down = True
 
+        self.ws_loop.stop()
         for ws in self.websockets:
             ws.close()
+        self.keep_alive.stop()
+        self.pool.shutdown()
 
         DualStackHttpServer.shutdown(self)
 
@@ -386,14 +683,54 @@ class HttpWsRequestHandler(server.BaseHTTPRequestHandler):
     http_commands = {}
     ws_commands = {}
 
-    def __init__(self, *args, **kwargs):
+    # accept the permessage-deflate extension if the client offers it
+    ws_compression = True
+
+    # set when the websocket outlives the request (see
+    # ManagedThreadHttpServer.serve_websocket)
+    ws_detached = False
+
+    # allows persistent connections
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        """Handle a single request.
+
+        Servers with ``persistent_connections`` (see
+        `ManagedThreadHttpServer`) wait for further requests on the
+        connection themselves, so that an idle connection does not occupy
+        a thread. Other servers close the connection after one request.
+        """
         self.resource = None
         self.query = None
         self.db = {}
         self.request_cookies = Cookies()
         self.response_cookies = Cookies()
         self.ws = None
-        server.BaseHTTPRequestHandler.__init__(self, *args, **kwargs)
+        self.ws_detached = False
+        self.handle_one_request()
+        if not getattr(self.server, "persistent_connections", False):
+            self.close_connection = True
+
+    def finish(self):
+        if self.close_connection:
+            server.BaseHTTPRequestHandler.finish(self)
+        else:
+            self.wfile.flush()
+
+    def has_buffered_request(self):
+        """Whether (part of) the next request has already been received."""
+        pending = getattr(self.request, "pending", None)
+        if pending is not None and pending() > 0:
+            return True  # decrypted SSL data
+        timeout = self.request.gettimeout()
+        self.request.settimeout(0.0)
+        try:
+            return len(self.rfile.peek(1)) > 0
+        except (OSError, socket.error, ValueError):
+            return False
+        finally:
+            self.request.settimeout(timeout)
 
     def do_POST(self):
         data = self.rfile.read(int(self.headers["Content-Length"])).decode("ascii")
@@ -416,6 +753,8 @@ class HttpWsRequestHandler(server.BaseHTTPRequestHandler):
             connection = self.headers.get("Connection", "close").lower()
             if "upgrade" in connection:
                 self.handle_upgrade()
+                if self.ws is not None:
+                    self.close_connection = True
             else:
                 self.http_GET()
         except HttpError as err:
@@ -434,6 +773,8 @@ class HttpWsRequestHandler(server.BaseHTTPRequestHandler):
             response = getattr(self, command)()
         if response is not None:
             response.send(self)
+        else:
+            self.close_connection = True
 
     def http_default(self):
         raise InvalidResource(self.path)
@@ -453,7 +794,7 @@ class HttpWsRequestHandler(server.BaseHTTPRequestHandler):
 Upgrade: websocket\r\n\
 Connection: Upgrade\r\n\
 Sec-WebSocket-Accept: {sec}\r\n\
-\r\n\
+{extensions}\r\n\
 """
         valid_srv_addrs = self.get_expected_origins()
 
@@ -485,9 +826,19 @@ Sec-WebSocket-Accept: {sec}\r\n\
         sec = base64.b64encode(
             hashlib.sha1((key + WS_MAGIC).encode("ascii")).digest()
         ).decode("ascii")
-        _sendall(self.request, response.format(sec=sec).encode("utf-8"))
+        deflate, extensions = None, ""
+        offers = self.headers.get_all("Sec-WebSocket-Extensions")
+        if self.ws_compression and offers is not None:
+            deflate, params = PerMessageDeflate.negotiate(", ".join(offers))
+            if deflate is not None:
+                extensions = "Sec-WebSocket-Extensions: %s\r\n" % params
+        _sendall(
+            self.request,
+            response.format(sec=sec, extensions=extensions).encode("utf-8"),
+        )
 
         self.ws = self.server.create_websocket(self.request)
+        self.ws.deflate = deflate
         self.ws.set_blocking(False)
 
         command = self._get_command(self.ws_commands, self.resource)
@@ -495,7 +846,8 @@ Sec-WebSocket-Accept: {sec}\r\n\
             self.ws_default()
         else:
             getattr(self, command)()
-        self.ws.close()
+        if not self.ws_detached:
+            self.ws.close()
 
     def ws_default(self):
         raise InvalidResource(self.path)
@@ -517,10 +869,27 @@ Sec-WebSocket-Accept: {sec}\r\n\
 class WebSocket(object):
     ST_OPEN, ST_CLOSING, ST_CLOSED = range(3)
 
+    # number of bytes to request from the socket per read
+    recv_size = 4096
+
+    # consumed bytes at the front of the read buffer are only discarded once
+    # they exceed this size, so parsing does not copy the buffer every frame
+    compact_threshold = 64 * 1024
+
+    # errors of socket operations meaning that the connection is gone
+    closed_errnos = (errno.EPIPE, errno.ECONNRESET, errno.EBADF)
+
     def __init__(self, socket):
         self.socket = socket
-        self._buf = bytearray([])
+        self._buf = bytearray()
+        self._buf_offset = 0  # start of the unparsed data in self._buf
+        self._out = bytearray()  # data written, but not yet sent
         self.state = self.ST_OPEN
+        self.deflate = None  # PerMessageDeflate, if negotiated
+        self.last_write = time.time()  # time the last frame was written
+        self.last_sent = self.last_write  # time data was last sent
+        self.n_frames_sent = 0
+        self.n_bytes_sent = 0
 
     def set_timeout(self, timeout):
         self.socket.settimeout(timeout)
@@ -530,7 +899,7 @@ class WebSocket(object):
 
     def _read(self):
         try:
-            self._buf = self._buf + bytearray(self.socket.recv(512))
+            data = self.socket.recv(self.recv_size)
         except ssl.SSLError as e:
             if e.errno == 2:
                 # Corresponds to SSLWantReadError which only exists in Python
@@ -542,23 +911,57 @@ class WebSocket(object):
             if e.errno in [errno.EDEADLK, errno.EAGAIN, 10035]:
                 # no data available
                 pass
-            elif e.errno == errno.EBADF:
+            elif e.errno in self.closed_errnos:
                 raise SocketClosedError("Cannot read from closed socket.")
             else:
                 raise
+        else:
+            if len(data) == 0:
+                raise SocketClosedError("Connection closed by the client.")
+            self._buf += data
+
+    def _consume(self, size):
+        """Mark `size` bytes at the front of the read buffer as parsed."""
+        self._buf_offset += size
+        if self._buf_offset >= len(self._buf):
+            del self._buf[:]
+            self._buf_offset = 0
+        elif self._buf_offset >= self.compact_threshold:
+            del self._buf[: self._buf_offset]
+            self._buf_offset = 0
 
     def read_frame(self):
+        """Return the next data frame or None if no complete frame is
+        available. Control frames are handled transparently."""
         try:
-            self._read()
-            frame, size = WebSocketFrame.parse(self._buf)
-            self._buf = self._buf[size:]
-            if not self._handle_frame(frame):
-                return frame
+            if len(self._buf) <= self._buf_offset:
+                self._read()
+            while True:
+                try:
+                    frame, size = WebSocketFrame.parse(self._buf, self._buf_offset)
+                except ValueError:
+                    # incomplete frame, try again with more data
+                    self._read()
+                    frame, size = WebSocketFrame.parse(self._buf, self._buf_offset)
+                self._consume(size)
+                if frame.rsv & WebSocketFrame.RSV1 and self.deflate is not None:
+                    frame = self.deflate.decompress(frame)
+                if not self._handle_frame(frame):
+                    return frame
         except ValueError:
             return None
         except socket.timeout:
             return None
 
+    def has_pending_data(self):
+        """Whether decrypted SSL data is buffered that select() will not
+        report."""
+        pending = getattr(self.socket, "pending", None)
+        return pending is not None and pending() > 0
+
+    def fileno(self):
+        return self.socket.fileno()
+
     def _handle_frame(self, frame):
         if frame.opcode == WebSocketFrame.OP_CLOSE:
             if self.state not in [self.ST_CLOSING, self.ST_CLOSED]:
@@ -569,36 +972,370 @@ class WebSocket(object):
                 pong = WebSocketFrame(
                     fin=1, rsv=0, opcode=WebSocketFrame.OP_PONG, mask=0, data=frame.data
                 )
-                _sendall(self.socket, pong.pack())
+                self._out += pong.pack()
+                self.flush()
             return True
         elif frame.opcode == WebSocketFrame.OP_PONG:
             return True
         else:
             return False
 
-    def close(self):
+    def close(self, timeout=0.0):
+        """Send a close frame.
+
+        Waits up to `timeout` seconds for the data still buffered to be
+        sent; whatever has not been sent by then is discarded.
+        """
         if self.state not in [self.ST_CLOSING, self.ST_CLOSED]:
             self.state = self.ST_CLOSING
             close_frame = WebSocketFrame(
                 fin=1, rsv=0, opcode=WebSocketFrame.OP_CLOSE, mask=0, data=b""
             )
+            self._out += close_frame.pack()
+            end = time.time() + timeout
             try:
-                _sendall(self.socket, close_frame.pack())
-            except socket.error as err:
-                if err.errno in [errno.EPIPE, errno.EBADF]:
-                    pass
+                while not self.flush():
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        break
+                    select.select((), (self.socket,), (), remaining)
+            except (SocketClosedError, socket.error, ValueError):
+                pass
+            del self._out[:]
+
+    @property
+    def has_pending_writes(self):
+        """Whether written data is waiting for the socket to accept it."""
+        return len(self._out) > 0
+
+    def flush(self):
+        """Send as much of the buffered data as the socket accepts without
+        blocking.
+
+        Returns True once all data has been sent.
+        """
+        while len(self._out) > 0:
+            try:
+                sent = self.socket.send(self._out)
+            except ssl.SSLError as e:
+                if e.errno == 3:  # SSLWantWriteError
+                    return False
+                raise
+            except socket.error as e:
+                if e.errno in [errno.EDEADLK, errno.EAGAIN, 10035]:
+                    return False  # socket buffer full
+                elif e.errno in self.closed_errnos:
+                    raise SocketClosedError("Cannot write to socket.")
+                raise
+            if sent == 0:
+                return False
+            del self._out[:sent]
+            self.last_sent = time.time()
+            self.n_bytes_sent += sent
+        return True
 
     def write_frame(self, frame):
+        """Write a frame.
+
+        The frame is sent as far as the socket accepts it without blocking;
+        the rest is kept in a buffer that is sent by `flush`. On a
+        non-blocking socket a client that does not read its data thus never
+        blocks the writing thread.
+        """
         if self.state != self.ST_OPEN:
             raise SocketClosedError("Connection not open.")
 
+        if self.deflate is not None:
+            frame = self.deflate.compress(frame)
+        if len(self._out) == 0:
+            self.last_sent = time.time()  # start of the wait for the client
+        self._out += frame.pack()
+        self.last_write = time.time()
+        self.n_frames_sent += 1
+        self.flush()
+
+    def write_text(self, text):
+        self.write_frame(WebSocketFrame.create_text_frame(text))
+
+    def write_binary(self, data):
+        self.write_frame(WebSocketFrame.create_binary_frame(data))
+
+
+class WebSocketLoop(object):
+    """Event loop that services all registered websockets in one thread.
+
+    Instead of polling every websocket in its own thread, the loop sleeps
+    until one of the websockets becomes readable or `notify` is called to
+    signal that new data is available to be sent. Each websocket is
+    registered with a channel object providing the methods
+
+    * ``receive(ws, frame)``: handle a received data frame; return False to
+      close the websocket,
+    * ``update(ws)``: send any pending data to the client,
+    * ``close(ws, error)``: called once the websocket has been unregistered;
+      `error` is the exception that caused the close or None if the channel
+      requested the close. This is called from the loop thread and should
+      not block; longer clean up should be done by the thread waiting on
+      the event returned by `register`.
+
+    Parameters
+    ----------
+    min_interval : float, optional
+        Minimum time in seconds between two calls of ``update`` on the
+        channels. This limits the rate at which data is sent out.
+    idle_interval : float, optional
+        Maximum time in seconds between two calls of ``update`` if no data
+        is received and `notify` is not called.
+    ping_interval : float, optional
+        A ping is sent on every websocket that has not sent anything for
+        this time in seconds, so that closed connections are noticed. It
+        is sent once per connection, however many components it serves.
+    write_timeout : float, optional
+        A websocket is closed if the client has not accepted any of the
+        data waiting to be sent to it for this time in seconds.
+
+    Data is written to the websockets without blocking. While a client has
+    not received everything written to its websocket, the socket is watched
+    for becoming writable and ``update`` is not called on its channel, so
+    that the components keep (and drop) their data as for any slow client
+    instead of a stalled client blocking all other websockets.
+    """
+
+    def __init__(
+        self,
+        min_interval=0.01,
+        idle_interval=0.25,
+        ping_interval=2.0,
+        write_timeout=10.0,
+    ):
+        self.min_interval = min_interval
+        self.idle_interval = idle_interval
+        self.ping_interval = ping_interval
+        self.write_timeout = write_timeout
+
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._selector = None
+        self._thread = None
+        self._wakeup_r, self._wakeup_w = None, None
+        self._pending = False
+        self._stopped = False
+        self._last_update = 0.0
+
+    @property
+    def n_websockets(self):
+        return len(self._channels)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._wakeup_w.setblocking(False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+            self._thread = threading.Thread(target=self._run, name="WebSocketLoop")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def register(self, ws, channel, on_close=None):
+        """Add a websocket to the loop.
+
+        Returns a `threading.Event` that will be set once the websocket
+        has been removed from the loop. ``on_close`` is called without
+        arguments at the same time; like ``channel.close`` it is called
+        from the loop thread and should not block.
+        """
+        closed = threading.Event()
+        if self._stopped:
+            closed.set()
+            if on_close is not None:
+                on_close()
+            return closed
+        self.start()
+        with self._lock:
+            self._channels[ws] = (channel, closed, on_close)
+            self._selector.register(ws, selectors.EVENT_READ, ws)
+        self.notify()
+        return closed
+
+    def notify(self):
+        """Signal that channels have new data to send.
+
+        This can be called from any thread and is cheap to call repeatedly;
+        the loop is only woken once per `min_interval`.
+        """
+        if not self._pending:
+            self._pending = True
+            self._wakeup()
+
+    def _wakeup(self):
+        if self._wakeup_w is not None:
+            try:
+                self._wakeup_w.send(b"\x00")
+            except (OSError, socket.error):
+                pass  # wakeup already pending
+
+    def _drain_wakeup(self):
         try:
-            _sendall(self.socket, frame.pack())
-        except socket.error as e:
-            if e.errno == errno.EPIPE:  # Broken pipe
-                raise SocketClosedError("Cannot write to socket.")
-            else:
-                raise
+            while self._wakeup_r.recv(512):
+                pass
+        except (OSError, socket.error):
+            pass
+
+    def _run(self):
+        try:
+            while not self._stopped:
+                if self._pending:
+                    timeout = max(
+                        0.0, self._last_update + self.min_interval - time.time()
+                    )
+                else:
+                    timeout = self.idle_interval
+                for key, events in self._selector.select(timeout):
+                    if key.data is None:
+                        self._drain_wakeup()
+                        continue
+                    if events & selectors.EVENT_READ:
+                        self._receive(key.data)
+                    if events & selectors.EVENT_WRITE:
+                        self._flush(key.data)
+
+                now = time.time()
+                if now - self._last_update < self.min_interval:
+                    # woken early; send the data once min_interval has passed
+                    self._pending = True
+                    continue
+                self._pending = False
+                self._last_update = now
+                for ws in list(self._channels):
+                    self._update(ws, now)
+        finally:
+            for ws in list(self._channels):
+                self._unregister(ws, SocketClosedError("Websocket loop stopped."))
+            self._selector.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
+    def _receive(self, ws):
+        channel = self._channels[ws][0]
+        try:
+            frame = ws.read_frame()
+            while frame is not None or ws.has_pending_data():
+                if frame is not None and channel.receive(ws, frame) is False:
+                    self._unregister(ws, None)
+                    return
+                frame = ws.read_frame()
+            self._pending = True
+            self._watch_writes(ws)
+        except SocketClosedError as err:
+            self._unregister(ws, err)
+        except Exception:
+            logger.exception("Error during websocket communication.")
+
+    def _flush(self, ws):
+        if ws not in self._channels:
+            return  # unregistered while receiving
+        try:
+            if ws.flush():
+                self._pending = True  # the channel can send again
+            self._watch_writes(ws)
+        except SocketClosedError as err:
+            self._unregister(ws, err)
+        except Exception:
+            logger.exception("Error during websocket communication.")
+
+    def _watch_writes(self, ws):
+        """Select the websocket for writing while it has unsent data."""
+        events = selectors.EVENT_READ
+        if ws.has_pending_writes:
+            events |= selectors.EVENT_WRITE
+        with self._lock:
+            if ws in self._channels and self._selector.get_key(ws).events != events:
+                self._selector.modify(ws, events, ws)
+
+    def _update(self, ws, now):
+        if ws.state != WebSocket.ST_OPEN:
+            self._unregister(ws, SocketClosedError("Websocket has been closed"))
+            return
+        if ws.has_pending_writes:
+            # the client has not received the last data yet
+            if now - ws.last_sent >= self.write_timeout:
+                ws.close()
+                self._unregister(
+                    ws, SocketClosedError("Client stopped receiving data.")
+                )
+            return
+        channel = self._channels[ws][0]
+        try:
+            channel.update(ws)
+            if now - ws.last_write >= self.ping_interval:
+                ws.write_frame(WebSocketFrame(1, 0, WebSocketFrame.OP_PING, 0, b""))
+            self._watch_writes(ws)
+        except SocketClosedError as err:
+            self._unregister(ws, err)
+        except Exception:
+            logger.exception("Error during websocket communication.")
+
+    def _unregister(self, ws, error):
+        with self._lock:
+            channel, closed, on_close = self._channels.pop(ws)
+            try:
+                self._selector.unregister(ws)
+            except (KeyError, ValueError):
+                pass
+        try:
+            channel.close(ws, error)
+        except Exception:
+            logger.exception("Error while closing websocket.")
+        finally:
+            closed.set()
+            if on_close is not None:
+                try:
+                    on_close()
+                except Exception:
+                    logger.exception("Error while closing websocket.")
+
+
+class MultiplexedWriter(object):
+    """Collects the frames written for several channels and sends them as a
+    single binary websocket frame.
+
+    Each channel message is encoded as a record consisting of the channel
+    number (uint16), the opcode (uint8) and the payload length (uint32),
+    all little endian, followed by the payload. Control frames are written
+    directly to the websocket.
+
+    Set `channel` before writing the frames for a channel and call `flush`
+    to send all collected records.
+    """
+
+    record_header = struct.Struct("<HBI")
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.channel = 0
+        self._records = []
+
+    @property
+    def state(self):
+        return self.ws.state
+
+    def write_frame(self, frame):
+        if frame.opcode in (WebSocketFrame.OP_TEXT, WebSocketFrame.OP_BIN):
+            self._records.append(
+                self.record_header.pack(self.channel, frame.opcode, len(frame.data))
+            )
+            self._records.append(frame.data)
+        else:
+            self.ws.write_frame(frame)
 
     def write_text(self, text):
         self.write_frame(WebSocketFrame.create_text_frame(text))
@@ -606,6 +1343,12 @@ class WebSocket(object):
     def write_binary(self, data):
         self.write_frame(WebSocketFrame.create_binary_frame(data))
 
+    def flush(self):
+        if len(self._records) > 0:
+            data = b"".join(self._records)
+            del self._records[:]
+            self.ws.write_binary(data)
+
 
 def _sendall(socket, data):
     bytes_sent = 0
@@ -614,6 +1357,32 @@ def _sendall(socket, data):
         bytes_sent += socket.send(data[bytes_sent:])
 
 
+# payloads up to this many bytes are unmasked with a single big integer XOR,
+# larger payloads with a vectorized 32-bit XOR in NumPy
+_UNMASK_INT_THRESHOLD = 512
+
+
+def _unmask(payload, mask):
+    """Apply the 4-byte client `mask` to `payload` (a memoryview).
+
+    Returns the unmasked payload as a new bytearray.
+    """
+    n = len(payload)
+    if n <= _UNMASK_INT_THRESHOLD:
+        key = (mask * (n // 4 + 1))[:n]
+        value = int.from_bytes(payload, "little") ^ int.from_bytes(key, "little")
+        return bytearray(value.to_bytes(n, "little"))
+
+    data = bytearray(payload)
+    n_words = n // 4
+    words = np.frombuffer(data, dtype=np.uint32, count=n_words)
+    words ^= np.frombuffer(mask, dtype=np.uint32)[0]
+    del words  # release the export on data
+    for i in range(n_words * 4, n):
+        data[i] ^= mask[i % 4]
+    return data
+
+
 class WebSocketFrame(object):
     __slots__ = ["fin", "rsv", "opcode", "mask", "data"]
 
@@ -624,6 +1393,9 @@ class WebSocketFrame(object):
     OP_PING = 0x9
     OP_PONG = 0xA
 
+    # set in the rsv bits of compressed messages (see PerMessageDeflate)
+    RSV1 = 0x4
+
     def __init__(self, fin, rsv, opcode, mask, data):
         self.fin = fin
         self.rsv = rsv
@@ -632,47 +1404,56 @@ class WebSocketFrame(object):
         self.data = data
 
     @classmethod
-    def parse(cls, data):
-        try:
-            offset = 0
+    def parse(cls, data, offset=0):
+        """Parse a single frame from `data` starting at `offset`.
 
-            fin = (data[0] >> 7) & 0x1
-            rsv = (data[0] >> 4) & 0x07
-            opcode = data[0] & 0x0F
-            masked = (data[1] >> 7) & 0x01
-            datalen = data[1] & 0x7F
+        Returns the frame and the number of bytes consumed from `data`.
+        Raises a `ValueError` if `data` does not contain a complete frame.
+        """
+        with memoryview(data) as view:
+            try:
+                fin = (view[offset] >> 7) & 0x1
+                rsv = (view[offset] >> 4) & 0x07
+                opcode = view[offset] & 0x0F
+                masked = (view[offset + 1] >> 7) & 0x01
+                datalen = view[offset + 1] & 0x7F
+            except IndexError:
+                raise ValueError("Frame incomplete.")
             mask = b"\x00\x00\x00\x00"
 
-            offset += 2
-
+            start = offset + 2
             if datalen == 126:
-                datalen = cls._to_int(data[offset : offset + 2])
-                offset += 2
+                datalen = cls._to_int(view[start : start + 2], 2)
+                start += 2
             elif datalen == 127:
-                datalen = cls._to_int(data[offset : offset + 8])
-                offset += 8
+                datalen = cls._to_int(view[start : start + 8], 8)
+                start += 8
 
             if masked:
-                mask = data[offset : offset + 4]
-                offset += 4
-
-            size = offset + datalen
-            masked_data = data[offset:size]
-            if len(masked_data) < datalen:
-                raise IndexError()
-            unmasked_data = [
-                masked_data[i] ^ mask[i % 4] for i in range(len(masked_data))
-            ]
-            data = bytearray(unmasked_data)
-            if opcode == cls.OP_TEXT:
-                data = data.decode("ascii")
-
-            return cls(fin, rsv, opcode, mask, data), size
-        except IndexError:
-            raise ValueError("Frame incomplete.")
+                mask = view[start : start + 4].tobytes()
+                if len(mask) < 4:
+                    raise ValueError("Frame incomplete.")
+                start += 4
+
+            end = start + datalen
+            if end > len(view):
+                raise ValueError("Frame incomplete.")
+            payload = view[start:end]
+            if masked:
+                data = _unmask(payload, mask)
+            else:
+                data = bytearray(payload)
+            payload.release()
+
+        if opcode == cls.OP_TEXT and not rsv & cls.RSV1:
+            data = data.decode("ascii")
+
+        return cls(fin, rsv, opcode, mask, data), end - offset
 
     @classmethod
-    def _to_int(cls, data):
+    def _to_int(cls, data, size):
+        if len(data) < size:
+            raise ValueError("Frame incomplete.")
         value = 0
         for b in data:
             value = (value << 8) + b
@@ -703,3 +1484,108 @@ class WebSocketFrame(object):
     @classmethod
     def create_binary_frame(cls, data, mask=0):
         return cls(1, 0, cls.OP_BIN, mask, data)
+
+
+class PerMessageDeflate(object):
+    """The permessage-deflate extension (RFC 7692) of a WebSocket.
+
+    Compresses the data frames sent to the client and decompresses the
+    frames received with the RSV1 bit set. Messages smaller than
+    `min_text_size` or `min_binary_size` are sent uncompressed: the few
+    bytes saved on them are not worth the CPU time, in particular for the
+    small binary frames the plots send many times a second.
+
+    Parameters
+    ----------
+    no_context_takeover : bool, optional
+        Compress every message independently of the previous ones
+        (requested by the client with ``server_no_context_takeover``).
+    max_window_bits : int, optional
+        Base 2 logarithm of the size of the compression window
+        (requested by the client with ``server_max_window_bits``).
+    """
+
+    name = "permessage-deflate"
+
+    # smallest payloads (in bytes) that are compressed
+    min_text_size = 64
+    min_binary_size = 1024
+    # the messages are small and sent often, so compress fast
+    level = 1
+
+    # window sizes supported by zlib (which does not support 2**8 bytes)
+    _window_bits = [str(bits) for bits in range(9, 16)]
+
+    def __init__(self, no_context_takeover=False, max_window_bits=15):
+        self.no_context_takeover = no_context_takeover
+        self.max_window_bits = max_window_bits
+        self._flush_mode = (
+            zlib.Z_FULL_FLUSH if no_context_takeover else zlib.Z_SYNC_FLUSH
+        )
+        self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, -max_window_bits)
+        # decompresses messages with any window size, with or without
+        # context takeover by the client
+        self._decompressor = zlib.decompressobj(-15)
+
+    @classmethod
+    def negotiate(cls, offers):
+        """Accept the first acceptable permessage-deflate offer.
+
+        ``offers`` is the value of the Sec-WebSocket-Extensions header of
+        the request. Returns the extension and the value of the header of
+        the response, or ``(None, None)`` if no offer can be accepted.
+        """
+        for offer in offers.split(","):
+            params = [param.strip() for param in offer.split(";")]
+            if params[0].lower() != cls.name:
+                continue
+            kwargs = {}
+            response = [cls.name]
+            for param in params[1:]:
+                key, _, value = param.partition("=")
+                key, value = key.strip().lower(), value.strip().strip('"')
+                if key == "server_no_context_takeover" and value == "":
+                    kwargs["no_context_takeover"] = True
+                    response.append(key)
+                elif key == "server_max_window_bits" and value in cls._window_bits:
+                    kwargs["max_window_bits"] = int(value)
+                    response.append("%s=%s" % (key, value))
+                elif key == "client_no_context_takeover" and value == "":
+                    pass  # the decompressor handles both
+                elif key == "client_max_window_bits" and (
+                    value == "" or value in cls._window_bits or value == "8"
+                ):
+                    pass  # the decompressor handles all window sizes
+                else:
+                    break  # decline offers with unknown parameters
+            else:
+                return cls(**kwargs), "; ".join(response)
+        return None, None
+
+    def compress(self, frame):
+        """Return the frame to send for a message frame."""
+        if frame.opcode == WebSocketFrame.OP_TEXT:
+            min_size = self.min_text_size
+        elif frame.opcode == WebSocketFrame.OP_BIN:
+            min_size = self.min_binary_size
+        else:
+            return frame  # control frames are never compressed
+        if not frame.fin or len(frame.data) < min_size:
+            return frame
+
+        data = self._compressor.compress(frame.data)
+        data += self._compressor.flush(self._flush_mode)
+        # the message ends with the empty block of the flush, which is
+        # left out (RFC 7692, section 7.2.1)
+        return WebSocketFrame(
+            frame.fin, frame.rsv | WebSocketFrame.RSV1, frame.opcode, 0, data[:-4]
+        )
+
+    def decompress(self, frame):
+        """Return the uncompressed message of a received frame."""
+        data = self._decompressor.decompress(bytes(frame.data) + b"\x00\x00\xff\xff")
+        if frame.opcode == WebSocketFrame.OP_TEXT:
+            data = data.decode("ascii")
+        return WebSocketFrame(
+            frame.fin, frame.rsv & ~WebSocketFrame.RSV1, frame.opcode, frame.mask, data
+        )
@@ -0,0 +1,357 @@
+"""Build and run the simulator of a Page in a child process.
+
+With ``PageSettings.sim_process`` the GUI server process only serves HTTP
+and websockets. Each Page forks a `SimProcess` that builds the Simulator
+and runs it, so heavy models do not compete for the GIL of the server or
+with each other.
+
+The Components whose data comes from the simulation (plots, sliders, the
+build progress, ...) run their ``update_client`` in the child process. The
+frames they produce are written to a `FrameRing` in shared memory and
+relayed to the websockets by the server process. Messages from the client
+to these Components are forwarded to the child over a pipe, as are the
+pause state and target speed of the SimControl.
+"""
+
+import logging
+import mmap
+import multiprocessing
+import sys
+import threading
+import traceback
+from collections import defaultdict, deque
+
+import numpy as np
+
+import nengo_gui.exec_env
+from nengo_gui.compat import StringIO
+from nengo_gui.server import MultiplexedWriter, WebSocketFrame
+
+logger = logging.getLogger(__name__)
+
+
+class SimProcessError(Exception):
+    """Building the simulator in the child process failed."""
+
+    def __init__(self, error):
+        super(SimProcessError, self).__init__(error["trace"])
+        self.error = error
+
+
+class FrameRing(object):
+    """Ring buffer of websocket frames in shared memory.
+
+    A single producer (the child process) appends records and a single
+    consumer (the server process) reads them. Each record consists of a
+    `.MultiplexedWriter.record_header` (channel, opcode and length) and
+    the frame payload. The total number of bytes written and read are
+    stored in front of the data, so both processes see them. If the ring
+    is full, new frames are dropped instead of blocking the producer.
+    """
+
+    record_header = MultiplexedWriter.record_header
+
+    def __init__(self, capacity=4 * 1024 * 1024):
+        self.capacity = capacity
+        # anonymous mmaps are shared with child processes created by fork
+        self.buffer = mmap.mmap(-1, 16 + capacity)
+        self.counters = np.frombuffer(self.buffer, dtype=np.uint64, count=2)
+        self.data = np.frombuffer(self.buffer, dtype=np.uint8, offset=16)
+        self.dropped = 0
+
+    def write(self, channel, opcode, payload):
+        written, read = int(self.counters[0]), int(self.counters[1])
+        size = self.record_header.size + len(payload)
+        if size > self.capacity - (written - read):
+            self.dropped += 1
+            return False
+        header = self.record_header.pack(channel, opcode, len(payload))
+        self._copy(written, header)
+        self._copy(written + len(header), payload)
+        self.counters[0] = written + size
+        return True
+
+    def _copy(self, position, data):
+        data = np.frombuffer(data, dtype=np.uint8)
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.data[start : start + first] = data[:first]
+        self.data[: len(data) - first] = data[first:]
+
+    def read(self):
+        """Return all unread records as (channel, opcode, payload) tuples."""
+        written, read = int(self.counters[0]), int(self.counters[1])
+        if written == read:
+            return []
+        start = read % self.capacity
+        end = start + written - read
+        if end <= self.capacity:
+            data = self.data[start:end].tobytes()
+        else:
+            data = (
+                self.data[start:].tobytes() + self.data[: end - self.capacity].tobytes()
+            )
+        self.counters[1] = written
+
+        records = []
+        offset = 0
+        while offset < len(data):
+            channel, opcode, length = self.record_header.unpack_from(data, offset)
+            offset += self.record_header.size
+            records.append((channel, opcode, data[offset : offset + length]))
+            offset += length
+        return records
+
+
+class RingWriter(object):
+    """Client passed to ``update_client`` in the child process."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.channel = 0
+        self.written = False
+
+    def write_frame(self, frame):
+        self.ring.write(self.channel, frame.opcode, frame.data)
+        self.written = True
+
+    def write_text(self, text):
+        self.write_frame(WebSocketFrame.create_text_frame(text))
+
+    def write_binary(self, data):
+        self.write_frame(WebSocketFrame.create_binary_frame(data))
+
+
+class SimProcess(object):
+    """Builds and runs the simulator of a Page in a child process.
+
+    Created by `.Page.build` in place of the Simulator and stored as
+    ``page.sim``, so that ``page.sim is None`` still tells whether a
+    simulation exists. Closing it stops the child process.
+
+    Parameters
+    ----------
+    page : nengo_gui.page.Page
+        The page whose model should be simulated. Its Components must
+        already have added their nengo objects to the model.
+    backend : module
+        The module providing the Simulator.
+    """
+
+    update_interval = 0.01  # how often the child sends new data (s)
+
+    def __init__(self, page, backend):
+        self.page = page
+        self.backend = backend
+        self.sim_control = page.sim_control
+        self.components = [c for c in page.components if c.runs_in_sim_process]
+        self.channels = {id(c): i for i, c in enumerate(self.components)}
+        self.ring = FrameRing()
+        self.pending = defaultdict(deque)
+        self.dropped = {}  # see Page.count_dropped
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.closed = False
+
+        context = multiprocessing.get_context("fork")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=self._child_main, args=(child_conn,))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+        try:
+            msg = self.conn.recv()
+            while msg[0] != "built":
+                # the frames (of the build progress) are sent once the
+                # simulator is in place
+                msg = self.conn.recv()
+            _, error, stdout = msg
+        except EOFError:
+            error = dict(trace="Simulation process exited during build.", line=None)
+            stdout = ""
+        sys.stdout.write(stdout)
+        if error is not None:
+            self.close()
+            raise SimProcessError(error)
+
+        self.thread = threading.Thread(target=self._relay)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def relays(self, component):
+        """Whether the component's data is sent from the child process."""
+        return id(component) in self.channels
+
+    def update_client(self, component, client):
+        """Send the frames the child process produced for a component."""
+        with self.lock:
+            for channel, opcode, payload in self.ring.read():
+                self.pending[channel].append((opcode, payload))
+            frames = self.pending.pop(self.channels[id(component)], ())
+        for opcode, payload in frames:
+            client.write_frame(WebSocketFrame(1, 0, opcode, 0, payload))
+
+    def message(self, component, msg):
+        """Forward a message from the client to the child process."""
+        if self.relays(component):
+            self._send(("message", self.channels[id(component)], msg))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._send(("close",))
+        except (OSError, IOError):
+            pass  # the child process has already exited
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+    def _send(self, msg):
+        with self.send_lock:
+            self.conn.send(msg)
+
+    def _relay(self):
+        """Server process thread receiving notifications from the child."""
+        sim_control = self.sim_control
+        control = None
+        while not self.closed:
+            new_control = (
+                sim_control.paused,
+                sim_control.target_rate,
+                sim_control.target_scale,
+            )
+            try:
+                if new_control != control:
+                    control = new_control
+                    self._send(("control",) + control)
+                if not self.conn.poll(self.update_interval):
+                    continue
+                msg = self.conn.recv()
+            except (EOFError, OSError, IOError):
+                break
+
+            if msg[0] == "data":
+                sim_control.time = msg[1]
+                sim_control.rate = msg[2]
+                sim_control.rate_proportion = msg[3]
+                self.dropped = msg[4]
+                self.page.notify_clients()
+            elif msg[0] == "error":
+                self.page.error = msg[1]
+                self._stop()
+                return
+
+        if not self.closed:
+            self.page.error = dict(
+                trace="Simulation process exited unexpectedly.", line=None
+            )
+            self._stop()
+
+    def _stop(self):
+        if self.page.sim is self:
+            self.page.sim = None
+        self.page.notify_clients()
+
+    def _child_main(self, conn):
+        """Entry point of the child process."""
+        self.conn = conn
+        page = self.page
+        # data is sent by _serve, the server's loop is not in this process
+        page.notify_clients = lambda: None
+        done = threading.Event()
+        thread = threading.Thread(target=self._serve, args=(done,))
+        thread.daemon = True
+        thread.start()
+
+        sim = None
+        error = None
+        sys.stdout = StringIO()
+        try:
+            sim = page.create_simulator(self.backend)
+        except Exception:
+            line = nengo_gui.exec_env.determine_line_number()
+            error = dict(trace=traceback.format_exc(), line=line)
+        stdout = sys.stdout.getvalue()
+        sys.stdout = sys.__stdout__
+        self._send(("built", error, stdout))
+
+        if sim is not None:
+            page._sim = sim
+            page.call_hook("on_start", sim)
+            while page.sim is not None:
+                try:
+                    page.step()
+                except Exception:
+                    line = nengo_gui.exec_env.determine_line_number()
+                    error = dict(trace=traceback.format_exc(), line=line)
+                    self._send(("error", error))
+                    break
+
+        done.wait()
+        if sim is not None:
+            page.call_hook("on_close", sim)
+            sim.close()
+
+    def _serve(self, done):
+        """Child process thread handling messages and sending data."""
+        writer = RingWriter(self.ring)
+        sim_control = self.sim_control
+        last_time = None
+        while True:
+            try:
+                while self.conn.poll(self.update_interval):
+                    msg = self.conn.recv()
+                    if msg[0] == "close":
+                        break
+                    self._handle(msg)
+                else:
+                    msg = None
+            except (EOFError, OSError, IOError):
+                msg = ("close",)
+            if msg is not None:
+                # also releases the SimControl node if it is paused
+                self.page._sim = None
+                done.set()
+                return
+
+            writer.written = False
+            for i, component in enumerate(self.components):
+                writer.channel = i
+                try:
+                    component.update_client(writer)
+                except Exception:
+                    logger.exception("Error updating %s.", component)
+            if writer.written or sim_control.time != last_time:
+                last_time = sim_control.time
+                self._send(
+                    (
+                        "data",
+                        sim_control.time,
+                        sim_control.rate,
+                        sim_control.rate_proportion,
+                        self.page.count_dropped(),
+                    )
+                )
+
+    def _handle(self, msg):
+        if msg[0] == "message":
+            try:
+                self.components[msg[1]].message(msg[2])
+            except Exception:
+                logger.exception("Error processing: %r", msg[2])
+        elif msg[0] == "control":
+            paused, target_rate, target_scale = msg[1:]
+            sim_control = self.sim_control
+            sim_control.target_rate = target_rate
+            sim_control.target_scale = target_scale
+            if paused != sim_control.paused:
+                sim_control.paused = paused
+                if self.page.sim is not None:
+                    self.page.call_hook(
+                        "on_pause" if paused else "on_continue", self.page.sim
+                    )
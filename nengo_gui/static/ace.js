@@ -278,8 +278,13 @@ Nengo.Ace.prototype.redraw = function () {
 
 
 Nengo.Ace.prototype.completer = {
+    // identifies the requests of this editor, so that the server can
+    // cancel requests superseded by newer ones
+    session: Math.random().toString(36).substr(2),
+
     getCompletions: function (editor, session, pos, prefix, callback) {
         $.post('complete', {
+            session: this.session,
             filename: $('#filename')[0].innerHTML,
             row: pos.row,
             col: pos.column,
@@ -310,3 +310,23 @@ Nengo.Component.prototype.get_screen_width = function () {
 Nengo.Component.prototype.get_screen_height = function () {
     return this.viewport.h * this.h * this.viewport.scale * 2
 };
+
+/**
+ * Tell the server how many pixels are shown per simulated second, so that
+ * it does not send more time series data than can be displayed.
+ */
+Nengo.Component.prototype.send_resolution = function(width) {
+    var self = this;
+    var resolution = Math.round(width / this.sim.time_slider.shown_time);
+    if (resolution === this.resolution) {
+        return;
+    }
+    if (this.ws.readyState === WebSocket.CONNECTING) {
+        this.ws.addEventListener('open', function() {
+            self.send_resolution(self.width);
+        });
+        return;
+    }
+    this.resolution = resolution;
+    this.ws.send('resolution:' + resolution);
+};
@@ -64,11 +64,11 @@ Nengo.Image.prototype.on_message = function(event) {
     var data = new Uint8Array(event.data);
     var msg_size = this.n_pixels + 4;
 
-    for (var i = 0; i < data.length; i += msg_size) {
+    for (var i = 0; i + msg_size <= data.length; i += msg_size) {
         var time_data = new Float32Array(event.data.slice(i, i + 4));
-        data = Array.prototype.slice.call(data, i + 3, i + msg_size);
-        data[0] = time_data[0];
-        this.data_store.push(data);
+        var row = Array.prototype.slice.call(data, i + 3, i + msg_size);
+        row[0] = time_data[0];
+        this.data_store.push(row);
     }
     this.schedule_update();
 }
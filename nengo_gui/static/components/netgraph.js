@@ -379,8 +379,16 @@ Nengo.NetGraph.prototype.generate_menu = function() {
 
 /** Event handler for received WebSocket messages */
 Nengo.NetGraph.prototype.on_message = function(event) {
-    data = JSON.parse(event.data);
-    if (data.type === 'net') {
+    this.handle_message(JSON.parse(event.data));
+};
+
+/** Apply a message from the server; an update contains several messages */
+Nengo.NetGraph.prototype.handle_message = function(data) {
+    if (data.type === 'update') {
+        for (var i = 0; i < data.messages.length; i++) {
+            this.handle_message(data.messages[i]);
+        }
+    } else if (data.type === 'net') {
         this.create_object(data);
     } else if (data.type === 'ens') {
         this.create_object(data);
@@ -163,6 +163,23 @@ Nengo.Pointer.prototype.on_message = function(event) {
     this.schedule_update();
 }
 
+/**
+ * Return the matches at the end of the shown time range.
+ *
+ * The server only sends the matches when they change, so these are the
+ * last ones received before that time.
+ */
+Nengo.Pointer.prototype.get_shown_matches = function() {
+    var t2 = this.sim.time_slider.first_shown_time +
+             this.sim.time_slider.shown_time;
+    var times = this.data_store.times;
+    var index = times.length - 1;
+    while (index > 0 && times[index] > t2) {
+        index -= 1;
+    }
+    return this.data_store.data[0][index];
+};
+
 /**
  * Redraw the lines and axis due to changed data
  */
@@ -170,7 +187,7 @@ Nengo.Pointer.prototype.update = function() {
     /** let the data store clear out old values */
     this.data_store.update();
 
-    var data = this.data_store.get_last_data()[0];
+    var data = this.get_shown_matches();
 
     while(this.pdiv.firstChild) {
         this.pdiv.removeChild(this.pdiv.firstChild);
@@ -11,6 +11,10 @@ Nengo.Progress.prototype.on_message = function(event) {
 
     if (data.finished) {
         text = data.name_after + ' finished in ' + data.elapsed_time + '.';
+        if (data.cache) {
+            text += ' Build cache: ' + data.cache.hits + ' hits, ' +
+                data.cache.misses + ' misses, ' + data.cache.size + '.';
+        }
     } else if (data.max_steps === null) {
         text = data.name_during + '&hellip; duration: ' + data.elapsed_time;
     } else {
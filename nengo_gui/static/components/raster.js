@@ -107,6 +107,10 @@ Nengo.Raster = function(parent, sim, args) {
 Nengo.Raster.prototype = Object.create(Nengo.Component.prototype);
 Nengo.Raster.prototype.constructor = Nengo.Raster;
 
+/** spike encodings, see nengo_gui/components/raster.py */
+Nengo.Raster.ENCODING_DELTA_VARINT = 0;
+Nengo.Raster.ENCODING_BITSET = 1;
+
 /**
  * Receive new line data from the server
  */
@@ -148,14 +152,62 @@ Nengo.Raster.prototype.init_sound = function() {
     }
 }
 
+/**
+ * Receive new spike data from the server
+ *
+ * Each message holds several time steps: a header with the encoding, the
+ * number of neurons and the number of steps, the float32 time stamps of
+ * all steps and then the spiking neurons of each step, either as a bitset
+ * or as a count followed by delta encoded indices, all as varints.
+ */
 Nengo.Raster.prototype.on_message = function(event) {
-    var time = new Float32Array(event.data, 0, 1);
-    var data = new Int16Array(event.data, 4);
-    this.data_store.push([time[0], data]);
+    var header = new DataView(event.data, 0, 12);
+    var encoding = header.getUint8(0);
+    var n_neurons = header.getUint32(4, true);
+    var n_steps = header.getUint32(8, true);
+    var times = new Float32Array(event.data, 12, n_steps);
+    var bytes = new Uint8Array(event.data, 12 + 4 * n_steps);
+    var offset = 0;
+
+    var read_varint = function() {
+        var value = 0;
+        var scale = 1;
+        var b;
+        do {
+            b = bytes[offset++];
+            value += (b & 0x7f) * scale;
+            scale *= 128;
+        } while (b & 0x80);
+        return value;
+    };
+
+    var sound = false;
+    for (var i = 0; i < n_steps; i++) {
+        var data = [];
+        if (encoding === Nengo.Raster.ENCODING_BITSET) {
+            for (var j = 0; j < n_neurons; j += 8) {
+                var b = bytes[offset++];
+                for (var k = j; b !== 0; k++, b >>= 1) {
+                    if (b & 1) {
+                        data.push(k);
+                    }
+                }
+            }
+        } else {
+            var count = read_varint();
+            var index = -1;
+            for (var j = 0; j < count; j++) {
+                index += read_varint() + 1;
+                data.push(index);
+            }
+        }
+        this.data_store.push([times[i], data]);
+        sound = sound || data.indexOf(this.sound_index - 1) > -1;
+    }
     this.schedule_update();
 
     // make a sound if the neuron spiked
-    if ($.inArray(this.sound_index-1, data) > -1) {
+    if (sound) {
         if (!Nengo.audio_ctx) {
             this.init_sound();
         }
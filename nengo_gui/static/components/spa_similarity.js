@@ -33,6 +33,9 @@ Nengo.SpaSimilarity = function(parent, sim, args) {
 Nengo.SpaSimilarity.prototype = Object.create(Nengo.Value.prototype);
 Nengo.SpaSimilarity.prototype.constructor = Nengo.SpaSimilarity;
 
+/** the server does not decimate similarity data */
+Nengo.SpaSimilarity.prototype.send_resolution = function(width) {};
+
 
 Nengo.SpaSimilarity.prototype.reset_legend_and_data = function(new_labels){
     // clear the database and create a new one since the dimensions have changed
@@ -114,16 +117,61 @@ Nengo.SpaSimilarity.prototype.update_legend = function(new_labels){
             .attr("class", "val");
 };
 
-/* there are three types of messages that can be received:
+/** the float values of all float16 bit patterns, created when first used */
+Nengo.SpaSimilarity.float16_values = null;
+
+Nengo.SpaSimilarity.get_float16_values = function() {
+    if (Nengo.SpaSimilarity.float16_values === null) {
+        var values = new Float32Array(65536);
+        for (var h = 0; h < 65536; h++) {
+            var sign = (h & 0x8000) ? -1 : 1;
+            var exponent = (h >> 10) & 0x1f;
+            var fraction = h & 0x3ff;
+            if (exponent === 0) {
+                values[h] = sign * fraction * Math.pow(2, -24);
+            } else if (exponent === 31) {
+                values[h] = fraction ? NaN : sign * Infinity;
+            } else {
+                values[h] = sign * (1 + fraction / 1024) * Math.pow(2, exponent - 15);
+            }
+        }
+        Nengo.SpaSimilarity.float16_values = values;
+    }
+    return Nengo.SpaSimilarity.float16_values;
+};
+
+/* there are three types of text messages that can be received:
     - a legend needs to be updated
-    - the data has been updated
-    - show_pairs has been toggled
-    this calls the method associated to handling the type of message
+    - show_pairs has been toggled (or the legend was reset)
+    - data has been sent by an older server
+    this calls the method associated to handling the type of message.
+
+   The similarities are sent in binary frames with a header of the
+   number of similarities per time step and the number of time steps,
+   followed by the float32 time stamps and the float16 similarities.
 */
 Nengo.SpaSimilarity.prototype.on_message = function(event) {
-    var data = JSON.parse(event.data);
-    var func_name = data.shift();
-    this[func_name](data);
+    if (typeof event.data === 'string') {
+        var data = JSON.parse(event.data);
+        var func_name = data.shift();
+        this[func_name](data);
+        return;
+    }
+
+    var header = new DataView(event.data, 0, 8);
+    var n_lines = header.getUint32(0, true);
+    var n_steps = header.getUint32(4, true);
+    var times = new Float32Array(event.data, 8, n_steps);
+    var similarities = new Uint16Array(
+        event.data, 8 + 4 * n_steps, n_steps * n_lines);
+    var float16_values = Nengo.SpaSimilarity.get_float16_values();
+    for (var i = 0; i < n_steps; i++) {
+        var row = [times[i]];
+        for (var j = i * n_lines; j < (i + 1) * n_lines; j++) {
+            row.push(float16_values[similarities[j]]);
+        }
+        this.data_msg(row);
+    }
 };
 
 /**
@@ -29,8 +29,10 @@ Nengo.Value = function(parent, sim, args) {
     this.axes2d = new Nengo.TimeAxes(this.div, args);
 
     /** call schedule_update whenever the time is adjusted in the SimControl */
-    this.sim.div.addEventListener('adjust_time',
-            function(e) {self.schedule_update();}, false);
+    this.sim.div.addEventListener('adjust_time', function(e) {
+        self.send_resolution(self.width);
+        self.schedule_update();
+    }, false);
 
     /** call reset whenever the simulation is reset */
     this.sim.div.addEventListener('sim_reset',
@@ -182,16 +184,15 @@ Nengo.Value.prototype.update_crosshair = function(mouse) {
  */
 Nengo.Value.prototype.on_message = function(event) {
     var data = new Float32Array(event.data);
-    data = Array.prototype.slice.call(data);
     var size = this.n_lines + 1;
     /** since multiple data packets can be sent with a single event,
     make sure to process all the packets */
-    while (data.length >= size) {
-        this.data_store.push(data.slice(0, size));
-        data = data.slice(size);
+    var i = 0;
+    for (; i + size <= data.length; i += size) {
+        this.data_store.push(Array.prototype.slice.call(data, i, i + size));
     }
-    if (data.length > 0) {
-        console.log('extra data: ' + data.length);
+    if (i < data.length) {
+        console.log('extra data: ' + (data.length - i));
     }
     this.schedule_update();
 };
@@ -243,6 +244,7 @@ Nengo.Value.prototype.on_resize = function(width, height) {
     this.height = height;
     this.div.style.width = width;
     this.div.style.height= height;
+    this.send_resolution(width);
 };
 
 Nengo.Value.prototype.generate_menu = function() {
@@ -32,8 +32,10 @@ Nengo.XYValue = function(parent, sim, args) {
     this.index_y = args.index_y;
 
     /** call schedule_update whenever the time is adjusted in the SimControl */
-    this.sim.div.addEventListener('adjust_time',
-            function(e) {self.schedule_update();}, false);
+    this.sim.div.addEventListener('adjust_time', function(e) {
+        self.send_resolution(self.width);
+        self.schedule_update();
+    }, false);
 
     /** call reset whenever the simulation is reset */
     this.sim.div.addEventListener('sim_reset',
@@ -70,7 +72,12 @@ Nengo.XYValue.prototype.constructor = Nengo.Value;
  */
 Nengo.XYValue.prototype.on_message = function(event) {
     var data = new Float32Array(event.data);
-    this.data_store.push(data);
+    var size = this.n_lines + 1;
+    /** since multiple data packets can be sent with a single event,
+    make sure to process all the packets */
+    for (var i = 0; i + size <= data.length; i += size) {
+        this.data_store.push(data.subarray(i, i + size));
+    }
     this.schedule_update();
 }
 
@@ -140,6 +147,7 @@ Nengo.XYValue.prototype.on_resize = function(width, height) {
     this.div.style.width = width;
     this.div.style.height = height;
     this.recent_circle.attr("r", this.get_circle_radius());
+    this.send_resolution(width);
 };
 
 Nengo.XYValue.prototype.get_circle_radius = function() {
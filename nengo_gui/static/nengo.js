@@ -30,8 +30,23 @@ Nengo.set_transform = function(element, x, y) {
 
 /**
  * Create a WebSocket connection to the given id
+ *
+ * If Nengo.page_socket is set, a channel on the WebSocket shared by all
+ * components of the page is returned instead.
  */
 Nengo.create_websocket = function(uid) {
+    if (Nengo.page_socket !== undefined) {
+        return Nengo.page_socket.open_channel(uid);
+    }
+    var ws = new WebSocket(Nengo.websocket_url('viz_component?uid=' + uid));
+    ws.binaryType = "arraybuffer";
+    return ws;
+};
+
+/**
+ * Return the WebSocket URL for the given resource
+ */
+Nengo.websocket_url = function(resource) {
     var parser = document.createElement('a');
     parser.href = document.URL;
     if (window.location.protocol === 'https:') {
@@ -39,11 +54,96 @@ Nengo.create_websocket = function(uid) {
     } else{
         var ws_proto = 'ws:';
     }
-    var ws_url = ws_proto + '//' + parser.host + window.location.pathname +
-        'viz_component?uid=' + uid;
-    var ws = new WebSocket(ws_url);
-    ws.binaryType = "arraybuffer";
-    return ws;
+    return ws_proto + '//' + parser.host + window.location.pathname + resource;
+};
+
+/**
+ * A single WebSocket shared by all components of the page
+ *
+ * Each component gets a channel (see Nengo.PageSocketChannel) that behaves
+ * like a WebSocket. The server batches all messages into binary frames of
+ * records, each consisting of the channel number (uint16), the opcode
+ * (uint8, 1 for text and 2 for binary) and the payload length (uint32),
+ * followed by the payload.
+ */
+Nengo.PageSocket = function() {
+    var self = this;
+    this.channels = [];
+    this.pending = [];
+    this.decoder = new TextDecoder('utf-8');
+
+    this.ws = new WebSocket(Nengo.websocket_url('viz_component?page=1'));
+    this.ws.binaryType = "arraybuffer";
+    this.ws.onopen = function(event) {
+        for (var i = 0; i < self.pending.length; i++) {
+            self.ws.send(self.pending[i]);
+        }
+        self.pending = [];
+    };
+    this.ws.onmessage = function(event) {self.on_message(event);};
+    this.ws.onclose = function(event) {
+        for (var i = 0; i < self.channels.length; i++) {
+            var channel = self.channels[i];
+            if (channel !== undefined && channel.onclose) {
+                channel.onclose(event);
+            }
+        }
+    };
+};
+
+Nengo.PageSocket.prototype.send = function(msg) {
+    if (this.ws.readyState === WebSocket.OPEN) {
+        this.ws.send(msg);
+    } else {
+        this.pending.push(msg);
+    }
+};
+
+Nengo.PageSocket.prototype.open_channel = function(uid) {
+    var channel = new Nengo.PageSocketChannel(this, this.channels.length);
+    this.channels.push(channel);
+    this.send('open:' + channel.id + ':' + uid);
+    return channel;
+};
+
+Nengo.PageSocket.prototype.on_message = function(event) {
+    var view = new DataView(event.data);
+    var offset = 0;
+    while (offset < view.byteLength) {
+        var id = view.getUint16(offset, true);
+        var opcode = view.getUint8(offset + 2);
+        var length = view.getUint32(offset + 3, true);
+        offset += 7;
+        var data = event.data.slice(offset, offset + length);
+        offset += length;
+        if (opcode === 1) {
+            data = this.decoder.decode(data);
+        }
+        var channel = this.channels[id];
+        if (channel !== undefined && channel.onmessage) {
+            channel.onmessage({data: data});
+        }
+    }
+};
+
+/**
+ * A WebSocket-like channel to a single component on a Nengo.PageSocket
+ */
+Nengo.PageSocketChannel = function(socket, id) {
+    this.socket = socket;
+    this.id = id;
+    this.binaryType = "arraybuffer";
+    this.onmessage = null;
+    this.onclose = null;
+};
+
+Nengo.PageSocketChannel.prototype.send = function(msg) {
+    this.socket.send(this.id + ':' + msg);
+};
+
+Nengo.PageSocketChannel.prototype.close = function() {
+    this.socket.send('close:' + this.id);
+    this.socket.channels[this.id] = undefined;
 };
 
 /**
@@ -29,6 +29,8 @@ Nengo.SimControl = function(div, args) {
     this.rate = 0.0;
     /** whether the simulation is paused */
     this.paused = true;
+    /** number of data items dropped because the browser fell behind */
+    this.dropped = 0;
     /** do we have an update() call scheduled? */
     this.pending_update = false;
 
@@ -119,6 +121,10 @@ Nengo.SimControl.prototype.on_message = function(event) {
         else if (event.data.substring(0, 5) === 'sims:') {
             this.simulator_options = event.data.substring(5, event.data.length);
         }
+        else if (event.data.substring(0, 8) === 'dropped:') {
+            this.dropped = parseInt(event.data.substring(8));
+            this.schedule_update();
+        }
     }
     else {
         var data = new Float32Array(event.data);
@@ -217,6 +223,12 @@ Nengo.SimControl.prototype.update = function() {
 
     this.ticks_tr.innerHTML = '<th>Time</th><td>' + this.time.toFixed(3) + '</td>';
     this.rate_tr.innerHTML = '<th>Speed</th><td>' + this.rate.toFixed(2) + 'x</td>';
+    if (this.dropped > 0) {
+        this.rate_tr.title = this.dropped + ' data points were not shown ' +
+            'because the browser could not keep up with the simulation.';
+    } else {
+        this.rate_tr.title = '';
+    }
 
     this.time_slider.update_times(this.time);
 };
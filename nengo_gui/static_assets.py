@@ -0,0 +1,174 @@
+"""In-memory cache of the static files served to the browser.
+
+All files below ``nengo_gui/static`` are read once when the server starts.
+Each file is kept together with a hash of its content, which serves as
+``ETag`` and as version in the URLs of the main page, and with compressed
+variants for browsers that accept them. Browsers revalidate unversioned
+URLs with a conditional GET answered by ``304 Not Modified``; versioned
+URLs are cached for a year, because a changed file gets a new URL.
+
+Brotli variants are only created if the ``brotli`` package is installed.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import zlib
+from email.utils import formatdate, mktime_tz, parsedate_tz
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import nengo_gui
+
+# a compressed variant is only kept if it is smaller than this fraction
+max_compressed_ratio = 0.9
+
+CACHE_FOREVER = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def gzip_compress(data):
+    # wbits=31 writes a gzip header without timestamp, so the compressed
+    # data only depends on the content
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def brotli_compress(data):
+    return brotli.compress(data)
+
+
+ENCODINGS = [("gzip", gzip_compress)]
+if brotli is not None:
+    ENCODINGS.insert(0, ("br", brotli_compress))
+
+
+def accepted_encodings(header):
+    """The content codings accepted according to an Accept-Encoding header."""
+    accepted = set()
+    for item in (header or "").split(","):
+        parts = item.strip().split(";")
+        coding = parts[0].strip().lower()
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+class StaticAsset(object):
+    """A static file with its hash and compressed variants."""
+
+    __slots__ = ["path", "mimetype", "mtime", "version", "variants"]
+
+    def __init__(self, path, data, mtime):
+        self.path = path
+        mimetype, _ = mimetypes.guess_type(path)
+        self.mimetype = mimetype or "application/octet-stream"
+        self.mtime = int(mtime)
+        self.version = hashlib.sha1(data).hexdigest()[:16]
+        self.variants = {None: data}
+        for encoding, compress in ENCODINGS:
+            compressed = compress(data)
+            if len(compressed) < max_compressed_ratio * len(data):
+                self.variants[encoding] = compressed
+
+    @property
+    def last_modified(self):
+        return formatdate(self.mtime, usegmt=True)
+
+    def etag(self, encoding=None):
+        if encoding is None:
+            return '"%s"' % self.version
+        return '"%s-%s"' % (self.version, encoding)
+
+    def choose_encoding(self, accept_encoding):
+        """The best variant for the given Accept-Encoding header."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return None
+
+    def is_not_modified(self, if_none_match, if_modified_since):
+        """Whether a conditional GET can be answered with 304."""
+        if if_none_match is not None:
+            # If-Modified-Since is ignored if If-None-Match is present
+            etags = [e.strip() for e in if_none_match.split(",")]
+            if "*" in etags:
+                return True
+            own = set(self.etag(encoding) for encoding in self.variants)
+            return any((e[2:] if e.startswith("W/") else e) in own for e in etags)
+        if if_modified_since is not None:
+            try:
+                since = mktime_tz(parsedate_tz(if_modified_since))
+            except (TypeError, ValueError, OverflowError):
+                return False
+            return self.mtime <= since
+        return False
+
+
+class StaticAssets(object):
+    """All static files of the package, keyed by their path.
+
+    Paths are relative to the package, e.g. ``static/nengo.js``. If a file
+    is changed on disk while the server is running (i.e. during
+    development), it is read again on the next request.
+    """
+
+    url_pattern = re.compile(r'((?:href|src)="(static/[^"?#]+))"')
+
+    def __init__(self, root=None):
+        if root is None:
+            root = nengo_gui.__path__[0]
+        self.root = root
+        self.assets = {}
+        for dirpath, _, filenames in os.walk(os.path.join(root, "static")):
+            for filename in filenames:
+                path = os.path.relpath(os.path.join(dirpath, filename), root)
+                self.load(path)
+
+    def load(self, path):
+        fullpath = os.path.join(self.root, path)
+        mtime = os.path.getmtime(fullpath)
+        with open(fullpath, "rb") as f:
+            asset = StaticAsset(path, f.read(), mtime)
+        self.assets[path] = asset
+        return asset
+
+    def __len__(self):
+        return len(self.assets)
+
+    def get(self, path):
+        """Return the asset for a path, or None if there is no such file."""
+        path = os.path.normpath(path)
+        asset = self.assets.get(path, None)
+        if asset is None:
+            return None
+        try:
+            if int(os.path.getmtime(os.path.join(self.root, path))) != asset.mtime:
+                asset = self.load(path)
+        except (IOError, OSError):
+            pass
+        return asset
+
+    def versioned(self, html):
+        """Add the version of each asset to its URLs in a page."""
+
+        def add_version(match):
+            asset = self.get(match.group(2))
+            if asset is None:
+                return match.group(0)
+            return '%s?v=%s"' % (match.group(1), asset.version)
+
+        return self.url_pattern.sub(add_version, html)
@@ -0,0 +1,114 @@
+import os
+
+import nengo
+import numpy as np
+from nengo_gui.build_cache import BuildCache, build, warm
+from nengo_gui.compat import StringIO
+
+
+def make_model(function=np.square):
+    with nengo.Network(seed=0) as model:
+        stim = nengo.Node(np.sin)
+        a = nengo.Ensemble(100, 16, seed=1)
+        b = nengo.Ensemble(100, 1, seed=2)
+        nengo.Connection(stim, a[0], seed=3)
+        nengo.Connection(a[0], b, function=function, seed=4)
+    return model
+
+
+def build_sim(model, cache=None):
+    if cache is None:
+        return nengo.Simulator(model, progress_bar=False)
+    with cache.cached_samples(model):
+        return nengo.Simulator(
+            model,
+            model=nengo.builder.Model(decoder_cache=cache),
+            progress_bar=False,
+        )
+
+
+def assert_same_build(sim, reference):
+    for ens, ref in zip(
+        sim.model.toplevel.all_ensembles, reference.model.toplevel.all_ensembles
+    ):
+        for attr in ("eval_points", "encoders", "gain", "bias", "max_rates"):
+            assert np.array_equal(
+                getattr(sim.data[ens], attr), getattr(reference.data[ref], attr)
+            )
+    for conn, ref in zip(
+        sim.model.toplevel.all_connections, reference.model.toplevel.all_connections
+    ):
+        assert np.array_equal(sim.data[conn].weights, reference.data[ref].weights)
+
+
+def test_build_cache_reuses_results(tmpdir):
+    cache = BuildCache(str(tmpdir.join("model.py.cache")))
+    reference = build_sim(make_model())
+
+    with build_sim(make_model(), cache) as sim:
+        assert_same_build(sim, reference)
+    assert cache.hits == 0
+    n_entries = len(cache.get_files())
+    assert n_entries == 3  # eval points, encoders and one decoder
+
+    with build_sim(make_model(), cache) as sim:
+        assert_same_build(sim, reference)
+    assert cache.hits == n_entries
+
+    # only the decoders of the changed connection are solved again
+    cache.hits = cache.misses = 0
+    with build_sim(make_model(function=np.sin), cache) as sim:
+        assert_same_build(sim, build_sim(make_model(function=np.sin)))
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_build_cache_restores_distributions(tmpdir):
+    model = make_model()
+    ens = model.all_ensembles[0]
+    eval_points, encoders = ens.eval_points, ens.encoders
+    with build_sim(model, BuildCache(str(tmpdir))):
+        pass
+    assert ens.eval_points is eval_points
+    assert ens.encoders is encoders
+
+
+def test_build_cache_shrink_removes_least_recently_used(tmpdir):
+    cache = BuildCache(str(tmpdir))
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, np.zeros(1000))
+        os.utime(cache._path(key), (i, i))
+    assert cache.get("a") is not None  # marks it as recently used
+    size = os.path.getsize(cache._path("a"))
+
+    cache.shrink(limit=2 * size)
+    assert sorted(os.path.basename(p) for p in cache.get_files()) == [
+        "a.pkl",
+        "c.pkl",
+    ]
+
+
+def test_warm(tmpdir):
+    tmpdir.join("model.py").write(
+        "import nengo\n"
+        "model = nengo.Network()\n"
+        "with model:\n"
+        "    a = nengo.Ensemble(100, 16)\n"
+        "    b = nengo.Ensemble(50, 1)\n"
+        "    nengo.Connection(a[0], b)\n"
+    )
+    tmpdir.join("helper.py").write("x = 1\n")
+    tmpdir.join("broken.py").write("model = nengo.Network(\n")
+    stream = StringIO()
+    assert warm(str(tmpdir), stream=stream) == 1
+    assert "helper.py: skipped" in stream.getvalue()
+    assert "broken.py: skipped" in stream.getvalue()
+
+    # executing the file again creates new objects with the same seeds
+    code_locals = {}
+    exec(tmpdir.join("model.py").read(), code_locals)
+    model = code_locals["model"]
+    cache = BuildCache(str(tmpdir.join("model.py.cache")))
+    build(model, cache, str(tmpdir.join("model.py")))
+    assert cache.hits == 3
+    assert cache.misses == 0
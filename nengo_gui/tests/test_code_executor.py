@@ -0,0 +1,131 @@
+import threading
+import time
+
+import nengo
+
+from nengo_gui.code_executor import CodeExecutor
+from nengo_gui.exec_env import ExecutionEnvironment, simulator_class
+from nengo_gui.page import Execution
+
+
+class Executions(object):
+    """Records the executed code, blocking while ``block`` is set."""
+
+    def __init__(self):
+        self.code = []
+        self.started = threading.Event()
+        self.block = threading.Event()
+        self.unblock = threading.Event()
+
+    def __call__(self, code):
+        self.code.append(code)
+        self.started.set()
+        if self.block.is_set():
+            self.unblock.wait(5.0)
+        error = dict(trace="SyntaxError", line=1) if "error" in code else None
+        return Execution(code, None, {}, error, "", {})
+
+
+def wait_for_result(executor, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        result = executor.pop_result()
+        if result is not None:
+            return result
+        time.sleep(0.005)
+    return None
+
+
+def test_debounce_and_skip_current():
+    executions = Executions()
+    executor = CodeExecutor(executions, delay=0.1)
+    executor.set_current("a")
+    try:
+        for code in ["ab", "abc", "abcd"]:
+            executor.submit(code)
+            time.sleep(0.02)
+        assert wait_for_result(executor).code == "abcd"
+        assert executions.code == ["abcd"]
+
+        # back to the code in use: nothing to execute
+        executor.submit("ab")
+        executor.submit("abcd")
+        time.sleep(0.2)
+        assert executor.pop_result() is None
+        assert executions.code == ["abcd"]
+        assert executor.n_skipped == 1
+    finally:
+        executor.close()
+
+
+def test_abandon_superseded():
+    executions = Executions()
+    executions.block.set()
+    executor = CodeExecutor(executions, delay=0)
+    try:
+        executor.submit("slow")
+        assert executions.started.wait(5.0)
+        executor.submit("fast")
+        executions.block.clear()
+        executions.unblock.set()
+        assert wait_for_result(executor).code == "fast"
+        assert executions.code == ["slow", "fast"]
+        assert executor.n_abandoned == 1
+    finally:
+        executor.close()
+
+
+def test_cache_failed():
+    executions = Executions()
+    executor = CodeExecutor(executions, delay=0)
+    try:
+        for code in ["error", "ok", "error"]:
+            executor.submit(code)
+            result = wait_for_result(executor)
+            assert result.code == code
+        assert executions.code == ["error", "ok"]
+    finally:
+        executor.close()
+
+
+def test_build_during_execution():
+    with nengo.Network() as model:
+        nengo.Ensemble(10, 1)
+    executing = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def execute():
+        exec_env = ExecutionEnvironment(None)
+        with exec_env:
+            print("executing")
+            results["simulator"] = simulator_class(nengo)
+            executing.set()
+            release.wait(5.0)
+        results["execute"] = exec_env.stdout.getvalue()
+
+    def build():
+        exec_env = ExecutionEnvironment(None, allow_sim=True)
+        try:
+            with exec_env:
+                print("building")
+                nengo.Simulator(model, progress_bar=False).close()
+        except Exception as e:
+            results["error"] = e
+        results["build"] = exec_env.stdout.getvalue()
+
+    execution = threading.Thread(target=execute)
+    execution.start()
+    assert executing.wait(5.0)
+    # the build neither waits for the execution nor sees its Simulators
+    building = threading.Thread(target=build)
+    building.start()
+    building.join(30.0)
+    release.set()
+    execution.join(5.0)
+
+    assert not building.is_alive()
+    assert "error" not in results
+    assert results["execute"] == "executing\n"
+    assert results["build"] == "building\n"
+    assert results["simulator"] is nengo.Simulator
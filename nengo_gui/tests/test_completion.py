@@ -0,0 +1,56 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from nengo_gui import completion
+from nengo_gui.completion import CompletionService, Completer
+
+pytest.importorskip("jedi")
+
+CODE = "import os\nos.pa"
+
+
+def test_completer_cache():
+    completer = Completer(max_results=2)
+    result = completer.complete(CODE, 2, 5, "model.py")
+    assert ("path", "module") in result
+    assert completer.complete(CODE, 2, 5, "model.py") is result
+
+    completer.complete(CODE, 2, 4, "model.py")
+    completer.complete(CODE, 2, 3, "model.py")
+    assert len(completer.results) == 2
+    assert completer.complete(CODE, 2, 5, "model.py") is not result
+
+
+def test_child_skips_cancelled_and_superseded():
+    conn, child_conn = multiprocessing.Pipe()
+    for msg in [
+        ("complete", 0, "editor", CODE, 2, 5, None),
+        ("complete", 1, None, CODE, 2, 5, None),
+        ("cancel", 1),
+        ("cancel", 2),  # arrives before its request
+        ("complete", 2, None, CODE, 2, 5, None),
+        ("complete", 3, "editor", CODE, 2, 4, None),
+    ]:
+        conn.send(msg)
+    thread = threading.Thread(target=completion._child_main, args=(child_conn, ""))
+    thread.start()
+
+    request_id, result = conn.recv()
+    assert request_id == 3
+    assert ("path", "module") in result
+    conn.send(("close",))
+    thread.join()
+    assert not conn.poll()
+
+
+def test_service():
+    service = CompletionService(timeout=60.0)
+    service.start()
+    try:
+        assert ("path", "module") in service.complete(CODE, 2, 5, session="editor")
+        assert service.n_cancelled == 0
+    finally:
+        service.close()
+    assert service.complete(CODE, 2, 5) == []
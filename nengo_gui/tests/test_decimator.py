@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from nengo_gui.components.decimator import Decimator
+from nengo_gui.components.ring_buffer import RingBuffer
+
+
+def process(decimator, buf):
+    chunks = decimator.process(buf.read())
+    data = b"".join(bytes(chunk) for chunk in chunks)
+    return np.frombuffer(data, dtype=buf.row_dtype)
+
+
+def test_passthrough_without_rate():
+    buf = RingBuffer(1)
+    decimator = Decimator(buf.row_dtype)
+    for i in range(10):
+        buf.append(i * 0.001, [i])
+    rows = process(decimator, buf)
+    assert len(rows) == 10
+    assert np.all(rows["x"][:, 0] == np.arange(10))
+
+
+def test_minmax_keeps_spikes():
+    buf = RingBuffer(2, capacity=2048)
+    decimator = Decimator(buf.row_dtype, max_rate=20)
+    t = np.arange(1, 1001) * 0.001
+    x = np.zeros((1000, 2))
+    x[333, 0] = 5.0  # a single step spike
+    x[600, 1] = -3.0
+    x[610, 1] = 3.0
+    buf.extend(t, x)
+    rows = process(decimator, buf)
+
+    # 10 buckets of 0.1 s, the row at t=1 starts a bucket that is held back
+    # until it is complete
+    assert len(rows) == 20
+    assert np.all(np.diff(rows["t"]) >= 0)
+    assert rows["x"][:, 0].max() == 5.0
+    assert rows["x"][:, 1].min() == -3.0
+    assert rows["x"][:, 1].max() == 3.0
+
+    # extremes are sent in the order they occurred
+    i_low = np.flatnonzero(rows["x"][:, 1] == -3.0)[0]
+    i_high = np.flatnonzero(rows["x"][:, 1] == 3.0)[0]
+    assert i_low < i_high
+
+    # the held back rows are sent once the next bucket starts
+    buf.append(1.1, [0, 0])
+    assert np.allclose(process(decimator, buf)["t"], [1.0])
+
+
+def test_last_mode():
+    buf = RingBuffer(1)
+    decimator = Decimator(buf.row_dtype, mode="last", max_rate=10)
+    t = np.arange(1, 501) * 0.001
+    buf.extend(t, t[:, None])
+    rows = process(decimator, buf)
+    assert np.allclose(rows["t"], rows["x"][:, 0])
+    assert np.allclose(rows["t"], [0.099, 0.199, 0.299, 0.399, 0.499])
+
+
+@pytest.mark.parametrize(
+    "resolution, max_rate, rate",
+    [
+        (0, 0, 0),
+        (100, 0, 200),
+        (0, 50, 50),
+        (100, 50, 50),
+        (100, 500, 200),
+    ],
+)
+def test_rate(resolution, max_rate, rate):
+    decimator = Decimator(RingBuffer(1).row_dtype, max_rate=max_rate)
+    decimator.resolution = resolution
+    assert decimator.rate == rate
+
+
+def test_sparse_buckets_are_not_duplicated():
+    buf = RingBuffer(1)
+    decimator = Decimator(buf.row_dtype, max_rate=2000)
+    t = np.arange(1, 101) * 0.01
+    buf.extend(t, t[:, None])
+    rows = process(decimator, buf)
+    assert len(rows) == 99
+    assert np.allclose(rows["t"], t[:-1])
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from nengo_gui.exec_env import ExecutionEnvironment
+from nengo_gui.file_watcher import FileWatcher
+
+
+class Changes(object):
+    def __init__(self):
+        self.paths = []
+        self.event = threading.Event()
+
+    def __call__(self, paths):
+        self.paths.append(paths)
+        self.event.set()
+
+    def wait(self, timeout=5.0):
+        changed = self.event.wait(timeout)
+        self.event.clear()
+        return changed
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watch(tmpdir, use_inotify):
+    model = str(tmpdir.join("model.py"))
+    helper = str(tmpdir.join("helper.py"))
+    other = str(tmpdir.join("other.py"))
+    for path in (model, helper, other):
+        with open(path, "w") as f:
+            f.write("a = 1\n")
+
+    watcher = FileWatcher(poll_interval=0.05, use_inotify=use_inotify)
+    changes = Changes()
+    try:
+        watch = watcher.watch([model], changes)
+        with open(other, "w") as f:
+            f.write("a = 2\n")
+        assert not changes.wait(0.3)
+
+        with open(model, "w") as f:
+            f.write("a = 2\n")
+        assert changes.wait()
+        assert changes.paths[-1] == set([model])
+
+        # files replaced by editors saving atomically
+        watch.update([model, helper])
+        with open(helper + ".tmp", "w") as f:
+            f.write("a = 22\n")
+        os.rename(helper + ".tmp", helper)
+        assert changes.wait()
+        assert changes.paths[-1] == set([helper])
+
+        watch.cancel()
+        with open(model, "w") as f:
+            f.write("a = 3\n")
+        assert not changes.wait(0.3)
+    finally:
+        watcher.close()
+
+
+def test_imported_modules(tmpdir):
+    """Modules imported next to the model are found, to be watched."""
+    model = str(tmpdir.join("model.py"))
+    tmpdir.join("watched_helper.py").write("value = 1\n")
+
+    def execute(code):
+        scope = {}
+        exec_env = ExecutionEnvironment(model)
+        with exec_env:
+            exec(code, scope)
+        return scope["value"], exec_env.imported
+
+    try:
+        value, imported = execute("from watched_helper import value")
+        assert value == 1
+        assert imported == {"watched_helper": str(tmpdir.join("watched_helper.py"))}
+
+        # modules that were imported before are not reported again
+        assert execute("from watched_helper import value")[1] == {}
+    finally:
+        sys.modules.pop("watched_helper", None)
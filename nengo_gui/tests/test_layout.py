@@ -0,0 +1,96 @@
+import itertools
+
+import nengo
+import numpy as np
+import pytest
+
+from nengo_gui.layout import Layout, LayoutCache, count_inversions
+
+
+def test_count_inversions():
+    rng = np.random.RandomState(1)
+    for _ in range(50):
+        seq = rng.randint(0, 8, size=rng.randint(0, 30))
+        expected = sum(
+            seq[i] > seq[j] for i, j in itertools.combinations(range(len(seq)), 2)
+        )
+        assert count_inversions(seq) == expected
+
+
+@pytest.mark.parametrize("engine", ["sugiyama", "layered"])
+@pytest.mark.parametrize("time_budget", [0.0, 1.0])
+def test_make_layout(engine, time_budget):
+    with nengo.Network() as model:
+        stim = nengo.Node(0)
+        chain = [nengo.Ensemble(10, 1) for _ in range(4)]
+        nengo.Connection(stim, chain[0])
+        for pre, post in zip(chain[:-1], chain[1:]):
+            nengo.Connection(pre, post)
+        nengo.Connection(stim, chain[-1])
+        nengo.Connection(chain[-1], chain[1])  # recurrent
+        nengo.Connection(chain[2], chain[2])
+        with nengo.Network() as subnet:
+            inner = nengo.Ensemble(10, 1)
+        nengo.Connection(chain[-1], inner)
+        alone = nengo.Ensemble(10, 1)
+
+    pos = Layout(model, engine=engine, time_budget=time_budget).make_layout(model)
+    assert set(pos) == set([stim, subnet, alone] + chain)
+    for p in pos.values():
+        assert 0 < p["x"] < 1 and 0 < p["y"] < 1
+        assert p["w"] > 0 and p["h"] > 0
+
+    # flows from top to bottom (left to right in the GUI)
+    ys = [pos[obj]["y"] for obj in [stim] + chain + [subnet]]
+    assert ys == sorted(ys)
+    # the unconnected ensemble is placed beside the rest
+    assert all(pos[alone]["x"] > p["x"] for obj, p in pos.items() if obj is not alone)
+
+
+def test_engine():
+    with nengo.Network() as model:
+        for _ in range(3):
+            nengo.Ensemble(10, 1)
+    layout = Layout(model, max_sugiyama_vertices=2)
+    assert len(layout.make_layout(model)) == 3
+    with pytest.raises(ValueError):
+        Layout(model, engine="fastest")
+
+
+def test_cache(tmpdir):
+    def children(net):
+        return net.ensembles + net.nodes
+
+    def make_model(label):
+        with nengo.Network() as model:
+            for _ in range(2):
+                with nengo.Network(label=label):
+                    a = nengo.Ensemble(10, 1)
+                    b = nengo.Node(size_in=1)
+                    nengo.Connection(a, b)
+                    nengo.Connection(b, a)
+        return model
+
+    filename = str(tmpdir.join("model.py.cache", "layouts.json"))
+    cache = LayoutCache(filename)
+    model = make_model("first")
+    layout = Layout(model, cache=cache)
+    first, second = [layout.make_layout(net) for net in model.networks]
+    assert (cache.hits, cache.misses) == (1, 1)
+    # the layouts of the identical networks are the same
+    expected = [first[obj] for obj in children(model.networks[0])]
+    assert [second[obj] for obj in children(model.networks[1])] == expected
+
+    # reloaded, a different label does not change the topology
+    cache.save()
+    cache = LayoutCache(filename)
+    model = make_model("second")
+    pos = Layout(model, cache=cache).make_layout(model.networks[0])
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert [pos[obj] for obj in children(model.networks[0])] == expected
+
+    # another connection changes the topology
+    with model.networks[1]:
+        nengo.Connection(model.networks[1].nodes[0], model.networks[1].nodes[0])
+    Layout(model, cache=cache).make_layout(model.networks[1])
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,62 @@
+import json
+
+from nengo_gui.metrics import NO_TIMING, Metrics
+
+
+class Component(object):
+    def gather_data(self, t, x):
+        return t + x
+
+
+def test_disabled():
+    metrics = Metrics()
+    component = Component()
+    gather_data = component.gather_data
+    metrics.time_method(component, "gather_data", "gather_data")
+    assert component.gather_data == gather_data
+    assert metrics.timer("build") is NO_TIMING
+    assert len(metrics.timers) == 0
+
+
+def test_timers():
+    metrics = Metrics(enabled=True)
+    component = Component()
+    for _ in range(2):
+        # methods are only wrapped once
+        metrics.time_method(component, "gather_data", "gather_data", component="a")
+    for i in range(3):
+        assert component.gather_data(i, 1) == i + 1
+    with metrics.timer("build", page="model.py"):
+        pass
+
+    samples = dict(
+        ((name, labels.get("component", None)), value)
+        for name, _, labels, value in metrics.samples()
+    )
+    assert samples["gather_data_seconds_count", "a"] == 3
+    assert (
+        samples["gather_data_seconds_sum", "a"]
+        >= samples["gather_data_seconds_max", "a"]
+    )
+    assert samples["build_seconds_count", None] == 1
+
+
+def test_formats():
+    metrics = Metrics(enabled=True)
+    metrics.add_collector(
+        lambda: [
+            ("sim_rate", "gauge", {"page": 'a "b".py'}, 0.5),
+            ("sim_rate", "gauge", {"page": "c.py"}, float("nan")),
+            ("pages", "gauge", {}, 2),
+        ]
+    )
+    assert metrics.to_prometheus().split("\n") == [
+        "# TYPE nengo_gui_sim_rate gauge",
+        'nengo_gui_sim_rate{page="a \\"b\\".py"} 0.5',
+        'nengo_gui_sim_rate{page="c.py"} NaN',
+        "# TYPE nengo_gui_pages gauge",
+        "nengo_gui_pages 2.0",
+        "",
+    ]
+    data = json.loads(json.dumps(metrics.to_json()))
+    assert data[2] == dict(name="nengo_gui_pages", type="gauge", labels={}, value=2)
@@ -5,6 +5,7 @@ Tests for the NetGraph class.
 import nengo
 import numpy as np
 from nengo_gui.components.netgraph import NetGraph
+from nengo_gui.namefinder import NameFinder
 
 
 def test_get_pre_post_obj():
@@ -64,3 +65,36 @@ def test_connection_inhibitory():
     assert "inhibitory" == NetGraph.connection_kind(conn_2)
     assert "inhibitory" == NetGraph.connection_kind(conn_3)
     assert "normal" == NetGraph.connection_kind(conn_4)
+
+
+def test_diff():
+    def names(code):
+        scope = {}
+        exec(code, scope)
+        return NameFinder(scope, scope["model"]).known_name
+
+    code = "\n".join(
+        [
+            "import nengo",
+            "model = nengo.Network()",
+            "with model:",
+            "    a = nengo.Ensemble(10, 1)",
+            "    b = nengo.Ensemble(10, %d)",
+            "    c = nengo.Node(%s, size_in=1)",
+            "    conn = nengo.Connection(a, c)",
+        ]
+    )
+    net_graph = NetGraph()
+    for obj, uid in names(code % (1, "None")).items():
+        if isinstance(obj, NetGraph.object_classes) and uid != "model":
+            net_graph.uids[uid] = obj
+            net_graph.fingerprints[uid] = net_graph.fingerprint(obj)
+    del net_graph.fingerprints["a"]  # computed from the old item
+
+    objects = NetGraph.index_model(names(code % (2, "lambda t, x: x")))
+    # objects are only found by their uid, not by other names
+    assert "model.ensembles[0]" not in objects
+    removed, kept = net_graph.diff(objects)
+    assert sorted(uid for uid, _ in removed) == ["b", "c"]
+    assert sorted(uid for uid, _, _ in kept) == ["a", "conn"]
+    assert all(new_item is objects[uid] for uid, _, new_item in kept)
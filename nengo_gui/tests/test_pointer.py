@@ -0,0 +1,58 @@
+import nengo.spa as spa
+import numpy as np
+from nengo_gui.components.pointer import Pointer
+
+
+class Config(object):
+    show_pairs = False
+    max_matches = 2
+    tolerance = 0.05
+    max_updates_per_second = 100
+
+
+def make_pointer():
+    with spa.SPA() as model:
+        model.state = spa.State(32)
+    vocab = model.get_output_vocab("state")
+    for i, key in enumerate("ABCD"):
+        vocab.add(key, np.eye(32)[i])
+    pointer = Pointer(model.state, args="default")
+    pointer.config = Config()
+    return pointer, vocab
+
+
+def test_top_matches():
+    pointer, vocab = make_pointer()
+    x = 0.9 * vocab["B"].v + 0.5 * vocab["D"].v + 0.2 * vocab["A"].v
+    pointer.gather_data(0.001, x)
+    (msg,) = pointer.data.read()
+    t, text = msg.split(" ")
+    assert float(t) == 0.001
+    # the most similar keys in the order of the vocabulary
+    assert text == "0.90B;0.50D"
+
+    pointer.config.max_matches = 0
+    pointer.gather_data(0.011, x)
+    (msg,) = pointer.data.read()
+    assert msg == "0.011 0.20A;0.90B;0.50D"
+
+
+def test_changes_only():
+    pointer, vocab = make_pointer()
+    x = vocab["A"].v
+    sent = []
+    for i in range(1, 301):
+        t = i * 0.001
+        # a small change at 0.1 s, a large one at 0.2 s
+        y = x * 1.01 if t > 0.1 else x
+        y = vocab["C"].v if t > 0.2 else y
+        pointer.gather_data(t, y)
+        sent.extend(float(msg.split(" ")[0]) for msg in pointer.data.read())
+    assert np.allclose(sent, [0.001, 0.201])
+
+    # at most every 10 ms, and always after a reset
+    pointer.config.tolerance = 0
+    for i in range(1, 51):
+        pointer.gather_data(i * 0.001, x)
+    sent = [float(msg.split(" ")[0]) for msg in pointer.data.read()]
+    assert np.allclose(sent, [0.001, 0.011, 0.021, 0.031, 0.041])
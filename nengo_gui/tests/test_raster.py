@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from nengo_gui.components.raster import (
+    ENCODING_BITSET,
+    ENCODING_DELTA_VARINT,
+    RASTER_HEADER,
+    encode_spikes,
+    encode_varints,
+)
+
+
+def decode_spikes(frame):
+    encoding, n_neurons, n_steps = RASTER_HEADER.unpack_from(frame)
+    offset = RASTER_HEADER.size
+    t = np.frombuffer(frame, dtype="<f4", count=n_steps, offset=offset)
+    offset += 4 * n_steps
+    data = np.frombuffer(frame, dtype=np.uint8, offset=offset)
+
+    if encoding == ENCODING_BITSET:
+        bits = data.reshape(n_steps, -1)
+        spikes = np.unpackbits(bits, axis=1, count=n_neurons, bitorder="little")
+        return encoding, t, [np.flatnonzero(row) for row in spikes]
+
+    values = []
+    value = shift = 0
+    for b in data:
+        value |= int(b & 0x7F) << shift
+        shift += 7
+        if not b & 0x80:
+            values.append(value)
+            value = shift = 0
+    spikes = []
+    for _ in range(n_steps):
+        count = values.pop(0)
+        deltas = [values.pop(0) for _ in range(count)]
+        spikes.append(np.cumsum(np.array(deltas, dtype=int) + 1) - 1)
+    assert len(values) == 0
+    return encoding, t, spikes
+
+
+def test_encode_varints():
+    data = encode_varints([0, 1, 127, 128, 300, 2**32 - 1])
+    assert data.tobytes() == b"\x00\x01\x7f\x80\x01\xac\x02\xff\xff\xff\xff\x0f"
+    assert len(encode_varints([])) == 0
+
+
+@pytest.mark.parametrize(
+    "n_neurons, rate, encoding",
+    [
+        (10, 0.5, ENCODING_BITSET),
+        (1000, 0.01, ENCODING_DELTA_VARINT),
+        (1000, 0.5, ENCODING_BITSET),
+        (70000, 0.001, ENCODING_DELTA_VARINT),
+        (13, 0.0, ENCODING_DELTA_VARINT),
+    ],
+)
+def test_encode_spikes(n_neurons, rate, encoding):
+    rng = np.random.RandomState(0)
+    spikes = rng.rand(20, n_neurons) < rate
+    bits = np.packbits(spikes, axis=1, bitorder="little")
+    t = np.arange(1, 21) * 0.001
+
+    frame = encode_spikes(t, bits, n_neurons)
+    decoded_encoding, decoded_t, decoded = decode_spikes(frame)
+    assert decoded_encoding == encoding
+    assert np.allclose(decoded_t, t)
+    for row, indices in zip(spikes, decoded):
+        assert np.array_equal(np.flatnonzero(row), indices)
+    assert len(frame) <= RASTER_HEADER.size + 4 * len(t) + bits.size
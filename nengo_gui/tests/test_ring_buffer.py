@@ -0,0 +1,123 @@
+import struct
+
+import numpy as np
+from nengo_gui.components.ring_buffer import (
+    DECIMATE,
+    THROTTLE,
+    MessageQueue,
+    RingBuffer,
+)
+
+
+def read_rows(buf):
+    data = b"".join(bytes(chunk) for chunk in buf.read())
+    fmt = struct.Struct("<%df" % (1 + buf.size))
+    return [fmt.unpack_from(data, i) for i in range(0, len(data), fmt.size)]
+
+
+def test_append_and_read():
+    buf = RingBuffer(2, capacity=8)
+    assert buf.read() == []
+    buf.append(0.001, [1.0, 2.0])
+    buf.append(0.002, np.array([3.0, 4.0]))
+    assert len(buf) == 2
+    rows = read_rows(buf)
+    assert np.allclose(rows, [[0.001, 1.0, 2.0], [0.002, 3.0, 4.0]])
+    assert len(buf) == 0
+    assert buf.read() == []
+
+
+def test_wrap_around():
+    buf = RingBuffer(1, capacity=8)
+    for i in range(5):
+        buf.append(i, [i])
+    read_rows(buf)
+    for i in range(5, 10):
+        buf.append(i, [i])
+    chunks = buf.read()
+    assert len(chunks) == 2
+    data = np.frombuffer(b"".join(bytes(c) for c in chunks), dtype="<f4")
+    assert np.all(data.reshape(-1, 2)[:, 0] == np.arange(5, 10))
+
+
+def test_drop_oldest():
+    buf = RingBuffer(1, capacity=8)
+    for i in range(20):
+        buf.append(i, [-i])
+    rows = read_rows(buf)
+    assert len(rows) == buf.capacity - buf.margin
+    assert rows[-1] == (19.0, -19.0)
+    assert buf.dropped == 20 - len(rows)
+
+
+def test_extend():
+    buf = RingBuffer(3, capacity=8)
+    buf.append(0, [0, 0, 0])
+    t = np.arange(1, 6) * 0.5
+    x = np.arange(15).reshape(5, 3)
+    buf.extend(t, x)
+    rows = read_rows(buf)
+    assert np.allclose(rows[1:], np.hstack([t[:, None], x]))
+
+    buf.extend(np.arange(20), np.ones((20, 3)))
+    assert buf.write_index == 26
+    assert read_rows(buf)[-1] == (19.0, 1.0, 1.0, 1.0)
+
+
+def test_uint8_rows():
+    buf = RingBuffer(4, dtype=np.uint8)
+    buf.append(1.5, [0, 1, 254, 255])
+    (chunk,) = buf.read()
+    assert bytes(chunk) == struct.pack("<f4B", 1.5, 0, 1, 254, 255)
+
+
+def test_decimate():
+    buf = RingBuffer(1, capacity=8, policy=DECIMATE)
+    for i in range(10):
+        buf.append(i, [i])
+    rows = read_rows(buf)
+    # once full, only every other row is kept
+    assert [row[0] for row in rows] == [2, 3, 4, 5, 7, 9]
+    assert buf.dropped == 4
+
+    buf.extend(np.arange(6), np.zeros((6, 1)))
+    buf.extend(np.arange(6, 16), np.zeros((10, 1)))
+    assert buf.dropped == 4 + 5
+    assert [row[0] for row in read_rows(buf)][-5:] == [7, 9, 11, 13, 15]
+
+
+def test_throttle():
+    calls = []
+
+    def throttle(buf):
+        calls.append(len(buf))
+        return len(calls) < 2
+
+    buf = RingBuffer(1, capacity=8, policy=THROTTLE)
+    buf.throttle = throttle
+    for i in range(8):
+        buf.append(i, [i])
+    assert calls == [6, 7]
+    # the client did not catch up, so the oldest rows are dropped
+    assert buf.stalled
+    assert len(read_rows(buf)) == 6
+    assert not buf.stalled
+
+
+def test_message_queue():
+    queue = MessageQueue(capacity=4)
+    assert queue.read() == []
+    queue.append("a", droppable=False)
+    for i in range(6):
+        queue.append(i)
+    assert len(queue) == 5
+    assert queue.dropped == 2
+    assert queue.read() == ["a", 2, 3, 4, 5]
+    assert len(queue) == 0
+
+    queue = MessageQueue(capacity=4, policy=DECIMATE)
+    for i in range(8):
+        queue.append(i)
+    queue.append("legend", droppable=False)
+    assert queue.read() == [3, 5, 7, "legend"]
+    assert queue.dropped == 5
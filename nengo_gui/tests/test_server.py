@@ -1,10 +1,17 @@
+import errno
+import os
 import re
+import socket
+import threading
+import time
+import zlib
 
 try:
     from io import BytesIO
 except ImportError:  # Python 2.7
     from BytesIO import BytesIO
 
+import pytest
 from nengo_gui import server
 
 
@@ -215,3 +222,517 @@ Sec-WebSocket-Version: 13
             server.WebSocket.ST_CLOSING,
             server.WebSocket.ST_CLOSED,
         ]
+
+
+def masked_frame(opcode, payload, rsv=0):
+    mask = os.urandom(4)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    frame = bytearray(server.WebSocketFrame(1, rsv, opcode, 0, masked).pack())
+    header_len = len(frame) - len(masked)
+    frame[1] |= 0x80
+    return bytes(frame[:header_len]) + mask + masked
+
+
+class NonBlockingSocketMock(object):
+    def __init__(self, data):
+        self.data = data
+
+    def recv(self, size):
+        if len(self.data) == 0:
+            raise socket.error(errno.EAGAIN, "no data")
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+
+class TestWebSocketFrame(object):
+    def test_parse_masked(self):
+        for size in [0, 3, 125, 126, 1000, 0xFFFF, 0x10000, 0x10003]:
+            payload = os.urandom(size)
+            data = masked_frame(server.WebSocketFrame.OP_BIN, payload)
+            frame, consumed = server.WebSocketFrame.parse(bytearray(data))
+            assert frame.opcode == server.WebSocketFrame.OP_BIN
+            assert bytes(frame.data) == payload
+            assert consumed == len(data)
+
+    def test_parse_with_offset(self):
+        data = bytearray(
+            masked_frame(server.WebSocketFrame.OP_BIN, b"abc")
+            + masked_frame(server.WebSocketFrame.OP_TEXT, b"hello")
+        )
+        _, offset = server.WebSocketFrame.parse(data)
+        frame, consumed = server.WebSocketFrame.parse(data, offset)
+        assert frame.data == "hello"
+        assert offset + consumed == len(data)
+
+    def test_parse_incomplete(self):
+        data = masked_frame(server.WebSocketFrame.OP_BIN, b"x" * 1000)
+        for end in [0, 1, 3, 6, 500, len(data) - 1]:
+            with pytest.raises(ValueError):
+                server.WebSocketFrame.parse(bytearray(data[:end]))
+
+    def test_read_frames(self):
+        payloads = [os.urandom(i) for i in range(0, 3000, 7)]
+        data = b"".join(masked_frame(server.WebSocketFrame.OP_BIN, p) for p in payloads)
+        ws = server.WebSocket(NonBlockingSocketMock(data))
+        ws.compact_threshold = 1024
+
+        received = []
+        frame = ws.read_frame()
+        while frame is not None or len(ws.socket.data) > 0:
+            if frame is not None:
+                received.append(bytes(frame.data))
+            frame = ws.read_frame()
+        assert received == payloads
+
+
+class TestPerMessageDeflate(object):
+    @pytest.mark.parametrize(
+        "offers, params",
+        [
+            ("permessage-deflate", "permessage-deflate"),
+            ("permessage-deflate; client_max_window_bits", "permessage-deflate"),
+            (
+                "permessage-deflate; server_no_context_takeover; "
+                'server_max_window_bits="10"',
+                "permessage-deflate; server_no_context_takeover; "
+                "server_max_window_bits=10",
+            ),
+            (
+                "permessage-deflate; server_max_window_bits=8, permessage-deflate",
+                "permessage-deflate",
+            ),
+            ("x-webkit-deflate-frame", None),
+            ("permessage-deflate; unknown", None),
+        ],
+    )
+    def test_negotiate(self, offers, params):
+        deflate, response = server.PerMessageDeflate.negotiate(offers)
+        assert response == params
+        assert (deflate is None) == (params is None)
+
+    @pytest.mark.parametrize("no_context_takeover", [False, True])
+    def test_compress(self, no_context_takeover):
+        deflate = server.PerMessageDeflate(no_context_takeover=no_context_takeover)
+        text = '["data_msg", 0.5, %s]' % ", ".join(["0.12"] * 100)
+        client = zlib.decompressobj(-15)
+        for _ in range(3):
+            frame = deflate.compress(server.WebSocketFrame.create_text_frame(text))
+            assert frame.rsv == server.WebSocketFrame.RSV1
+            assert len(frame.data) < len(text) / 4
+            if no_context_takeover:
+                client = zlib.decompressobj(-15)
+            data = client.decompress(frame.data + b"\x00\x00\xff\xff")
+            assert data == text.encode("ascii")
+
+        small = server.WebSocketFrame.create_binary_frame(b"\x00" * 100)
+        assert deflate.compress(small) is small
+        ping = server.WebSocketFrame(1, 0, server.WebSocketFrame.OP_PING, 0, b"")
+        assert deflate.compress(ping) is ping
+
+    def test_read_compressed_frames(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        messages = [b"pause", b"continue " * 50, b"pause"]
+        data = b""
+        for message in messages:
+            payload = compressor.compress(message)
+            payload += compressor.flush(zlib.Z_SYNC_FLUSH)
+            data += masked_frame(
+                server.WebSocketFrame.OP_TEXT, payload[:-4], server.WebSocketFrame.RSV1
+            )
+        data += masked_frame(server.WebSocketFrame.OP_TEXT, b"uncompressed")
+
+        ws = server.WebSocket(NonBlockingSocketMock(data))
+        ws.deflate = server.PerMessageDeflate()
+        received = []
+        frame = ws.read_frame()
+        while frame is not None or len(ws.socket.data) > 0:
+            if frame is not None:
+                received.append(frame.data)
+            frame = ws.read_frame()
+        assert received == [m.decode("ascii") for m in messages] + ["uncompressed"]
+
+
+class RecordingChannel(object):
+    def __init__(self):
+        self.received = []
+        self.n_updates = 0
+        self.updated = threading.Event()
+        self.error = None
+        self.payload = None  # data written on the next update
+
+    def receive(self, ws, frame):
+        self.received.append(frame.data)
+        return frame.data != "remove"
+
+    def update(self, ws):
+        self.n_updates += 1
+        self.updated.set()
+        if self.payload is not None:
+            ws.write_binary(self.payload)
+            self.payload = None
+
+    def close(self, ws, error):
+        self.error = error
+
+
+class TestWebSocketLoop(object):
+    def setup_method(self):
+        self.server_side, self.client_side = socket.socketpair()
+        self.ws = server.WebSocket(self.server_side)
+        self.ws.set_blocking(False)
+        self.loop = server.WebSocketLoop(idle_interval=10.0)
+        self.channel = RecordingChannel()
+        self.closed = self.loop.register(self.ws, self.channel)
+
+    def teardown_method(self):
+        self.loop.stop()
+        self.server_side.close()
+        self.client_side.close()
+
+    def test_receive_and_remove(self):
+        self.client_side.sendall(
+            masked_frame(server.WebSocketFrame.OP_TEXT, b"pause")
+            + masked_frame(server.WebSocketFrame.OP_TEXT, b"remove")
+        )
+        assert self.closed.wait(1.0)
+        assert self.channel.received == ["pause", "remove"]
+        assert self.channel.error is None
+        assert self.loop.n_websockets == 0
+
+    def test_notify_wakes_loop(self):
+        assert self.channel.updated.wait(1.0)
+        self.channel.updated.clear()
+        assert not self.channel.updated.wait(0.1)
+        self.loop.notify()
+        assert self.channel.updated.wait(1.0)
+
+    def test_close_frame(self):
+        self.client_side.sendall(masked_frame(server.WebSocketFrame.OP_CLOSE, b""))
+        assert self.closed.wait(1.0)
+        assert isinstance(self.channel.error, server.SocketClosedError)
+
+    def test_stop(self):
+        self.loop.stop()
+        assert self.closed.is_set()
+        assert isinstance(self.channel.error, server.SocketClosedError)
+
+    def test_ping_idle_connection(self):
+        self.loop.ping_interval = 0.0
+        self.loop.notify()
+        self.client_side.settimeout(1.0)
+        frame, _ = server.WebSocketFrame.parse(self.client_side.recv(64))
+        assert frame.opcode == server.WebSocketFrame.OP_PING
+
+        # no pings while data is sent
+        self.loop.ping_interval = 10.0
+        self.ws.write_text("data")
+        self.channel.updated.clear()
+        self.loop.notify()
+        assert self.channel.updated.wait(1.0)
+        frame, _ = server.WebSocketFrame.parse(self.client_side.recv(64))
+        assert frame.data == "data"
+
+    def test_peer_closed_without_close_frame(self):
+        self.client_side.close()
+        assert self.closed.wait(1.0)
+        assert isinstance(self.channel.error, server.SocketClosedError)
+        assert self.loop.n_websockets == 0
+
+    def test_stalled_client(self):
+        self.loop.write_timeout = 0.5
+        self.loop.idle_interval = 0.1
+        self.channel.payload = b"\x00" * (2 * 1024 * 1024)
+        self.loop.notify()
+        assert self.channel.updated.wait(1.0)
+        assert self.ws.has_pending_writes
+
+        # a second client on the same loop keeps receiving updates
+        other_side, other_client = socket.socketpair()
+        try:
+            other_ws = server.WebSocket(other_side)
+            other_ws.set_blocking(False)
+            other_channel = RecordingChannel()
+            self.loop.register(other_ws, other_channel)
+            start = time.time()
+            while time.time() - start < 0.3:
+                self.loop.notify()
+                time.sleep(0.01)
+            assert other_channel.n_updates > 5
+            assert self.channel.n_updates == 1
+
+            # the stalled client is dropped after the write timeout
+            assert self.closed.wait(2.0)
+            assert isinstance(self.channel.error, server.SocketClosedError)
+            assert self.loop.n_websockets == 1
+        finally:
+            other_side.close()
+            other_client.close()
+
+    def test_slow_client(self):
+        size = 2 * 1024 * 1024
+        self.channel.payload = b"\x00" * size
+        self.loop.notify()
+        assert self.channel.updated.wait(1.0)
+        self.channel.updated.clear()
+        self.client_side.settimeout(1.0)
+        received = 0
+        while received < size:
+            received += len(self.client_side.recv(65536))
+            time.sleep(0.001)
+
+        # updates continue once the client has received all data
+        assert self.channel.updated.wait(1.0)
+        assert not self.closed.is_set()
+
+
+def test_connection_reset():
+    class ResetSocketMock(object):
+        def send(self, data):
+            raise socket.error(errno.ECONNRESET, "reset")
+
+    ws = server.WebSocket(ResetSocketMock())
+    with pytest.raises(server.SocketClosedError):
+        ws.write_text("data")
+
+
+class TestWorkerPool(object):
+    def test_bounded(self):
+        pool = server.WorkerPool(2)
+        release = threading.Event()
+        done = []
+
+        def task(i):
+            release.wait(1.0)
+            done.append(i)
+
+        for i in range(5):
+            pool.submit(task, i)
+        assert pool.n_workers == 2
+        release.set()
+        while len(done) < 5:
+            release.wait(0.01)
+        assert sorted(done) == list(range(5))
+        pool.shutdown()
+
+    def test_detach(self):
+        pool = server.WorkerPool(1)
+        detached = threading.Event()
+        release = threading.Event()
+        done = threading.Event()
+
+        def long_task():
+            pool.detach()
+            detached.set()
+            release.wait(1.0)
+
+        pool.submit(long_task)
+        assert detached.wait(1.0)
+        pool.submit(done.set)
+        assert done.wait(1.0)
+        release.set()
+        pool.shutdown()
+
+
+class EchoChannel(object):
+    def __init__(self):
+        self.finished = threading.Event()
+        self.finish_thread = None
+
+    def receive(self, ws, frame):
+        ws.write_text(frame.data)
+
+    def update(self, ws):
+        pass
+
+    def close(self, ws, error):
+        pass
+
+    def finish(self):
+        self.finish_thread = threading.current_thread()
+        self.finished.set()
+
+
+class EchoHandler(server.HttpWsRequestHandler):
+    http_commands = {"/echo": "echo"}
+    ws_commands = {"/ws": "ws_echo"}
+    channels = []
+
+    def echo(self):
+        return server.HttpResponse(
+            self.resource.encode("utf-8") + b"?" + (self.query["n"][0].encode("utf-8"))
+        )
+
+    def ws_echo(self):
+        channel = EchoChannel()
+        self.channels.append(channel)
+        self.server.serve_websocket(self, channel)
+
+    def get_expected_origins(self):
+        return ["localhost"]
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestManagedThreadHttpServer(object):
+    def setup_method(self):
+        self.server = server.ManagedThreadHttpServer(("localhost", 0), EchoHandler)
+        self.server.keep_alive.timeout = 0.2
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.02}
+        )
+        self.thread.start()
+
+    def teardown_method(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+
+    def connect(self):
+        return socket.create_connection(("localhost", self.server.server_port))
+
+    def read_responses(self, s, n):
+        data = b""
+        while data.count(b"/echo?") < n:
+            chunk = s.recv(4096)
+            assert chunk, "connection closed"
+            data += chunk
+        return data
+
+    def test_keep_alive(self):
+        s = self.connect()
+        for i in range(3):
+            s.sendall(b"GET /echo?n=%d HTTP/1.1\r\nHost: localhost\r\n\r\n" % i)
+            response = self.read_responses(s, 1)
+            assert response.startswith(b"HTTP/1.1 200")
+            assert response.endswith(b"/echo?%d" % i)
+        # the idle connection waits for the next request in the loop
+        start = time.time()
+        while self.server.keep_alive.n_connections == 0 and time.time() - start < 1:
+            time.sleep(0.01)
+        assert self.server.keep_alive.n_connections == 1
+        s.close()
+
+    def test_pipelining(self):
+        s = self.connect()
+        s.sendall(
+            b"".join(
+                b"GET /echo?n=%d HTTP/1.1\r\nHost: localhost\r\n\r\n" % i
+                for i in range(4)
+            )
+        )
+        response = self.read_responses(s, 4)
+        assert re.findall(rb"/echo\?(\d)", response) == [b"0", b"1", b"2", b"3"]
+        s.close()
+
+    def test_connection_close(self):
+        s = self.connect()
+        s.sendall(
+            b"GET /echo?n=0 HTTP/1.1\r\nHost: localhost\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        response = self.read_responses(s, 1)
+        assert b"Connection: close" in response
+        assert s.recv(4096) == b""
+        s.close()
+
+    def test_idle_timeout(self):
+        s = self.connect()
+        s.sendall(b"GET /echo?n=0 HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        self.read_responses(s, 1)
+        s.settimeout(2.0)
+        assert s.recv(4096) == b""
+        assert self.server.keep_alive.n_connections == 0
+        s.close()
+
+    def test_websocket_releases_worker(self):
+        self.server.pool.max_workers = 1
+        ws_socket = self.connect()
+        ws_socket.sendall(
+            b"GET /ws HTTP/1.1\r\nHost: localhost\r\nOrigin: http://localhost\r\n"
+            b"Connection: Upgrade\r\nUpgrade: websocket\r\n"
+            b"Sec-WebSocket-Key: AQIDBAUGBwgJCgsMDQ4PEC==\r\n"
+            b"Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        ws_socket.settimeout(2.0)
+        response = b""
+        while b"\r\n\r\n" not in response:
+            response += ws_socket.recv(4096)
+        assert response.startswith(b"HTTP/1.1 101")
+
+        # the only worker handles other requests while the websocket is open
+        s = self.connect()
+        s.sendall(b"GET /echo?n=0 HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        assert self.read_responses(s, 1).endswith(b"/echo?0")
+        s.close()
+
+        ws_socket.sendall(masked_frame(server.WebSocketFrame.OP_TEXT, b"hello"))
+        frame, _ = server.WebSocketFrame.parse(bytearray(ws_socket.recv(4096)))
+        assert frame.data == "hello"
+
+        # the channel is finished in a worker once the client is gone
+        ws_socket.close()
+        channel = EchoHandler.channels[-1]
+        assert channel.finished.wait(2.0)
+        assert channel.finish_thread.name == "HttpWorker"
+
+    def test_concurrent_clients(self):
+        n_clients, n_requests = 2 * self.server.max_workers, 10
+        failures = []
+
+        def client():
+            s = self.connect()
+            try:
+                for i in range(n_requests):
+                    s.sendall(b"GET /echo?n=%d HTTP/1.1\r\nHost: localhost\r\n\r\n" % i)
+                    if not self.read_responses(s, 1).endswith(b"?%d" % i):
+                        failures.append(i)
+            except Exception as e:
+                failures.append(e)
+            finally:
+                s.close()
+
+        clients = [threading.Thread(target=client) for _ in range(n_clients)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        assert failures == []
+        assert self.server.pool.n_workers <= self.server.max_workers
+
+
+class WebSocketMock(object):
+    state = server.WebSocket.ST_OPEN
+
+    def __init__(self):
+        self.frames = []
+
+    def write_frame(self, frame):
+        self.frames.append(frame)
+
+    def write_binary(self, data):
+        self.write_frame(server.WebSocketFrame.create_binary_frame(data))
+
+
+def test_multiplexed_writer():
+    ws = WebSocketMock()
+    writer = server.MultiplexedWriter(ws)
+    writer.channel = 3
+    writer.write_text("status:running")
+    writer.write_frame(
+        server.WebSocketFrame(1, 0, server.WebSocketFrame.OP_PING, 0, b"")
+    )
+    writer.channel = 700
+    writer.write_binary(b"\x00\x01\x02")
+    assert [f.opcode for f in ws.frames] == [server.WebSocketFrame.OP_PING]
+
+    writer.flush()
+    writer.flush()
+    assert len(ws.frames) == 2
+    data = ws.frames[1].data
+    header = server.MultiplexedWriter.record_header
+    assert header.unpack_from(data) == (3, server.WebSocketFrame.OP_TEXT, 14)
+    offset = header.size + 14
+    assert data[header.size : offset] == b"status:running"
+    assert header.unpack_from(data, offset) == (700, server.WebSocketFrame.OP_BIN, 3)
+    assert data[offset + header.size :] == b"\x00\x01\x02"
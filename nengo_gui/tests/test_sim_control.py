@@ -0,0 +1,151 @@
+import threading
+import timeit
+
+import nengo
+import nengo_gui.exec_env
+from nengo_gui.components.ring_buffer import THROTTLE, RingBuffer
+from nengo_gui.components.sim_control import SimControl
+
+
+class ClientMock(object):
+    def __init__(self):
+        self.binary = []
+        self.text = []
+
+    def write_binary(self, data):
+        self.binary.append(data)
+
+    def write_text(self, text):
+        self.text.append(text)
+
+
+class PageMock(object):
+    def __init__(self, model):
+        self.model = model
+        self.sim = None
+        self.notified = 0
+        self.changed = False
+        self.error = None
+
+    def count_dropped(self):
+        return {}
+
+    def notify_clients(self):
+        self.notified += 1
+
+
+def make_sim_control(model):
+    page = PageMock(model)
+    sim_control = SimControl()
+    sim_control.page = page
+    sim_control.paused = False
+    sim_control.add_nengo_objects(page)
+    return sim_control
+
+
+def test_run_batch_adapts_steps_per_batch():
+    with nengo.Network() as model:
+        nengo.Ensemble(10, 1)
+    sim_control = make_sim_control(model)
+    sim_control.target_rate = None
+
+    with nengo.Simulator(model, progress_bar=False) as sim:
+        sim_control.page.sim = sim
+        for _ in range(5):
+            n_steps = sim_control.steps_per_batch
+            start = timeit.default_timer()
+            sim_control.run_batch(sim)
+            assert timeit.default_timer() - start < 10 * sim_control.max_batch_latency
+            assert sim_control.time == sim.time
+        assert sim.n_steps > 5
+        assert sim_control.steps_per_batch > 1
+        assert sim_control.page.notified == 5
+        assert not sim_control.batching
+
+
+def test_run_batch_keeps_target_rate():
+    with nengo.Network() as model:
+        nengo.Ensemble(10, 1)
+    sim_control = make_sim_control(model)
+    sim_control.target_rate = 1.0
+
+    with nengo.Simulator(model, progress_bar=False) as sim:
+        sim_control.page.sim = sim
+        start = timeit.default_timer()
+        while sim.time < 0.2:
+            sim_control.run_batch(sim)
+            assert sim_control.steps_per_batch <= 20
+        elapsed = timeit.default_timer() - start
+        assert 0.15 < elapsed < 0.4
+
+
+def test_throttle_waits_for_client():
+    with nengo.Network() as model:
+        nengo.Ensemble(10, 1)
+    sim_control = make_sim_control(model)
+    sim_control.page.sim = object()
+    sim_control.max_throttle_time = 0.05
+
+    buf = RingBuffer(1, capacity=8, policy=THROTTLE)
+    buf.throttle = sim_control.throttle
+    for i in range(6):
+        buf.append(i, [i])
+    assert buf.is_full()
+
+    # a client that reads the buffer after a while
+    timer = threading.Timer(0.02, buf.read)
+    timer.start()
+    start = timeit.default_timer()
+    buf.append(6, [6])
+    assert timeit.default_timer() - start >= 0.015
+    assert not buf.stalled
+    assert sim_control.page.notified > 0
+    timer.join()
+
+    # a client that does not read the buffer
+    for i in range(5):
+        buf.append(i, [i])
+    start = timeit.default_timer()
+    buf.append(6, [6])
+    buf.append(7, [7])
+    assert buf.stalled
+    assert timeit.default_timer() - start < 2 * sim_control.max_throttle_time
+
+
+def test_update_client_sends_changes():
+    with nengo.Network() as model:
+        nengo.Ensemble(10, 1)
+    sim_control = make_sim_control(model)
+    sim_control.max_updates_per_second = 0
+    client = ClientMock()
+
+    sim_control.update_client(client)
+    sim_control.update_client(client)
+    assert len(client.binary) == 1
+    assert client.text == ["status:building"]
+
+    sim_control.rate = 1e-6  # within the tolerance
+    sim_control.update_client(client)
+    assert len(client.binary) == 1
+    sim_control.time = 0.001
+    sim_control.update_client(client)
+    assert len(client.binary) == 2
+
+    # changes are held back by the rate limit
+    sim_control.max_updates_per_second = 1e-3
+    for i in range(10):
+        sim_control.time = 0.002 + 0.001 * i
+        sim_control.update_client(client)
+    assert len(client.binary) == 3
+
+
+def test_discover_backends_cached():
+    backends = nengo_gui.exec_env.discover_backends()
+    assert "nengo" in backends
+    try:
+        nengo_gui.exec_env.known_modules.append("nengo_gui")
+        assert nengo_gui.exec_env.discover_backends() == backends
+        assert "nengo_gui" in nengo_gui.exec_env.discover_backends(refresh=True)
+    finally:
+        nengo_gui.exec_env.known_modules.remove("nengo_gui")
+        nengo_gui.exec_env.discover_backends(refresh=True)
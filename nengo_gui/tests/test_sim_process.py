@@ -0,0 +1,45 @@
+import multiprocessing
+
+import pytest
+from nengo_gui.server import WebSocketFrame
+from nengo_gui.sim_process import FrameRing
+
+
+def test_frame_ring_wraps_around():
+    ring = FrameRing(capacity=64)
+    header = FrameRing.record_header.size
+    for i in range(20):
+        payload = bytes(range(i, i + 10))
+        assert ring.write(i % 3, WebSocketFrame.OP_BIN, payload)
+        assert ring.read() == [(i % 3, WebSocketFrame.OP_BIN, payload)]
+    assert ring.counters[0] == 20 * (header + 10)
+    assert ring.read() == []
+
+
+def test_frame_ring_drops_when_full():
+    ring = FrameRing(capacity=64)
+    assert ring.write(0, WebSocketFrame.OP_TEXT, b"a" * 30)
+    assert not ring.write(1, WebSocketFrame.OP_TEXT, b"b" * 30)
+    assert ring.dropped == 1
+    assert ring.read() == [(0, WebSocketFrame.OP_TEXT, b"a" * 30)]
+    assert ring.write(1, WebSocketFrame.OP_TEXT, b"b" * 30)
+    assert ring.read() == [(1, WebSocketFrame.OP_TEXT, b"b" * 30)]
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="requires fork",
+)
+def test_frame_ring_is_shared_with_child():
+    ring = FrameRing(capacity=1024)
+
+    def produce():
+        for i in range(10):
+            ring.write(i, WebSocketFrame.OP_TEXT, b"frame %d" % i)
+
+    process = multiprocessing.get_context("fork").Process(target=produce)
+    process.start()
+    process.join()
+    assert ring.read() == [
+        (i, WebSocketFrame.OP_TEXT, b"frame %d" % i) for i in range(10)
+    ]
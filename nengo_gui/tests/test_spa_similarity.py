@@ -0,0 +1,81 @@
+import json
+
+import nengo.spa as spa
+import numpy as np
+from nengo_gui.components.spa_similarity import (
+    SIMILARITY_HEADER,
+    SpaSimilarity,
+    encode_similarities,
+)
+
+
+def decode_similarities(frame):
+    n_lines, n_steps = SIMILARITY_HEADER.unpack_from(frame)
+    offset = SIMILARITY_HEADER.size
+    t = np.frombuffer(frame, dtype="<f4", count=n_steps, offset=offset)
+    offset += 4 * n_steps
+    similarities = np.frombuffer(frame, dtype="<f2", offset=offset)
+    return t, similarities.reshape(n_steps, n_lines)
+
+
+class Config(object):
+    show_pairs = False
+
+
+class Page(object):
+    def configure_buffer(self, buffer):
+        pass
+
+
+class Client(object):
+    def __init__(self):
+        self.messages = []
+
+    def write_text(self, msg):
+        self.messages.append(json.loads(msg))
+
+    def write_binary(self, frame):
+        self.messages.append(decode_similarities(frame))
+
+
+def test_encode_similarities():
+    t = np.arange(1, 6) * 0.001
+    similarities = np.linspace(-1.5, 1.5, 15).reshape(5, 3)
+    decoded_t, decoded = decode_similarities(encode_similarities(t, similarities))
+    assert np.allclose(decoded_t, t)
+    assert np.allclose(decoded, similarities, atol=1e-3)
+
+
+def test_gather_data():
+    with spa.SPA() as model:
+        model.state = spa.State(16)
+    vocab = model.get_output_vocab("state")
+    vocab.parse("A+B")
+
+    similarity = SpaSimilarity(model.state, args="default")
+    similarity.page = Page()
+    similarity.config = Config()
+    client = Client()
+
+    for i in range(3):
+        similarity.gather_data(i * 0.001, vocab["A"].v)
+    vocab.parse("C")
+    similarity.gather_data(0.003, vocab["C"].v)
+    similarity.update_client(client)
+
+    # all steps computed with the same vocabulary are sent in one frame
+    (t, first), legend, (t_last, last) = client.messages
+    assert np.allclose(t, [0, 0.001, 0.002])
+    assert np.allclose(first, np.dot(vocab.vectors[:2], vocab["A"].v), atol=1e-2)
+    assert legend == ["update_legend", "C"]
+    assert np.allclose(last, np.dot(vocab.vectors, vocab["C"].v), atol=1e-2)
+
+    # showing the pairs resets the legend
+    similarity.config.show_pairs = True
+    similarity.message("true")
+    similarity.gather_data(0.004, vocab["A"].v)
+    client.messages = []
+    similarity.update_client(client)
+    legend, (_, data) = client.messages
+    assert legend == ["reset_legend_and_data", "A", "B", "C", "A*B", "A*C", "B*C"]
+    assert data.shape == (1, 6)
@@ -0,0 +1,166 @@
+from __future__ import print_function
+
+import gzip
+import os.path
+import re
+import timeit
+from io import BytesIO
+
+try:
+    from http.client import HTTPConnection
+except ImportError:  # Python 2.7
+    from httplib import HTTPConnection
+
+import pytest
+
+import nengo_gui
+from nengo_gui import static_assets
+from nengo_gui.gui import GuiThread
+from nengo_gui.guibackend import GuiServerSettings, ModelContext
+from nengo_gui.static_assets import StaticAsset, StaticAssets
+
+
+@pytest.fixture(scope="module")
+def assets():
+    return StaticAssets()
+
+
+def test_variants(assets):
+    asset = assets.get("static/nengo.js")
+    assert asset.mimetype in ("application/javascript", "text/javascript")
+    with gzip.GzipFile(fileobj=BytesIO(asset.variants["gzip"])) as f:
+        assert f.read() == asset.variants[None]
+    assert asset.choose_encoding("gzip, deflate") == "gzip"
+    assert asset.choose_encoding("gzip;q=0, deflate") is None
+    assert asset.choose_encoding(None) is None
+
+    # already compressed files are only served as they are
+    font = assets.get("static/lib/fonts/glyphicons-halflings-regular.woff2")
+    assert list(font.variants) == [None]
+
+    assert assets.get("static/no_such_file.js") is None
+    assert assets.get("static/../setup.py") is None
+
+
+def test_not_modified():
+    asset = StaticAsset("static/test.js", b"var x = 1;" * 100, 1500000000)
+    etag = asset.etag("gzip")
+    assert asset.is_not_modified(etag, None)
+    assert asset.is_not_modified("W/" + etag, None)
+    assert asset.is_not_modified('"other", ' + asset.etag(), None)
+    assert asset.is_not_modified("*", None)
+    assert not asset.is_not_modified('"other"', None)
+    assert not asset.is_not_modified('"other"', asset.last_modified)
+
+    assert asset.is_not_modified(None, asset.last_modified)
+    assert asset.is_not_modified(None, "Sat, 01 Jan 2050 00:00:00 GMT")
+    assert not asset.is_not_modified(None, "Sat, 01 Jan 2000 00:00:00 GMT")
+    assert not asset.is_not_modified(None, "garbage")
+    assert not asset.is_not_modified(None, None)
+
+
+def test_reload_changed_file(tmpdir):
+    tmpdir.mkdir("static").join("test.css").write("a {}")
+    assets = StaticAssets(str(tmpdir))
+    version = assets.get("static/test.css").version
+
+    path = str(tmpdir.join("static", "test.css"))
+    with open(path, "w") as f:
+        f.write("b {}")
+    os.utime(path, (2000000000, 2000000000))
+    asset = assets.get("static/test.css")
+    assert asset.version != version
+    assert asset.variants[None] == b"b {}"
+
+
+def test_versioned(assets):
+    html = assets.versioned(
+        '<link href="static/main.css" /><script src="static/nengo.js"></script>'
+        '<script src="static/missing.js"></script><a href="other.html">'
+    )
+    assert 'href="static/main.css?v=%s"' % assets.get("static/main.css").version in html
+    assert 'src="static/nengo.js?v=%s"' % assets.get("static/nengo.js").version in html
+    assert 'src="static/missing.js"' in html
+    assert 'href="other.html"' in html
+
+
+def load_page(port, static_urls, headers):
+    """Request all static files of the page, return bytes and time."""
+    n_bytes = 0
+    codes = set()
+    etags = {}
+    start = timeit.default_timer()
+    for url in static_urls:
+        conn = HTTPConnection("localhost", port)
+        conn.request("GET", url, headers=headers.get(url, {}))
+        response = conn.getresponse()
+        n_bytes += len(response.read())
+        codes.add(response.status)
+        etags[url] = response.getheader("ETag")
+        assert response.getheader("Cache-Control") == static_assets.CACHE_FOREVER
+        conn.close()
+    return n_bytes, timeit.default_timer() - start, codes, etags
+
+
+def test_page_load():
+    """Measure the bytes and time needed to load the static files of a page."""
+    filename = os.path.join(nengo_gui.__path__[0], "examples", "default.py")
+    gui = GuiThread(
+        ModelContext(filename=filename),
+        GuiServerSettings(("localhost", 0), auto_shutdown=0),
+    )
+    gui.start()
+    gui.wait_for_startup()
+    try:
+        port = gui.server.server_port
+        conn = HTTPConnection("localhost", port)
+        conn.request("GET", str(gui.server.get_resource()))
+        html = conn.getresponse().read().decode("utf-8")
+        conn.close()
+        static_urls = ["/" + url for url in re.findall(r'"(static/[^"]+)"', html)]
+        assert len(static_urls) > 40
+        assert all("?v=" in url for url in static_urls)
+
+        raw, raw_time, codes, _ = load_page(port, static_urls, {})
+        assert codes == {200}
+        accept = {url: {"Accept-Encoding": "gzip"} for url in static_urls}
+        compressed, compressed_time, codes, etags = load_page(port, static_urls, accept)
+        assert codes == {200}
+        assert compressed < 0.5 * raw
+
+        revalidate = {
+            url: {"Accept-Encoding": "gzip", "If-None-Match": etags[url]}
+            for url in static_urls
+        }
+        cached, cached_time, codes, _ = load_page(port, static_urls, revalidate)
+        assert codes == {304}
+        assert cached == 0
+
+        print(
+            "\n%d files: %d bytes in %.3f s, gzip %d bytes in %.3f s, "
+            "revalidated %d bytes in %.3f s"
+            % (
+                len(static_urls),
+                raw,
+                raw_time,
+                compressed,
+                compressed_time,
+                cached,
+                cached_time,
+            )
+        )
+
+        # unversioned URLs (e.g. loaded from scripts) must be revalidated
+        conn = HTTPConnection("localhost", port)
+        conn.request("GET", "/static/nengo.js")
+        response = conn.getresponse()
+        response.read()
+        assert response.getheader("Cache-Control") == static_assets.REVALIDATE
+        conn.close()
+
+        conn = HTTPConnection("localhost", port)
+        conn.request("GET", "/static/no_such_file.js")
+        assert conn.getresponse().status == 404
+        conn.close()
+    finally:
+        gui.shutdown()
@@ -266,7 +266,8 @@ class FeedforwardLayout(Action):
         else:
             self.network = self.obj
 
-        self.pos = self.net_graph.layout.make_layout(self.network)
+        with self.net_graph.timer("layout"):
+            self.pos = self.net_graph.layout.make_layout(self.network)
         # record the current positions and sizes of everything in the network
         self.old_state = self.save_network()
         self.act_feedforward_layout()